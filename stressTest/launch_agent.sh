@@ -0,0 +1,19 @@
+#!/bin/bash
+LAUNCH_SCRIPT=$(basename ${BASH_SOURCE[0]})
+SCRIPTDIR=`readlink -f $(dirname ${BASH_SOURCE[0]})`
+if [ "$1" == "-h" -o "$1" == "--help" ]; then
+	echo Usage: $LAUNCH_SCRIPT [agentSocket]
+	exit 1
+fi
+AGENT_SOCKET=${1:-/tmp/stressTestAgent.$(id -un).sock}
+
+# Setup site specific environment once for all tests run by the agent
+if [ -f $SCRIPTDIR/site_setup_env.sh ]; then
+	source $SCRIPTDIR/site_setup_env.sh 
+else
+	echo Unable to setup site environment via soft link site_setup_env.sh
+	echo Full path: $SCRIPTDIR/site_setup_env.sh 
+	exit 1
+fi
+
+exec python3 $SCRIPTDIR/stressTestMonitor.py --socket $AGENT_SOCKET
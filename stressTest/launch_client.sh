@@ -115,6 +115,15 @@ echo KILLER=$KILLER
 
 #VERBOSE=" -v"
 
+# Sample host and test process load, only one sampler runs per host
+nohup $SCRIPTDIR/telemetrySampler.py -D $TEST_HOST_DIR > /dev/null 2>&1 &
+
+# testManager sets TEST_START_TIME for a synchronized start of all clients
+START_TIME_OPT=
+if [ -n "$TEST_START_TIME" ]; then
+	START_TIME_OPT="-s $TEST_START_TIME"
+fi
+
 # Run test on host
 #echo $PYPROCMGR $VERBOSE -c $TEST_N_CLIENTS -n $CLIENT_NAME \
 #	-p $TEST_BASEPORT -d $TEST_DELAY_PER_CLIENT -D $TEST_DIR \
@@ -122,6 +131,6 @@ echo KILLER=$KILLER
 #	"$CLIENT_CMD" | tee -a $TEST_LOG;
 $PYPROCMGR $VERBOSE -c $TEST_N_CLIENTS -n $CLIENT_NAME \
 	-p $TEST_BASEPORT -d $TEST_DELAY_PER_CLIENT -D $TEST_DIR \
-	-k $KILLER \
+	-k $KILLER $START_TIME_OPT \
 	"$CLIENT_CMD"; \
 echo Done: `date` | tee -a $TEST_LOG
@@ -66,7 +66,7 @@ def hasMacros( strWithMacros ):
         macrosFound = True
     return macrosFound
 
-def launchProcess( command, procNumber=0, procNameBase="pyProc_", basePort=40000, logDir=None, verbose=False ):
+def launchProcess( command, procNumber=0, procNameBase="pyProc_", basePort=40000, logDir=None, startTime=None, verbose=False ):
     # No I/O supported or collected for these processes
     procEnv = os.environ
     procEnv['PYPROC_ID'] = "%02u" % procNumber
@@ -133,6 +133,13 @@ def launchProcess( command, procNumber=0, procNameBase="pyProc_", basePort=40000
     # Finish w/ procServ connection port and process command
     procCmd.append( str(basePort + procNumber) )
     cmdArgs = ' '.join(command).split()
+    if startTime is not None:
+        # Pre-spawn the process, held by startBarrier until startTime
+        barrierCmd = [ os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'startBarrier.py' ),
+                        '--startTime', '%.6f' % startTime ]
+        if logDir is not None:
+            barrierCmd += [ '--startFile', os.path.join( logDir, procName + ".start" ) ]
+        cmdArgs = barrierCmd + [ '--' ] + cmdArgs
     if verbose:
         print( "launchProcess: %s %s\n" % ( ' '.join(procCmd), ' '.join(cmdArgs) ) )
     proc = None
@@ -221,6 +228,7 @@ def process_options(argv):
     parser.add_argument( '-p', '--port',  action="store", type=int, default=40000, help='Base port number, procServ port is port + str(procNumber)' )
     parser.add_argument( '-n', '--name',  action="store", default="pyProc_", help='process basename, name is basename + str(procNumber)' )
     parser.add_argument( '-D', '--logDir',  action="store", default=None, help='log file directory.' )
+    parser.add_argument( '-s', '--startTime',  action="store", type=float, default=None, help='Launch processes now, but hold them until this time in seconds since the epoch, plus delay * procNumber.' )
     parser.add_argument( '-k', '--killFile',  action="store", default=None, help='Kill file. Creates script to kill pyProcMgr instance.' )
 
     options = parser.parse_args( )
@@ -246,6 +254,9 @@ def main(argv=None):
         print( "Killer file: %s\n" % options.killFile )
 
     for procNumber in range(options.count):
+        procStartTime = None
+        if options.startTime is not None:
+            procStartTime = options.startTime + procNumber * options.delay
         try:
             if abortAll:
                 break
@@ -254,6 +265,7 @@ def main(argv=None):
                                                 procNameBase=options.name,
                                                 basePort=options.port,
                                                 logDir=options.logDir,
+                                                startTime=procStartTime,
                                                 verbose=options.verbose )
             if proc is not None:
                 procList.append( [ proc, procInput, options.port + procNumber ] )
@@ -262,7 +274,8 @@ def main(argv=None):
             break
 
         try:
-            if options.delay > 0.0:
+            # W/ a startTime, the delay is applied by each process's startBarrier
+            if options.delay > 0.0 and options.startTime is None:
                 time.sleep( options.delay )
         except BaseException as e:
             raise
@@ -26,13 +26,16 @@ if [ -z "$TEST_PVGET_REPEAT" ]; then
 	TEST_PVGET_REPEAT=1
 fi
 
-NSAM=`caget -t -w 1 ${PVS[0]}.NSAM`
-if $? ; then
+FIRST_PV=`echo $PVS | cut -d' ' -f1`
+NSAM=`caget -t -w 1 $FIRST_PV.NSAM`
+if [ $? -ne 0 -o -z "$NSAM" ]; then
 	NSAM=1
-endif
+fi
 export PV_SIZE=$(($NSAM * 8))
 echo PV_SIZE=$PV_SIZE
 
+DATE_FMT="+%a %b %e %H:%M:%S.%N %Z %Y"
+
 mkdir -p $TEST_DIR
 while (( 1 ));
 do
@@ -41,9 +44,13 @@ do
 
 	for PV in $PVS;
 	do
-		echo Get: `date` >> $TEST_DIR/$PV.pvgetarray
-		pvget -p $TEST_PROVIDER -w $TEST_PVGET_TIMEOUT $PV > /dev/null; \
-		echo Read $PV_SIZE bytes: `date` >> $TEST_DIR/$PV.pvgetarray &
+		# Dates include nanoseconds so stressTest can measure get latency.
+		echo Get: `date "$DATE_FMT"` >> $TEST_DIR/$PV.pvgetarray
+		if pvget -p $TEST_PROVIDER -w $TEST_PVGET_TIMEOUT $PV > /dev/null; then
+			echo Read $PV_SIZE bytes: `date "$DATE_FMT"` >> $TEST_DIR/$PV.pvgetarray
+		else
+			echo Timeout: `date "$DATE_FMT"` >> $TEST_DIR/$PV.pvgetarray
+		fi
 	done
 	wait
 	#echo "pvgetarray jobs done"
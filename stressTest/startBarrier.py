@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#  Name: startBarrier.py
+#  Abs:  Wait until an absolute start time, then exec a command
+#
+#  pyProcMgr launches each test process w/ this wrapper when given a --startTime,
+#  so processes are already spawned and their env set up when the start time
+#  comes, and all are released together by the hosts' synchronized clocks.
+#
+#  Example:
+#    startBarrier.py --startTime 1700000000.0 --startFile proc00.start -- pvget TST:BaseVersion
+#
+#==============================================================
+import argparse
+import os
+import sys
+import textwrap
+import time
+
+def waitUntil( startTime, spinTime=0.002 ):
+    '''Sleep until spinTime before startTime, then spin for the rest
+    so the release isn't late by the sleep granularity.'''
+    while True:
+        remaining = startTime - time.time()
+        if remaining <= spinTime:
+            break
+        time.sleep( remaining - spinTime )
+    while time.time() < startTime:
+        pass
+    return time.time()
+
+def process_options(argv):
+    if argv is None:
+        argv = sys.argv[1:]
+    description =   'startBarrier waits until an absolute start time, then execs a command.\n'
+    epilog_fmt  =   '\nExamples:\n' \
+                    'startBarrier.py --startTime 1700000000.0 -- pvget TST:BaseVersion\n'
+    epilog = textwrap.dedent( epilog_fmt )
+    parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
+    parser.add_argument( '--startTime', action="store", type=float, required=True, help='Start time in seconds since the epoch.' )
+    parser.add_argument( '--startFile', action="store", default=None, help='Write the start time and actual release time to this file.' )
+    parser.add_argument( 'cmd',  nargs=argparse.REMAINDER, help='Command and arguments to exec.' )
+
+    options = parser.parse_args( argv )
+    if options.cmd and options.cmd[0] == '--':
+        options.cmd = options.cmd[1:]
+
+    return options
+
+def main(argv=None):
+    options = process_options(argv)
+    if not options.cmd:
+        print( "startBarrier Error: No command!" )
+        return 1
+    releaseTime = waitUntil( options.startTime )
+    if options.startFile:
+        try:
+            with open( options.startFile, 'w' ) as f:
+                f.write( "%.6f %.6f\n" % ( options.startTime, releaseTime ) )
+        except OSError as e:
+            print( "startBarrier Error: Unable to write %s: %s" % ( options.startFile, e ) )
+    sys.stdout.flush()
+    os.execvp( options.cmd[0], options.cmd )
+
+if __name__ == '__main__':
+    sys.exit( main() )
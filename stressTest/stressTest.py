@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import functools
 import textwrap
 import os
 import sys
@@ -9,6 +11,17 @@ import matplotlib.pyplot as plt
 
 from stressTestClient import *
 from stressTestFile import *
+from stressTestArchive import *
+from stressTestSummary import *
+from stressTestTelemetry import *
+from stressTestGateway import *
+from stressTestCorrelation import *
+
+def reportRates( label, startSec, rates, numShow=10 ):
+    '''Show the first numShow ( secPastEpoch, rate ) pairs of a dense per-second rate array.'''
+    numShow = min( numShow, len(rates) )
+    pairs = [ "(%u, %4u)" % ( startSec + i, rates[i] ) for i in range( numShow ) ]
+    print( "        %s: First %u: [ %s ]" % ( label, numShow, ', '.join( pairs ) ) )
 
 class stressTest:
     def __init__( self, testName, testPathTop ):
@@ -17,11 +30,16 @@ class stressTest:
         self._testClients       = {}    # map of test clients, key is clientName
         self._testFiles         = {}    # map of test files, key is pathTopToFile
         self._testServers       = {}    # map of test servers, key is serverName
-        #self._gwStats          = {}
+        self._archive           = None  # stressTestArchive, if read from an archive
+        self._gateways          = {}    # map of stressTestGateway, key is the pvGetGateway client name
         self._totalNumPVs       = 0     # Total number of testPVs for all clients
         self._totalNumMissed    = 0     # Total number of cumulative missed counts for all clients and testPVs
         self._totalNumTsValues  = 0     # Total number of timestamped values collected for all clients and testPVs
         self._totalNumTimeouts  = 0     # Total number of timeouts collected for all clients and testPVs
+        self._latencyHist       = stressTestHistogram()  # Merged latencies for all clients and testPVs
+        self._aggregate         = None  # stressTestAggregate w/ client, host and test per-second series
+        self._telemetry         = {}    # map of stressTestTelemetry, key is hostName
+        self._correlation       = None  # stressTestCorrelation of client losses w/ gateway and host resources
         self._startTime        = None   # Earliest timestamp for test
         self._endTime          = None   # Latest   timestamp for test
 
@@ -29,8 +47,13 @@ class stressTest:
         return self._endTime
     def getStartTime( self ):
         return self._startTime
+    def getTestName( self ):
+        return self._testName
+    def getTestClients( self ):
+        '''map of stressTestClient instances, key is clientName'''
+        return self._testClients
     def getNumClients( self ):
-        return len(self._tsClients)
+        return len(self._testClients)
     def getNumServers( self ):
         return len(self._tsServers)
     def getTotalNumPVs( self ):
@@ -45,6 +68,27 @@ class stressTest:
     def getTotalNumTimeouts( self ):
         '''Total number of timeouts collected for all clients and testPVs.'''
         return self._totalNumTimeouts
+    def getLatencyHist( self ):
+        '''Merged latency histogram for all clients and testPVs.'''
+        return self._latencyHist
+    def getAggregate( self ):
+        '''stressTestAggregate w/ client, host and test per-second series, set by analyze().'''
+        return self._aggregate
+    def getGateways( self ):
+        '''map of stressTestGateway for each pvGetGateway client, key is clientName'''
+        return self._gateways
+    def getCorrelation( self ):
+        '''stressTestCorrelation w/ the likely bottlenecks, set by analyze().'''
+        return self._correlation
+    def getTelemetry( self ):
+        '''map of stressTestTelemetry for hosts w/ telemetrySampler files, key is hostName'''
+        return self._telemetry
+    def getHostTelemetrySeries( self, name, hostName ):
+        '''One of the telemetry HOST_SERIES of a host on the aggregate's per-second axis,
+        w/ NaN for seconds w/o a sample, or None w/o telemetry or samples.'''
+        if hostName not in self._telemetry or self._aggregate is None or self._aggregate.getStartSec() is None:
+            return None
+        return self._telemetry[hostName].getHostSeries( name, self._aggregate.getStartSec(), self._aggregate.getNumSecs() )
 
     def analyze( self ):
         print( "stressTestView.analyze: %s ..." % self._testName )
@@ -52,9 +96,13 @@ class stressTest:
         self._startTime = None
         self._totalNumPVs = 0
         self._totalNumTsValues = 0
+        self._totalNumMissed   = 0
+        self._totalNumTimeouts = 0
+        self._latencyHist = stressTestHistogram()
         for clientName in self._testClients:
             client = self._testClients[clientName]
-            client.analyze()
+            client.analyzePVs()
+            self._latencyHist.merge( client.getLatencyHist() )
 
             # Update totals
             self._totalNumPVs      += client.getNumPVs()
@@ -70,6 +118,17 @@ class stressTest:
                 if  self._endTime   is None or self._endTime < client.getEndTime():
                     self._endTime   =  client.getEndTime()
 
+        # Client, host and test per-second series in one pass over all testPVs
+        self._aggregate = stressTestAggregate( self._testClients.values() )
+        for client in self._testClients.values():
+            client.setAggregate( self._aggregate )
+        if self._aggregate.getStartSec() is not None:
+            for gateway in self._gateways.values():
+                gateway.analyze( self._aggregate.getStartSec(), self._aggregate.getNumSecs() )
+
+        # Which gateway, host or network resource leads the client losses
+        self._correlation = stressTestCorrelation( self ).analyze()
+
     def report( self, level=2 ):
         print( "\nStressTest Report:" )
         print( "TestName: %s" % self._testName )
@@ -120,42 +179,173 @@ class stressTest:
                     testPV = testPVs[pvName]
                     print( "        %-26s %6u %11u %9u %8u" % ( pvName, 1, testPV.getNumTsValues(), testPV.getNumMissed(), testPV.getNumTimeouts() ) )
                     if level >= 4:
-                        tsRates          = testPV.getTsRates()
-                        sortedKeys = list(tsRates.keys())
-                        sortedKeys.sort()
-                        numShow = min( 10, len(sortedKeys) )
-                        print( "        ValueRates: First %u: [ " % numShow, end='' )
-                        for t in sortedKeys[0:numShow-2]:
-                            print( "(%.3f, %4u), " % ( t, tsRates[t] ), end=', ' )
-                        if len(sortedKeys) > 0:
-                            t = sortedKeys[numShow-1]
-                            print( "(%.3f,%4u) ]" % ( t, tsRates[t] ) )
-
-                        tsMissRates      = testPV.getTsMissRates()
-                        numShow = min( 10, len(tsMissRates.keys()) )
-                        print( "        TsMissedRates: First %u: [ " % numShow, end='' )
-                        for t in list( tsMissRates.keys() )[0:numShow-2]:
-                            print( "(%.3f, %4u), " % ( t, tsMissRates[t] ), end=', ' )
-                        if len(tsMissRates) > 0:
-                            t = list( tsMissRates.keys() )[numShow-1]
-                            print( "(%.3f, %4u) ]" % ( t, tsMissRates[t] ) )
-
-                        timeoutRates         = testPV.getTimeoutRates()
-                        numShow = min( 10, len(timeoutRates.keys()) )
-                        print( "        TimeoutRates: First %u: [ " % numShow, end='' )
-                        for t in list( timeoutRates.keys() )[0:numShow-2]:
-                            print( "(%.3f, %4u), " % ( t, timeoutRates[t] ), end=', ' )
-                        if len(timeoutRates) > 0:
-                            t = list( timeoutRates.keys() )[numShow-1]
-                            print( "(%.3f, %4u) ]" % ( t, timeoutRates[t] ) )
+                        startSec = testPV.getStartSec()
+                        reportRates( "ValueRates",    startSec, testPV.getTsRates() )
+                        reportRates( "TsMissedRates", startSec, testPV.getTsMissRates() )
+                        reportRates( "TimeoutRates",  startSec, testPV.getTimeoutRates() )
 
         print( "    %-30s %6u %11u %9u %8u" % ( "Total" if level >= 2 else str(len(self._testClients)),
                     self.getTotalNumPVs(), self.getTotalNumTsValues(),
                     self.getTotalNumMissed(), self.getTotalNumTimeouts() ) )
 
+        self.reportGateways( level )
+        self.reportThroughput( level )
+        self.reportLatency( level )
+        self.reportTelemetry( level )
+        self.reportNetwork( level )
+        if self._correlation is not None:
+            self._correlation.report( level )
+
+    def reportGateways( self, level=2 ):
+        '''Show the gateway stats and fan-out metrics over the test, per gateway.
+        Level 2 shows GW_REPORT_STATS, level 3 all captured stats.'''
+        for gatewayName in sorted( self._gateways ):
+            gateway = self._gateways[gatewayName]
+            if gateway.getStartSec() is None:
+                continue
+            print( "Gateway %-26s        Mean          Min          Max" % gatewayName )
+            #      "    SSSSSSSSSSSSSSSSSSSSSSSSSSSSSS MMMMMMMMMMMM MMMMMMMMMMMM MMMMMMMMMMMM" )
+            statNames = gateway.getStatNames()
+            if level < 3:
+                statNames = [ statName for statName in statNames if statName in GW_REPORT_STATS ]
+            for name in gateway.getMetricNames() + statNames:
+                series = gateway.getSeries( name )
+                label  = FANOUT_METRICS[name][0] if name in FANOUT_METRICS else name
+                if not np.any( ~np.isnan( series ) ):
+                    print( "    %-30s %12s %12s %12s" % ( label, "-", "-", "-" ) )
+                    continue
+                print( "    %-30s %12.4g %12.4g %12.4g" % ( label, np.nanmean( series ), np.nanmin( series ), np.nanmax( series ) ) )
+
+    def reportLatency( self, level=2 ):
+        '''Show request to response latency percentiles in ms, per client and for the test.'''
+        if self._latencyHist.getTotalCount() == 0:
+            return
+        def showLatency( name, hist ):
+            ( p50, p99, p999 ) = hist.getPercentiles( ( 50.0, 99.0, 99.9 ) )
+            print( "    %-28s %9u %8.3f %8.3f %8.3f %8.3f" % ( name, hist.getTotalCount(),
+                    p50 * 1e3, p99 * 1e3, p999 * 1e3, hist.getMax() * 1e3 ) )
+        print( "Latency ms                       NumGets      p50      p99    p99.9      max" )
+        #      "    CCCCCCCCCCCCCCCCCCCCCCCCCCCC NNNNNNNNN PPPPPPPP PPPPPPPP PPPPPPPP MMMMMMMM" )
+        if level >= 2:
+            for clientName in sorted( self._testClients ):
+                hist = self._testClients[clientName].getLatencyHist()
+                if hist.getTotalCount():
+                    showLatency( clientName, hist )
+        showLatency( "Total", self._latencyHist )
+
+    def reportThroughput( self, level=2 ):
+        '''Show bytes read and MB/s for pvgetarray clients, per client and per host.'''
+        arrayClients = [ client for client in self._testClients.values() if client.getClientType() == 'pvgetarray' ]
+        if len(arrayClients) == 0:
+            return
+        hosts = {}  # map of hostName to [ numBytes, startTime, endTime ]
+        if level >= 2:
+            print( "Throughput                         NumBytes     MB/s  PeakMB/s" )
+            #      "    CCCCCCCCCCCCCCCCCCCCCCCCCCCC BBBBBBBBBBBB RRRRRRRR RRRRRRRRR" )
+        for client in sorted( arrayClients, key=lambda client: client.getName() ):
+            if level >= 2:
+                print( "    %-28s %12u %8.3f %9.3f" % ( client.getName(), client.getNumBytes(),
+                        client.getThroughput() or 0.0, client.getPeakThroughput() or 0.0 ) )
+            if client.getStartTime() is None:
+                continue
+            host = hosts.setdefault( client.getHostName(), [ 0, client.getStartTime(), client.getEndTime() ] )
+            host[0] += client.getNumBytes()
+            host[1]  = min( host[1], client.getStartTime() )
+            host[2]  = max( host[2], client.getEndTime() )
+        print( "Hosts                              NumBytes     MB/s  PeakMB/s" )
+        for hostName in sorted( hosts ):
+            ( numBytes, startTime, endTime ) = hosts[hostName]
+            byteRates = self._aggregate.getHostSeries( 'byteRates', hostName )
+            duration = endTime - startTime
+            print( "    %-28s %12u %8.3f %9.3f" % ( hostName, numBytes,
+                    numBytes / duration / 1e6 if duration > 0 else 0.0,
+                    float( byteRates.max() ) / 1e6 if len(byteRates) else 0.0 ) )
+
+    def reportTelemetry( self, level=2 ):
+        '''Show each host's CPU, load and memory during the test, w/ the mean CPU
+        in the seconds where the host's clients missed counts, and the peak CPU
+        of its busiest test process, to tell saturated client hosts apart
+        from misses upstream of the clients.'''
+        if len(self._telemetry) == 0 or self._aggregate is None or self._aggregate.getStartSec() is None:
+            return
+        startSec = self._aggregate.getStartSec()
+        numSecs  = self._aggregate.getNumSecs()
+        print( "Host Telemetry                 CPU%  PeakCPU% PeakLoad MinAvailMB MissSecs CPU%@Miss PeakProcCPU%" )
+        #      "    HHHHHHHHHHHHHHHHHHHHHHHHH CCCCC PPPPPPPPP LLLLLLLL MMMMMMMMMM SSSSSSSS CCCCCCCCC PPPPPPPPPPPP" )
+        for hostName in sorted( self._telemetry ):
+            telemetry = self._telemetry[hostName]
+            cpuBusy = telemetry.getHostSeries( 'cpuBusy', startSec, numSecs )
+            sampled = ~np.isnan( cpuBusy )
+            if not np.any( sampled ):
+                continue
+            load1    = telemetry.getHostSeries( 'load1', startSec, numSecs )
+            memAvail = telemetry.getHostSeries( 'memAvailable', startSec, numSecs )
+            missSecs = np.zeros( numSecs, dtype=bool )
+            if hostName in self._aggregate.getHostNames():
+                missSecs = self._aggregate.getHostSeries( 'tsMissRates', hostName ) > 0
+            missSampled = missSecs & sampled
+            peakProcCpu = 0.0
+            for procName in telemetry.getProcNames():
+                procCpu = telemetry.getProcSeries( 'cpu', procName, startSec, numSecs )
+                if np.any( ~np.isnan( procCpu ) ):
+                    peakProcCpu = max( peakProcCpu, float( np.nanmax( procCpu ) ) )
+            print( "    %-25s %5.1f %9.1f %8.2f %10.0f %8u %9s %12.1f" % ( hostName,
+                    np.mean( cpuBusy[sampled] ) * 100, np.max( cpuBusy[sampled] ) * 100,
+                    np.nanmax( load1 ), np.nanmin( memAvail ) / 1024, np.count_nonzero( missSecs ),
+                    "%9.1f" % ( np.mean( cpuBusy[missSampled] ) * 100 ) if np.any( missSampled ) else "-",
+                    peakProcCpu * 100 ) )
+            if level >= 3:
+                for procName in telemetry.getProcNames():
+                    procCpu = telemetry.getProcSeries( 'cpu', procName, startSec, numSecs )
+                    procRss = telemetry.getProcSeries( 'rss', procName, startSec, numSecs )
+                    if not np.any( ~np.isnan( procCpu ) ):
+                        continue
+                    print( "        %-21s %5.1f %9.1f %8s %10s %8s %9s RSS %6.0f MB" % ( procName,
+                            np.nanmean( procCpu ) * 100, np.nanmax( procCpu ) * 100, "", "", "", "",
+                            np.nanmax( procRss ) / 1024 ) )
+
+    def reportNetwork( self, level=2, numShow=20 ):
+        '''Show each host's kernel packet drops, UDP errors and TCP retransmits
+        during the test, and how many of the seconds w/ missed counts also had
+        drops, to tell updates dropped in the kernel from those lost upstream.
+        Level 3 lists the first numShow seconds w/ misses, timeouts or drops,
+        w/ the per-second deltas next to the host's miss and timeout counts.'''
+        if self._aggregate is None or self._aggregate.getStartSec() is None:
+            return
+        netHosts = [ hostName for hostName in sorted( self._telemetry ) if self._telemetry[hostName].hasNetSamples() ]
+        if len(netHosts) == 0:
+            return
+        startSec = self._aggregate.getStartSec()
+        numSecs  = self._aggregate.getNumSecs()
+        dropNames = [ 'rxDrops', 'udpInErrors', 'udpRcvbufErrors', 'udpSockDrops', 'tcpRetransSegs' ]
+        print( "Network                    RxDrops UdpInErr RcvbufErr SockDrops TcpRetrans MissSecs DropMissSecs" )
+        #      "    HHHHHHHHHHHHHHHHHHHHHH RRRRRRR UUUUUUUU BBBBBBBBB SSSSSSSSS TTTTTTTTTT MMMMMMMM DDDDDDDDDDDD" )
+        for hostName in netHosts:
+            telemetry = self._telemetry[hostName]
+            deltas = { name: telemetry.getNetSeries( name, startSec, numSecs ) for name in dropNames + [ 'udpRxQueue' ] }
+            dropSecs = np.zeros( numSecs, dtype=bool )
+            for name in dropNames:
+                dropSecs |= np.nan_to_num( deltas[name] ) > 0
+            missRates    = np.zeros( numSecs, dtype=np.int64 )
+            timeoutRates = np.zeros( numSecs, dtype=np.int64 )
+            if hostName in self._aggregate.getHostNames():
+                missRates    = self._aggregate.getHostSeries( 'tsMissRates',  hostName )
+                timeoutRates = self._aggregate.getHostSeries( 'timeoutRates', hostName )
+            print( "    %-22s %7u %8u %9u %9u %10u %8u %12u" % ( hostName,
+                    *[ np.nansum( deltas[name] ) for name in dropNames ],
+                    np.count_nonzero( missRates ), np.count_nonzero( ( missRates > 0 ) & dropSecs ) ) )
+            if level >= 3:
+                showSecs = np.flatnonzero( ( missRates > 0 ) | ( timeoutRates > 0 ) | dropSecs )[ 0 : numShow ]
+                if len(showSecs):
+                    print( "        secPastEpoch   Missed Timeouts RxDrops UdpInErr RcvbufErr SockDrops TcpRetrans UdpRxQueue" )
+                for i in showSecs:
+                    print( "        %12u %8u %8u %7.0f %8.0f %9.0f %9.0f %10.0f %10.0f" % ( startSec + i,
+                            missRates[i], timeoutRates[i],
+                            *[ deltas[name][i] for name in dropNames + [ 'udpRxQueue' ] ] ) )
+
     def getClient( self, clientName, hostName ):
         clientPath = os.path.join( self._testPath, hostName, "clients", clientName )
-        if not os.path.isdir( clientPath ):
+        if self._archive is None and not os.path.isdir( clientPath ):
             raise InvalidStressTestPathError( "Invalid TEST/HOST/TYPE/APPNAME/FILENAME clientPath: %s" % clientPath )
         client = None
         if clientName in self._testClients:
@@ -168,39 +358,101 @@ class stressTest:
             self._testClients[clientName] = client
         return client
 
-    def readFiles( self, dirTop, analyze = True, verbose = False ):
+    def readFiles( self, dirTop, analyze = True, verbose = False, jobs = 1, useCache = True, summaryOnly = False ):
+        '''Read all test files under dirTop.
+        If jobs > 1, files are parsed in parallel by a pool of jobs worker
+        processes, or one per cpu if jobs is 0.  Each worker returns the
+        parsed columnar arrays, which are added here in walk order.
+        If useCache, parsed arrays are cached in the test's .stressTestCache
+        directory and reused until the file size or mtime changes.
+        If summaryOnly, only the per-file summaries are read, w/ counts and
+        per-second rates but no raw samples.  That is enough for report
+        levels 1 and 2, and w/ useCache each file is summarized only once.'''
         if not os.path.isdir( dirTop ):
             print( "%s is not a directory!" % dirTop )
+        readFile = readTestFileSummary if summaryOnly else readTestFile
+        if useCache:
+            readFile = functools.partial( readFile, cacheTop=self._testPath )
+        filePaths = []
+        gwPaths   = []
         for dirPath, dirs, files in os.walk( dirTop, topdown=True ):
+            # Skip hidden directories such as the .stressTestCache
+            dirs[:] = [ d for d in dirs if not d.startswith( '.' ) ]
             if verbose:
                 (appPath, appName) = os.path.split( dirPath )
                 if os.path.split(appPath)[1] == "clients":
                     print( "Processing client %s ..." % appName )
+            # pvGetGateway captures are gateway stats, not test PVs
+            isGateway = isGatewayClientDir( dirPath )
             for fileName in files:
-                filePath = os.path.join( dirPath, fileName )
-                stressTestFile = None
-                if fileName.endswith( '.pvget' ):
-                    stressTestFile = stressTestFilePVGet( filePath )
-                elif fileName.endswith( 'pvCapture' ):
-                    stressTestFile = stressTestFilePVCapture( filePath )
-                #elif fileName.endswith( '.log' ):
-                    # readLogFile( fileName )
-                #elif fileName.endswith( '.list' ):
-                #   continue
-                #elif fileName.endswith( '.cfg' ):
-                #   continue
-                #elif fileName.endswith( '.info' ):
-                    # readInfoFile( fileName )
-
-                if not stressTestFile:
-                    continue
-                self._testFiles[filePath] = stressTestFile
-                ( testName, hostName, appType, appName, pvName ) =  pathToTestAttr( filePath )
-                if appType == "client":
-                    client = self.getClient( appName, hostName )
-                    client.addTestFile( pvName, stressTestFile )
+                if getTestFileClass( fileName ) is not None:
+                    ( gwPaths if isGateway else filePaths ).append( os.path.join( dirPath, fileName ) )
+
+        if jobs == 1 or len(filePaths) <= 1:
+            testFiles = map( readFile, filePaths )
+            self.addTestFiles( filePaths, testFiles )
+        else:
+            if jobs == 0:
+                jobs = os.cpu_count()
+            if verbose:
+                print( "Reading %d files w/ %d jobs ..." % ( len(filePaths), jobs ) )
+            chunkSize = max( 1, len(filePaths) // ( jobs * 4 ) )
+            with concurrent.futures.ProcessPoolExecutor( max_workers=jobs ) as executor:
+                testFiles = executor.map( readFile, filePaths, chunksize=chunkSize )
+                self.addTestFiles( filePaths, testFiles )
+        # Few and small, and needed w/ all samples even if summaryOnly
+        self.addTestFiles( gwPaths, [ readTestFile( filePath, cacheTop=self._testPath if useCache else None,
+                                                    testFileClass=stressTestFileGWStats ) for filePath in gwPaths ] )
+        self._telemetry = readTestTelemetry( dirTop )
+
+        if analyze:
+            self.analyze()
+        return
+
+    def readArchive( self, archive, analyze = True, clientNames = None, pvNames = None, startSec = None, endSec = None ):
+        '''Read test files from a stressTestArchive instead of the test directory.
+        Only files for the listed clientNames and pvNames are read, and only
+        samples w/ startSec <= secPastEpoch <= endSec, so the rest of the
+        memory mapped archive is never touched.  Host telemetry is read from
+        the archive's copies, w/ no telemetry for archives written w/o them.'''
+        self._archive = archive
+        filePaths = []
+        testFiles = []
+        for entry in archive.getEntries():
+            filePath = os.path.join( self._testPath, entry['path'] )
+            ( testName, hostName, appType, appName, pvName ) =  pathToTestAttr( filePath )
+            if clientNames is not None and appName not in clientNames:
+                continue
+            if pvNames is not None and pvName not in pvNames:
+                continue
+            if entry['fileType'] != 'gwstats' and isGatewayClientDir( os.path.dirname( filePath ) ):
+                # Archived as a pvCapture file before gateway stats were archived as such,
+                # so reread the raw file if the test directory is still there
+                testFile = readTestFile( filePath, testFileClass=stressTestFileGWStats ) if os.path.isfile( filePath ) else None
+                if testFile is None:
+                    print( "readArchive: Skipping gateway stats archived as %s: %s" % ( entry['fileType'], entry['path'] ) )
+            else:
+                testFile = archive.getTestFile( entry, startSec=startSec, endSec=endSec )
+            if testFile is None:
+                continue
+            filePaths.append( filePath )
+            testFiles.append( testFile )
+        self.addTestFiles( filePaths, testFiles )
+        self._telemetry = readTestTelemetry( archive.getArchivePath() )
 
         if analyze:
             self.analyze()
         return
 
+    def addTestFiles( self, filePaths, testFiles ):
+        for ( filePath, stressTestFile ) in zip( filePaths, testFiles ):
+            if not stressTestFile:
+                continue
+            self._testFiles[filePath] = stressTestFile
+            ( testName, hostName, appType, appName, pvName ) =  pathToTestAttr( filePath )
+            if stressTestFile.getFileType() == "gwstats":
+                gateway = self._gateways.setdefault( appName, stressTestGateway( appName, hostName ) )
+                gateway.addTestFile( pvName, stressTestFile )
+            elif appType == "client":
+                client = self.getClient( appName, hostName )
+                client.addTestFile( pvName, stressTestFile )
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import numpy as np
+
+# Per-second series summed by the aggregation, w/ the dtype of each sum
+AGGREGATE_SERIES = {    'tsRates':      np.int64,   # Values collected per second
+                        'tsMissRates':  np.int64,   # Counts missed per second
+                        'timeoutRates': np.int64,   # Timeouts per second
+                        'byteRates':    np.float64, # Bytes read per second, pvgetarray only
+                        'numPVs':       np.int64 }  # PVs w/ samples spanning each second
+
+def getPVSeries( testPV, name ):
+    '''Dense per-second array for one series of an analyzed stressTestPV.'''
+    if name == 'tsRates':
+        return testPV.getTsRates()
+    if name == 'tsMissRates':
+        return testPV.getTsMissRates()
+    if name == 'timeoutRates':
+        return testPV.getTimeoutRates()
+    if name == 'byteRates':
+        return testPV.getByteRates()
+    if name == 'numPVs':
+        return np.ones( len(testPV.getTsRates()), dtype=np.int64 )
+    raise KeyError( "getPVSeries Error: Unknown series %s" % name )
+
+class stressTestAggregate:
+    '''Client, host and test level per-second series on one common time axis.
+    Each PV's dense per-second arrays are added to its client's row of a
+    ( numClients, numSecs ) array w/ one slice add per PV and series.
+    Host rows are then summed from the client rows, and the test series
+    from the host rows, so all levels come from one pass over the PVs.
+    Index 0 of every series is getStartSec().
+    clients is an iterable of stressTestClient instances whose PVs
+    have already been analyzed.
+    '''
+    def __init__( self, clients ):
+        clients = list( clients )
+        self._startSec    = None
+        self._numSecs     = 0
+        self._clientIndex = {}  # Row in client arrays, key is clientName
+        self._hostIndex   = {}  # Row in host arrays, key is hostName
+
+        # Find the common time axis
+        endSec = None
+        for client in clients:
+            for testPV in client.getTestPVs().values():
+                pvStartSec = testPV.getStartSec()
+                if pvStartSec is None:
+                    continue
+                pvEndSec = pvStartSec + len(testPV.getTsRates())
+                if self._startSec is None or pvStartSec < self._startSec:
+                    self._startSec = pvStartSec
+                if endSec is None or pvEndSec > endSec:
+                    endSec = pvEndSec
+        if self._startSec is not None:
+            self._numSecs = endSec - self._startSec
+
+        for client in clients:
+            self._clientIndex[client.getName()] = len(self._clientIndex)
+            self._hostIndex.setdefault( client.getHostName(), len(self._hostIndex) )
+        hostRows = np.array( [ self._hostIndex[client.getHostName()] for client in clients ], dtype=np.intp )
+
+        self._clientSeries = {}
+        self._hostSeries   = {}
+        self._testSeries   = {}
+        for name in AGGREGATE_SERIES:
+            dtype = AGGREGATE_SERIES[name]
+            clientSeries = np.zeros( ( len(clients), self._numSecs ), dtype=dtype )
+            for ( row, client ) in enumerate( clients ):
+                for testPV in client.getTestPVs().values():
+                    pvStartSec = testPV.getStartSec()
+                    if pvStartSec is None:
+                        continue
+                    pvSeries = getPVSeries( testPV, name )
+                    offset = pvStartSec - self._startSec
+                    clientSeries[ row, offset : offset + len(pvSeries) ] += pvSeries
+            hostSeries = np.zeros( ( len(self._hostIndex), self._numSecs ), dtype=dtype )
+            np.add.at( hostSeries, hostRows, clientSeries )
+            self._clientSeries[name] = clientSeries
+            self._hostSeries[name]   = hostSeries
+            self._testSeries[name]   = hostSeries.sum( axis=0 )
+
+    # Accessors
+    def getStartSec( self ):
+        '''secPastEpoch for index 0 of all series, or None if there are no samples.'''
+        return self._startSec
+    def getNumSecs( self ):
+        return self._numSecs
+    def getClientNames( self ):
+        return list( self._clientIndex )
+    def getHostNames( self ):
+        return list( self._hostIndex )
+
+    def getClientSeries( self, name, clientName ):
+        return self._clientSeries[name][ self._clientIndex[clientName] ]
+    def getHostSeries( self, name, hostName ):
+        return self._hostSeries[name][ self._hostIndex[hostName] ]
+    def getTestSeries( self, name ):
+        return self._testSeries[name]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import functools
+import json
+import os
+import shutil
+import sys
+import textwrap
+import numpy as np
+
+from stressTestClient import *
+from stressTestFile import *
+from stressTestGateway import isGatewayClientDir
+from telemetrySampler import HOST_FILE, PROC_FILE, PROC_NAMES_FILE, NET_FILE
+
+# Archive layout, for a test exported to ARCHIVE:
+#   ARCHIVE/index.json          Test name, column dtypes and one entry per test file
+#   ARCHIVE/COLUMN.bin          Raw column data for all files, ex. sec.bin, value.bin
+#   ARCHIVE/HOST/telemetry.*    Copies of the telemetrySampler files of each test host
+# Each index entry gives the file's path relative to the test top,
+# its scalar stats, and the offset and count of its samples in each column.
+# Samples for each file are sorted by timestamp, so time ranges can be
+# located w/ a binary search on the memory mapped sec column.
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX  = '.stressTestArchive'
+
+class InvalidStressTestArchiveError( Exception ):
+    pass
+
+def readArchiveFile( filePath, testFileClass, cacheTop=None ):
+    return readTestFile( filePath, cacheTop=cacheTop, testFileClass=testFileClass )
+
+def writeArchive( testTop, archivePath, jobs=1, useCache=True, verbose=False ):
+    '''Export all test files under testTop to a columnar archive at archivePath.
+    Files are parsed one at a time, or by jobs worker processes, and appended
+    to the column files, so memory use is bounded by the largest file.'''
+    testTop = os.path.normpath( testTop )
+    if not os.path.isdir( testTop ):
+        raise InvalidStressTestPathError( "%s is not a directory!" % testTop )
+    filePaths   = []
+    fileClasses = []
+    for dirPath, dirs, files in os.walk( testTop, topdown=True ):
+        dirs[:] = [ d for d in dirs if not d.startswith( '.' ) ]
+        dirs.sort()
+        # pvGetGateway captures are archived as gateway stats, w/ fileType gwstats
+        isGateway = isGatewayClientDir( dirPath )
+        for fileName in sorted( files ):
+            testFileClass = getTestFileClass( fileName )
+            if testFileClass is not None:
+                filePaths.append( os.path.join( dirPath, fileName ) )
+                fileClasses.append( stressTestFileGWStats if isGateway else testFileClass )
+
+    readFile = readArchiveFile
+    if useCache:
+        readFile = functools.partial( readArchiveFile, cacheTop=testTop )
+
+    os.makedirs( archivePath, mode=0o775, exist_ok=True )
+    index   = { 'version': ARCHIVE_VERSION, 'testName': os.path.split( testTop )[1], 'columns': {}, 'files': [] }
+    columns = {}    # Open column files, key is column name
+    try:
+        if jobs == 1:
+            testFiles = map( readFile, filePaths, fileClasses )
+            executor  = None
+        else:
+            executor  = concurrent.futures.ProcessPoolExecutor( max_workers=jobs if jobs else None )
+            testFiles = executor.map( readFile, filePaths, fileClasses )
+        for ( filePath, testFile ) in zip( filePaths, testFiles ):
+            if testFile is None:
+                continue
+            if verbose:
+                print( "writeArchive: %s" % filePath )
+            # Sort so time ranges can be found w/ searchsorted
+            testFile.getTsValues().sort()
+            arrays  = testFile.getCacheArrays()
+            numSamples = len(arrays['sec'])
+            entry = {   'path': os.path.relpath( filePath, testTop ),
+                        'fileType': testFile.getFileType(),
+                        'count': numSamples, 'offsets': {}, 'scalars': {} }
+            for name in arrays:
+                array = np.asarray( arrays[name] )
+                if array.ndim == 0:
+                    entry['scalars'][name] = array.item()
+                    continue
+                if len(array) != numSamples:
+                    continue
+                if name not in columns:
+                    index['columns'][name] = array.dtype.str
+                    columns[name] = [ open( os.path.join( archivePath, name + '.bin' ), 'wb' ), 0 ]
+                ( f, offset ) = columns[name]
+                f.write( np.ascontiguousarray( array, dtype=np.dtype( index['columns'][name] ) ).tobytes() )
+                entry['offsets'][name] = offset
+                columns[name][1] = offset + numSamples
+            if numSamples:
+                entry['startSec'] = int( arrays['sec'][0] )
+                entry['endSec']   = int( arrays['sec'][-1] )
+            index['files'].append( entry )
+        if executor is not None:
+            executor.shutdown( wait=True )
+    finally:
+        for name in columns:
+            columns[name][0].close()
+
+    # Telemetry files are small and already columnar, so they're copied as is,
+    # to the same HOST directories, where readTestTelemetry() finds them
+    for hostName in sorted( os.listdir( testTop ) ):
+        hostDir = os.path.join( testTop, hostName )
+        if not os.path.isfile( os.path.join( hostDir, HOST_FILE ) ):
+            continue
+        if verbose:
+            print( "writeArchive: %s telemetry" % hostDir )
+        os.makedirs( os.path.join( archivePath, hostName ), mode=0o775, exist_ok=True )
+        for fileName in [ HOST_FILE, PROC_FILE, PROC_NAMES_FILE, NET_FILE ]:
+            if os.path.isfile( os.path.join( hostDir, fileName ) ):
+                shutil.copyfile( os.path.join( hostDir, fileName ), os.path.join( archivePath, hostName, fileName ) )
+
+    with open( os.path.join( archivePath, 'index.json' ), 'w' ) as f:
+        json.dump( index, f, indent=1 )
+    return index
+
+class stressTestArchive:
+    '''Read only access to an archive written by writeArchive.
+    Columns are memory mapped, so only the pages for the
+    PVs and time ranges that are read are loaded.'''
+    def __init__( self, archivePath ):
+        self._archivePath = archivePath
+        try:
+            with open( os.path.join( archivePath, 'index.json' ), 'r' ) as f:
+                self._index = json.load( f )
+        except BaseException as e:
+            raise InvalidStressTestArchiveError( "stressTestArchive Error: %s: %s" % ( archivePath, e ) )
+        if self._index.get( 'version' ) != ARCHIVE_VERSION:
+            raise InvalidStressTestArchiveError( "stressTestArchive Error: %s: Unsupported version %s" %
+                                                ( archivePath, self._index.get( 'version' ) ) )
+        self._columns = {}  # Memory mapped columns, key is column name
+
+    def getArchivePath( self ):
+        return self._archivePath
+    def getTestName( self ):
+        return self._index['testName']
+    def getEntries( self ):
+        return self._index['files']
+    def getStartSec( self ):
+        startSecs = [ entry['startSec'] for entry in self._index['files'] if 'startSec' in entry ]
+        return min( startSecs ) if startSecs else None
+
+    def getColumn( self, name ):
+        if name not in self._columns:
+            columnPath = os.path.join( self._archivePath, name + '.bin' )
+            dtype = np.dtype( self._index['columns'][name] )
+            if os.path.getsize( columnPath ) == 0:
+                self._columns[name] = np.zeros( 0, dtype=dtype )
+            else:
+                self._columns[name] = np.memmap( columnPath, dtype=dtype, mode='r' )
+        return self._columns[name]
+
+    def getArrays( self, entry, startSec=None, endSec=None ):
+        '''Returns the dict of arrays for one index entry, as from
+        stressTestFile.getCacheArrays(), optionally limited to samples
+        w/ startSec <= sec <= endSec.  Column arrays are memmap views.'''
+        offsets = entry['offsets']
+        ( first, last ) = ( 0, entry['count'] )
+        if ( startSec is not None or endSec is not None ) and 'sec' in offsets:
+            sec = self.getColumn( 'sec' )[ offsets['sec'] : offsets['sec'] + entry['count'] ]
+            if startSec is not None:
+                first = int( np.searchsorted( sec, startSec, side='left' ) )
+            if endSec is not None:
+                last  = int( np.searchsorted( sec, endSec, side='right' ) )
+            last = max( first, last )
+        arrays = {}
+        for name in offsets:
+            offset = offsets[name]
+            arrays[name] = self.getColumn( name )[ offset + first : offset + last ]
+        for name in entry['scalars']:
+            arrays[name] = entry['scalars'][name]
+        return arrays
+
+    def getTestFile( self, entry, startSec=None, endSec=None ):
+        '''Returns a stressTestFile instance for one index entry.'''
+        testFileClass = getTestFileClass( os.path.split( entry['path'] )[1] )
+        if entry['fileType'] == 'gwstats':
+            testFileClass = stressTestFileGWStats
+        if testFileClass is None:
+            return None
+        testFile = testFileClass( os.path.join( self._archivePath, entry['path'] ), process=False )
+        testFile.setCacheArrays( self.getArrays( entry, startSec, endSec ) )
+        return testFile
+
+def process_options(argv):
+    if argv is None:
+        argv = sys.argv[1:]
+    description =   'stressTestArchive exports a completed test to a memory mappable columnar archive.\n'
+    epilog_fmt  =   '\nExamples:\n' \
+                    'stressTestArchive -t PATH/TO/TEST/TOP\n' \
+                    'stressTestView -a PATH/TO/TEST/TOP%s\n' % ARCHIVE_SUFFIX
+    epilog = textwrap.dedent( epilog_fmt )
+    parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
+    parser.add_argument( '-t', '--top',     action="store", required=True, help='Top directory of test results.' )
+    parser.add_argument( '-o', '--output',  action="store", default=None, help='Archive path. Defaults to TOP%s' % ARCHIVE_SUFFIX )
+    parser.add_argument( '-j', '--jobs',    action="store", type=int, default=1, help='Number of worker processes for reading files. 0 for one per cpu.' )
+    parser.add_argument( '--noCache',       action="store_true", help='Ignore and don\'t update the .stressTestCache of parsed files.' )
+    parser.add_argument( '-v', '--verbose', action="store_true", help='show more verbose output.' )
+
+    options = parser.parse_args( argv )
+
+    return options
+
+def main(argv=None):
+    options = process_options(argv)
+    archivePath = options.output
+    if archivePath is None:
+        archivePath = os.path.normpath( options.top ) + ARCHIVE_SUFFIX
+    index = writeArchive( options.top, archivePath, jobs=options.jobs, useCache=not options.noCache, verbose=options.verbose )
+    print( "Wrote %d files to %s" % ( len(index['files']), archivePath ) )
+    return 0
+
+if __name__ == '__main__':
+    status = main()
+    sys.exit(status)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import os
+import numpy as np
+
+# Parsed test files are cached under TESTNAME/.stressTestCache/
+# using the same HOSTNAME/clients/CLIENTNAME/PVNAME.* relative path
+# as the raw file, w/ .npz appended.
+CACHE_DIR_NAME = '.stressTestCache'
+# Bump when the parsed arrays change, so older cache files are re-parsed
+CACHE_VERSION  = 4
+
+def getCacheDir( testTop ):
+    return os.path.join( testTop, CACHE_DIR_NAME )
+
+def getCachePath( testTop, filePath, suffix='.npz' ):
+    relPath = os.path.relpath( filePath, testTop )
+    return os.path.join( getCacheDir( testTop ), relPath + suffix )
+
+def getFileKey( filePath ):
+    '''Cache key for the current contents of filePath: ( size, mtime_ns )'''
+    fileStat = os.stat( filePath )
+    return ( fileStat.st_size, fileStat.st_mtime_ns )
+
+def loadCacheArrays( testTop, filePath, suffix='.npz' ):
+    '''Returns the dict of cached arrays for filePath,
+    or None if not cached or the file has changed since it was cached.'''
+    cachePath = getCachePath( testTop, filePath, suffix )
+    if not os.path.isfile( cachePath ):
+        return None
+    try:
+        with np.load( cachePath, allow_pickle=False ) as npz:
+            ( fileSize, fileMtime ) = getFileKey( filePath )
+            if int( npz['fileSize'] ) != fileSize or int( npz['fileMtime'] ) != fileMtime:
+                return None
+            if 'cacheVersion' not in npz.files or int( npz['cacheVersion'] ) != CACHE_VERSION:
+                return None
+            return { key: npz[key] for key in npz.files }
+    except BaseException as e:
+        print( "loadCacheArrays Error: %s: %s" % ( cachePath, e ) )
+        return None
+
+def saveCacheArrays( testTop, filePath, arrays, fileKey=None, suffix='.npz' ):
+    '''Save the dict of arrays parsed from filePath to the cache.
+    fileKey should be getFileKey( filePath ) from before the file was parsed,
+    so a file which grows while being parsed is re-parsed next time.
+    Returns True on success.'''
+    cachePath = getCachePath( testTop, filePath, suffix )
+    if fileKey is None:
+        fileKey = getFileKey( filePath )
+    ( fileSize, fileMtime ) = fileKey
+    arrays = dict( arrays, fileSize=np.int64( fileSize ), fileMtime=np.int64( fileMtime ),
+                   cacheVersion=np.int64( CACHE_VERSION ) )
+    # Write to a temporary file and rename so readers never see a partial file
+    tmpPath = "%s.%d.tmp" % ( cachePath, os.getpid() )
+    try:
+        os.makedirs( os.path.dirname( cachePath ), mode=0o775, exist_ok=True )
+        with open( tmpPath, 'wb' ) as f:
+            np.savez( f, **arrays )
+        os.replace( tmpPath, cachePath )
+        return True
+    except OSError as e:
+        print( "saveCacheArrays Error: %s: %s" % ( cachePath, e ) )
+        try:
+            os.remove( tmpPath )
+        except OSError:
+            pass
+        return False
+
+def loadCachedTestFile( testTop, filePath, testFileClass ):
+    '''Returns a testFileClass instance restored from the cache, or None.'''
+    arrays = loadCacheArrays( testTop, filePath, suffix=testFileClass.cacheSuffix )
+    if arrays is None:
+        return None
+    testFile = testFileClass( filePath, process=False )
+    testFile.setCacheArrays( arrays )
+    return testFile
+
+def saveCachedTestFile( testTop, filePath, testFile, fileKey=None ):
+    return saveCacheArrays( testTop, filePath, testFile.getCacheArrays(), fileKey=fileKey, suffix=testFile.cacheSuffix )
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import os
 import json
+import numpy as np
 from stressTestFile import *
 from stressTestPV import *
+from stressTestAggregate import *
 
 class InvalidStressTestPathError( Exception ):
     pass
@@ -47,12 +49,17 @@ class stressTestClient:
         self._clientName  = clientName
         self._hostName    = hostName
         self._testPVs     = {}      # Dict of stressTestPV instances, keys are pvName strings
-        self._tsNumPVs    = {}      # Dict of active PV counts, keys are int secPastEpoch values
-        self._tsRates     = {}      # Dict of cumulative PV collection rate for all client testPVs
-        self._tsMissRates = {}      # Dict of cumulative miss rate for all client testPVs
+        self._startSec    = None    # secPastEpoch of index 0 in the per-second rate arrays
+        self._tsNumPVs    = np.zeros( 0, dtype=np.int64 )   # Array of active PV counts per second
+        self._tsRates     = np.zeros( 0, dtype=np.int64 )   # Array of cumulative PV collection rate for all client testPVs
+        self._tsMissRates = np.zeros( 0, dtype=np.int64 )   # Array of cumulative miss rate for all client testPVs
+        self._timeoutRates= np.zeros( 0, dtype=np.int64 )   # Array of cumulative timeout rate for all client testPVs
         self._numMissed   = 0       # Number of cumulative missed counts for all client testPVs
         self._numTsValues = 0       # Number of timestamped values collected for all client testPVs
         self._numTimeouts = 0       # Cumulative number of timeouts
+        self._byteRates   = np.zeros( 0, dtype=np.float64 ) # Array of cumulative bytes read per second, for pvgetarray clients
+        self._numBytes    = 0       # Cumulative number of bytes read, for pvgetarray clients
+        self._latencyHist = stressTestHistogram()   # Merged latencies for all client testPVs
         self._startTime   = None    # Earliest timestamp of all client testPVs
         self._endTime     = None    # Latest timestamp of all client testPVs
         self._clientType  = None
@@ -80,10 +87,33 @@ class stressTestClient:
         return self._endTime
     def getStartTime( self ):
         return self._startTime
+    def getStartSec( self ):
+        '''secPastEpoch for index 0 of the per-second rate arrays.'''
+        return self._startSec
+    def getTsNumPVs( self ):
+        return self._tsNumPVs
     def getTsRates( self ):
         return self._tsRates
     def getTsMissRates( self ):
         return self._tsMissRates
+    def getTimeoutRates( self ):
+        return self._timeoutRates
+    def getByteRates( self ):
+        return self._byteRates
+    def getNumBytes( self ):
+        return self._numBytes
+    def getLatencyHist( self ):
+        return self._latencyHist
+    def getThroughput( self ):
+        '''Average MB/s read over the client's test duration, or None if no duration.'''
+        if self._startTime is None or self._endTime is None or self._endTime <= self._startTime:
+            return None
+        return self._numBytes / ( self._endTime - self._startTime ) / 1e6
+    def getPeakThroughput( self ):
+        '''Highest MB/s read in any one second, or None if no bytes were read.'''
+        if len(self._byteRates) == 0:
+            return None
+        return float( self._byteRates.max() ) / 1e6
     def getTestPVs( self ):
         return self._testPVs
     def getClientType( self ):
@@ -106,8 +136,12 @@ class stressTestClient:
         if  self._clientType != stressTestFile.getFileType():
             print(  "addTestFile Client %s, type %s Warning: Adding type %s" %
                     ( self._clientName, self._clientType, stressTestFile.getFileType() ) )
+        if stressTestFile.getSummaryArrays() is not None:
+            # Summarized file w/o raw samples
+            self.getTestPV( pvName ).addSummaryArrays( stressTestFile.getSummaryArrays() )
+            return
+        # Timeouts are flagged in the same columnar tsValues
         self.addTsValues( pvName, stressTestFile.getTsValues() )
-        self.addTimeoutValues( pvName, stressTestFile.getTsTimeouts() )
 
     # stressTestClient.addTsValues
     def addTsValues( self, pvName, tsValues ):
@@ -115,23 +149,29 @@ class stressTestClient:
         if testPV is not None:
             testPV.addTsValues( tsValues )
 
-    def addTimeoutValues( self, pvName, tsTimeouts ):
-        testPV = self.getTestPV( pvName )
-        if testPV is not None:
-            # tsTimeouts shares same [ [ timeStamp, value ] ]
-            # structure as tsValues, but value is always None
-            testPV.addTsValues( tsTimeouts )
-
     # stressTestClient.analyze
     def analyze( self ):
+        self.analyzePVs()
+        self.setAggregate( stressTestAggregate( [ self ] ) )
+
+    def analyzePVs( self ):
+        '''Analyze each testPV and update the client totals.
+        The per-second series are set separately by setAggregate(),
+        so stressTest can aggregate all clients in one pass.'''
         self._totalNumTsValues = self.getNumTsValues()
-        self._tsMissRates = { }
-        self._numMissed = 0
+        self._numMissed   = 0
+        self._numTimeouts = 0
+        self._numBytes    = 0
+        self._latencyHist = stressTestHistogram()
         self._endTime   = None
         self._startTime = None
         for pvName in self._testPVs:
             testPV = self._testPVs[pvName]
             testPV.analyze()
+            self._latencyHist.merge( testPV.getLatencyHist() )
+            if self._clientType == 'pvgetarray':
+                testPV.analyzeThroughput()
+                self._numBytes += testPV.getNumBytes()
             self._numMissed   += testPV.getNumMissed()
             self._numTimeouts += testPV.getNumTimeouts()
             if testPV.getStartTime() is not None:
@@ -141,23 +181,12 @@ class stressTestClient:
                 if  self._endTime is None or self._endTime < testPV.getEndTime():
                     self._endTime = testPV.getEndTime()
 
-            # Compute client count rates
-            pvTsRates = testPV.getTsRates()
-            for sec in pvTsRates:
-                # Initialize client dict for each sec
-                if sec not in self._tsRates:
-                    self._tsRates[sec] = 0
-                if sec not in self._tsNumPVs:
-                    self._tsNumPVs[sec] = 0
-                # Add contributions for this PV
-                self._tsRates[sec]  += pvTsRates[sec]
-                self._tsNumPVs[sec] += 1
-
-            # Compute client missed count rates
-            pvTsMissRates = testPV.getTsMissRates()
-            for sec in pvTsMissRates:
-                if sec not in self._tsMissRates:
-                    self._tsMissRates[sec] = 0
-                missRate = pvTsMissRates[sec]
-                self._tsMissRates[sec] += missRate
-
+    def setAggregate( self, aggregate ):
+        '''Set the client per-second series from a stressTestAggregate
+        that includes this client.  Series share the aggregate time axis.'''
+        self._startSec    = aggregate.getStartSec()
+        self._tsRates     = aggregate.getClientSeries( 'tsRates',     self._clientName )
+        self._tsMissRates = aggregate.getClientSeries( 'tsMissRates', self._clientName )
+        self._timeoutRates= aggregate.getClientSeries( 'timeoutRates', self._clientName )
+        self._tsNumPVs    = aggregate.getClientSeries( 'numPVs',      self._clientName )
+        self._byteRates   = aggregate.getClientSeries( 'byteRates',   self._clientName )
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+from stressTest import *
+
+# Metrics compared for each client and PV, w/ the direction that is worse
+COMPARE_METRICS = [ ( 'rate',     'Rate/s',     -1 ),  # Values per second, lower is worse
+                    ( 'missRate', 'Missed/s',   +1 ),  # Missed counts per second, higher is worse
+                    ( 'timeouts', 'Timeouts/s', +1 ),  # Timeouts per second, higher is worse
+                    ( 'mbRate',   'MB/s',       -1 ) ] # MB read per second, pvgetarray only
+
+def getWindowSum( startSec, series, fromSec, toSec ):
+    '''Sum of a dense per-second series for fromSec <= sec < toSec.'''
+    if startSec is None or len(series) == 0:
+        return 0
+    first = max( fromSec - startSec, 0 )
+    last  = min( toSec - startSec, len(series) )
+    if last <= first:
+        return 0
+    return series[ first : last ].sum()
+
+def getWindowMetrics( startSec, tsRates, missRates, timeoutRates, byteRates, fromSec, toSec ):
+    '''Returns a dict of COMPARE_METRICS per second over fromSec <= sec < toSec.'''
+    numSecs = max( toSec - fromSec, 1 )
+    return {    'rate':     getWindowSum( startSec, tsRates,      fromSec, toSec ) / numSecs,
+                'missRate': getWindowSum( startSec, missRates,    fromSec, toSec ) / numSecs,
+                'timeouts': getWindowSum( startSec, timeoutRates, fromSec, toSec ) / numSecs,
+                'mbRate':   getWindowSum( startSec, byteRates,    fromSec, toSec ) / numSecs / 1e6 }
+
+def isRegression( base, value, worse, threshold ):
+    '''True if value is worse than base by more than the threshold fraction.'''
+    if worse < 0:
+        return base > 0 and value < base * ( 1.0 - threshold )
+    return value > 0 and value > base * ( 1.0 + threshold )
+
+class stressTestCompare:
+    '''Compare analyzed stressTest instances against the first, the baseline.
+    Tests are aligned by time since each test's getStartTime(), and metrics
+    are averaged over the same window of tStart <= t < tEnd seconds,
+    by default the duration of the shortest test.'''
+    def __init__( self, tests, threshold=0.1, tStart=None, tEnd=None ):
+        self._tests     = list( tests )
+        self._threshold = threshold
+        durations = []
+        for test in self._tests:
+            if test.getStartTime() is None:
+                durations.append( 0 )
+            else:
+                durations.append( int( test.getEndTime() ) - int( test.getStartTime() ) + 1 )
+        self._tStart = int( tStart ) if tStart is not None else 0
+        self._tEnd   = int( tEnd )   if tEnd   is not None else min( durations, default=0 )
+        self._rows   = []   # ( clientName, pvName, [ metrics dict or None per test ], [ regressed metric names ] )
+        self._numRegressions = 0
+
+    def getWindow( self ):
+        return ( self._tStart, self._tEnd )
+    def getRows( self ):
+        return self._rows
+    def getNumRegressions( self ):
+        return self._numRegressions
+
+    def getTestWindow( self, test ):
+        if test.getStartTime() is None:
+            return ( 0, 0 )
+        testStartSec = int( test.getStartTime() )
+        return ( testStartSec + self._tStart, testStartSec + self._tEnd )
+
+    def compare( self ):
+        self._rows = []
+        self._numRegressions = 0
+        clientNames = []
+        for test in self._tests:
+            clientNames += [ name for name in sorted( test.getTestClients() ) if name not in clientNames ]
+        for clientName in clientNames:
+            clientMetrics = []
+            pvNames = []
+            for test in self._tests:
+                client = test.getTestClients().get( clientName )
+                if client is None:
+                    clientMetrics.append( None )
+                    continue
+                ( fromSec, toSec ) = self.getTestWindow( test )
+                clientMetrics.append( getWindowMetrics( client.getStartSec(), client.getTsRates(), client.getTsMissRates(),
+                                                        client.getTimeoutRates(), client.getByteRates(), fromSec, toSec ) )
+                pvNames += [ name for name in sorted( client.getTestPVs() ) if name not in pvNames ]
+            self.addRow( clientName, None, clientMetrics )
+            for pvName in pvNames:
+                pvMetrics = []
+                for test in self._tests:
+                    client = test.getTestClients().get( clientName )
+                    testPV = client.getTestPVs().get( pvName ) if client is not None else None
+                    if testPV is None:
+                        pvMetrics.append( None )
+                        continue
+                    ( fromSec, toSec ) = self.getTestWindow( test )
+                    pvMetrics.append( getWindowMetrics( testPV.getStartSec(), testPV.getTsRates(), testPV.getTsMissRates(),
+                                                        testPV.getTimeoutRates(), testPV.getByteRates(), fromSec, toSec ) )
+                self.addRow( clientName, pvName, pvMetrics )
+        return self._rows
+
+    def addRow( self, clientName, pvName, metrics ):
+        regressions = []
+        base = metrics[0]
+        for ( name, label, worse ) in COMPARE_METRICS:
+            for testMetrics in metrics[1:]:
+                if base is None or testMetrics is None:
+                    continue
+                if isRegression( base[name], testMetrics[name], worse, self._threshold ):
+                    regressions.append( name )
+                    break
+        if regressions and pvName is None:
+            self._numRegressions += 1
+        self._rows.append( ( clientName, pvName, metrics, regressions ) )
+
+    def report( self, level=2 ):
+        print( "\nStressTest Comparison:" )
+        print( "Baseline: %s" % self._tests[0].getTestName() )
+        for ( i, test ) in enumerate( self._tests[1:] ):
+            print( "Test %d:   %s" % ( i + 1, test.getTestName() ) )
+        print( "Window:   %d to %d sec after test start, regression threshold %.0f%%" %
+                ( self._tStart, self._tEnd, self._threshold * 100 ) )
+        for ( name, label, worse ) in COMPARE_METRICS:
+            if all( [ all( [ m is None or m[name] == 0 for m in metrics ] ) for ( c, p, metrics, r ) in self._rows ] ):
+                continue    # ex. MB/s for tests w/o pvgetarray clients
+            header = "%-34s %10s" % ( label, "Baseline" )
+            for i in range( 1, len(self._tests) ):
+                header += " %10s %7s" % ( "Test %d" % i, "Delta" )
+            print( header )
+            for ( clientName, pvName, metrics, regressions ) in self._rows:
+                if pvName is not None and level < 3:
+                    continue
+                rowName = "    %-30s" % clientName if pvName is None else "        %-26s" % pvName
+                line = "%s %10s" % ( rowName, "-" if metrics[0] is None else "%10.3f" % metrics[0][name] )
+                for testMetrics in metrics[1:]:
+                    if testMetrics is None:
+                        line += " %10s %7s" % ( "-", "" )
+                        continue
+                    line += " %10.3f" % testMetrics[name]
+                    if metrics[0] is None or metrics[0][name] == 0:
+                        line += " %7s" % ""
+                    else:
+                        line += " %+6.1f%%" % ( ( testMetrics[name] / metrics[0][name] - 1.0 ) * 100 )
+                if name in regressions:
+                    line += " REGRESSION"
+                print( line )
+        print( "Regressions: %d clients" % self._numRegressions )
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from stressTestAggregate import *
+
+# Loss series of each client, and of each PV if includePVs
+LOSS_SERIES = [ ( 'tsMissRates', 'misses' ), ( 'timeoutRates', 'timeouts' ) ]
+# Resource series correlated w/ the loss series, if captured
+GW_RESOURCES   = [ 'cpuFract', 'load', 'ds:byhost:tx', 'us:byhost:rx' ]
+HOST_RESOURCES = [ 'cpuBusy', 'cpuIowait', 'load1' ]
+NET_RESOURCES  = [ 'rxDrops', 'udpInErrors', 'udpRcvbufErrors', 'udpSockDrops', 'tcpRetransSegs', 'udpRxQueue' ]
+
+# Resource series need this many sampled seconds, and lags this many overlapping seconds
+MIN_SAMPLES = 10
+# Correlations below this aren't counted as a likely cause
+MIN_CORRELATION = 0.3
+# Max complex values per FFT block, bounds the memory used for many series
+MAX_BLOCK_VALUES = 1 << 22
+
+def normalizeRows( matrix ):
+    '''Returns ( normalized, valid, usable ): each row w/ zero mean and unit
+    variance over its sampled seconds and 0 for NaN, the sampled seconds,
+    and which rows have MIN_SAMPLES and nonzero variance.'''
+    valid   = ~np.isnan( matrix )
+    counts  = valid.sum( axis=1 )
+    means   = np.where( valid, matrix, 0.0 ).sum( axis=1 ) / np.maximum( counts, 1 )
+    normalized = np.where( valid, matrix - means[:, None], 0.0 )
+    std     = np.sqrt( ( normalized ** 2 ).sum( axis=1 ) / np.maximum( counts, 1 ) )
+    usable  = ( counts >= MIN_SAMPLES ) & ( std > 0 )
+    normalized[usable] /= std[usable, None]
+    return ( normalized, valid, usable )
+
+def laggedCorrelation( losses, resources, maxLag ):
+    '''Returns a ( numLosses, numResources, 2 * maxLag + 1 ) array of the
+    correlation of each loss series w/ each resource series at lags from
+    -maxLag to maxLag seconds.  At lag k > 0 the resource leads, i.e.
+    loss[t] is compared w/ resource[t - k].
+    Rows are on one per-second axis.  losses must be dense, resources may
+    have NaN for seconds w/o a sample.  All pairs are computed w/ FFTs, in
+    blocks of loss rows to bound memory, so thousands of series take seconds.'''
+    ( numLosses, numSecs ) = losses.shape
+    numResources = resources.shape[0]
+    lags = np.arange( -maxLag, maxLag + 1 )
+    correlation = np.full( ( numLosses, numResources, len(lags) ), np.nan )
+    if numLosses == 0 or numResources == 0 or numSecs < MIN_SAMPLES:
+        return correlation
+    ( lossNorm, lossValid, lossUsable ) = normalizeRows( losses )
+    ( resNorm,  resValid,  resUsable )  = normalizeRows( resources )
+
+    # Zero padded by at least maxLag, so lags up to maxLag don't wrap around
+    fftSize = 1 << int( np.ceil( np.log2( numSecs + maxLag ) ) )
+    lagIndex = lags % fftSize
+    resFFT = np.fft.rfft( resNorm, fftSize, axis=1 ).conj()
+    # Seconds sampled by both series at each lag, the losses being dense
+    overlap = np.fft.irfft( np.fft.rfft( np.ones( numSecs ), fftSize ) * np.fft.rfft( resValid.astype( np.float64 ), fftSize, axis=1 ).conj(),
+                            fftSize, axis=1 )[ :, lagIndex ]
+    overlap = np.round( overlap )
+    overlap[ overlap < MIN_SAMPLES ] = np.nan
+
+    blockSize = max( 1, MAX_BLOCK_VALUES // ( numResources * resFFT.shape[1] ) )
+    for first in range( 0, numLosses, blockSize ):
+        lossFFT = np.fft.rfft( lossNorm[ first : first + blockSize ], fftSize, axis=1 )
+        products = np.fft.irfft( lossFFT[:, None, :] * resFFT[None, :, :], fftSize, axis=2 )
+        correlation[ first : first + blockSize ] = products[ :, :, lagIndex ] / overlap[None, :, :]
+    correlation[ ~lossUsable ] = np.nan
+    correlation[ :, ~resUsable ] = np.nan
+    return correlation
+
+def getResourceSeries( sTest, startSec, numSecs ):
+    '''Returns ( names, matrix ) of the gateway, host and network resource
+    series of an analyzed stressTest on its aggregate's per-second axis.'''
+    names  = []
+    series = []
+    gateways = sTest.getGateways()
+    for gatewayName in sorted( gateways ):
+        for statName in GW_RESOURCES:
+            gwSeries = gateways[gatewayName].getSeries( statName )
+            if gwSeries is not None:
+                names.append( '%s %s' % ( gatewayName, statName ) )
+                series.append( gwSeries )
+    telemetry = sTest.getTelemetry()
+    for hostName in sorted( telemetry ):
+        hostTelemetry = telemetry[hostName]
+        if hostTelemetry.getNumSamples() == 0:
+            continue
+        for name in HOST_RESOURCES:
+            names.append( '%s %s' % ( hostName, name ) )
+            series.append( hostTelemetry.getHostSeries( name, startSec, numSecs ) )
+        names.append( '%s memUsed' % hostName )
+        series.append(  hostTelemetry.getHostSeries( 'memTotal', startSec, numSecs ) -
+                        hostTelemetry.getHostSeries( 'memAvailable', startSec, numSecs ) )
+        if hostTelemetry.hasNetSamples():
+            for name in NET_RESOURCES:
+                names.append( '%s %s' % ( hostName, name ) )
+                series.append( hostTelemetry.getNetSeries( name, startSec, numSecs ) )
+    matrix = np.array( series ) if len(series) else np.zeros( ( 0, numSecs ) )
+    return ( names, matrix )
+
+def getLossSeries( sTest, aggregate, includePVs=False ):
+    '''Returns ( names, matrix ) of the LOSS_SERIES w/ any losses,
+    for each client and, if includePVs, each PV, on the aggregate axis.'''
+    names  = []
+    series = []
+    startSec = aggregate.getStartSec()
+    numSecs  = aggregate.getNumSecs()
+    testClients = sTest.getTestClients()
+    for clientName in sorted( aggregate.getClientNames() ):
+        for ( seriesName, label ) in LOSS_SERIES:
+            clientSeries = aggregate.getClientSeries( seriesName, clientName )
+            if not np.any( clientSeries ):
+                continue
+            names.append( '%s %s' % ( clientName, label ) )
+            series.append( clientSeries.astype( np.float64 ) )
+            if not includePVs:
+                continue
+            testPVs = testClients[clientName].getTestPVs()
+            for pvName in sorted( testPVs ):
+                testPV = testPVs[pvName]
+                pvSeries = getPVSeries( testPV, seriesName )
+                if testPV.getStartSec() is None or not np.any( pvSeries ):
+                    continue
+                dense = np.zeros( numSecs )
+                offset = testPV.getStartSec() - startSec
+                dense[ offset : offset + len(pvSeries) ] = pvSeries
+                names.append( '%s %s %s' % ( clientName, pvName, label ) )
+                series.append( dense )
+    matrix = np.array( series ) if len(series) else np.zeros( ( 0, numSecs ) )
+    return ( names, matrix )
+
+class stressTestCorrelation:
+    '''Lagged cross-correlation of the client loss series w/ the gateway, host
+    and network resource series of an analyzed stressTest, to rank which
+    resource most likely saturates first when updates are lost.
+    For each loss and resource pair the peak correlation over lags 0 to maxLag,
+    w/ the resource leading, is the evidence for the resource as a cause.
+    Resources are ranked by that peak averaged over the loss series,
+    weighted by each series' total losses.'''
+    def __init__( self, sTest, maxLag=30, includePVs=False ):
+        self._test       = sTest
+        self._maxLag     = maxLag
+        self._includePVs = includePVs
+        self._lossNames  = []
+        self._resourceNames = []
+        self._lossTotals = np.zeros( 0 )
+        self._peakCorr   = np.zeros( ( 0, 0 ) )     # ( numLosses, numResources ) peak correlation w/ the resource leading
+        self._peakLag    = np.zeros( ( 0, 0 ), dtype=np.int64 ) # Lead in seconds of each peak
+        self._zeroCorr   = np.zeros( ( 0, 0 ) )     # Correlation at lag 0
+        self._signedLag  = np.zeros( ( 0, 0 ), dtype=np.int64 ) # Lag of the peak over all lags, < 0 if the loss leads
+        self._ranking    = []   # ( resourceName, score, numBest, numFirst, meanLead ), best first
+
+    def getLossNames( self ):
+        return self._lossNames
+    def getResourceNames( self ):
+        return self._resourceNames
+    def getPeakCorrelation( self ):
+        return self._peakCorr
+    def getPeakLag( self ):
+        return self._peakLag
+    def getSignedLag( self ):
+        '''Lag of the peak correlation over all lags, > 0 if the resource leads,
+        < 0 if the loss leads, i.e. the resource follows the loss.'''
+        return self._signedLag
+    def getRanking( self ):
+        '''List of ( resourceName, score, numBest, numFirst, meanLead ), most likely bottleneck first.
+            score       Loss weighted mean of the peak correlations
+            numBest     Loss series for which this resource has the highest peak correlation
+            numFirst    Loss series for which this resource leads by the most of those
+                        w/ a peak correlation of at least MIN_CORRELATION, i.e. saturates first
+            meanLead    Mean lead in seconds where the peak correlation is at least MIN_CORRELATION'''
+        return self._ranking
+
+    def analyze( self ):
+        aggregate = self._test.getAggregate()
+        self._ranking = []
+        if aggregate is None or aggregate.getStartSec() is None:
+            return self
+        ( self._lossNames, losses ) = getLossSeries( self._test, aggregate, includePVs=self._includePVs )
+        ( self._resourceNames, resources ) = getResourceSeries( self._test, aggregate.getStartSec(), aggregate.getNumSecs() )
+        maxLag = min( self._maxLag, aggregate.getNumSecs() // 4 )
+        correlation = laggedCorrelation( losses, resources, maxLag )
+
+        # Only lags w/ the resource leading, or in the same second, can be causes
+        leading = correlation[ :, :, maxLag: ]
+        hasCorr = np.any( ~np.isnan( leading ), axis=2 )
+        self._peakLag  = np.argmax( np.nan_to_num( leading, nan=-np.inf ), axis=2 )
+        self._peakCorr = np.where( hasCorr, np.take_along_axis( np.nan_to_num( leading ), self._peakLag[:, :, None], axis=2 )[:, :, 0], np.nan )
+        self._zeroCorr = leading[ :, :, 0 ]
+        self._signedLag = np.argmax( np.nan_to_num( correlation, nan=-np.inf ), axis=2 ) - maxLag
+        self._lossTotals = losses.sum( axis=1 )
+
+        if len(self._lossNames) == 0 or len(self._resourceNames) == 0:
+            return self
+        weights = self._lossTotals / max( self._lossTotals.sum(), 1 )
+        peak    = np.nan_to_num( self._peakCorr, nan=-np.inf )
+        strong  = peak >= MIN_CORRELATION
+        scores  = ( weights[:, None] * np.clip( np.nan_to_num( self._peakCorr ), 0.0, None ) ).sum( axis=0 )
+        best    = np.argmax( peak, axis=1 )
+        numBest = np.bincount( best[ np.any( strong, axis=1 ) ], minlength=len(self._resourceNames) )
+        first   = np.argmax( np.where( strong, self._peakLag, -1 ), axis=1 )
+        numFirst = np.bincount( first[ np.any( strong, axis=1 ) ], minlength=len(self._resourceNames) )
+        for ( j, resourceName ) in enumerate( self._resourceNames ):
+            leads = self._peakLag[ strong[:, j], j ]
+            meanLead = float( leads.mean() ) if len(leads) else None
+            self._ranking.append( ( resourceName, float( scores[j] ), int( numBest[j] ), int( numFirst[j] ), meanLead ) )
+        self._ranking.sort( key=lambda row: ( row[1], row[2] ), reverse=True )
+        return self
+
+    def report( self, level=2, numShow=10 ):
+        if len(self._ranking) == 0:
+            return
+        print( "Bottlenecks                          Score NumBest NumFirst MeanLead" )
+        #      "    RRRRRRRRRRRRRRRRRRRRRRRRRRRRRRRR SSSSS BBBBBBB FFFFFFFF LLLLLLLL" )
+        for ( resourceName, score, numBest, numFirst, meanLead ) in self._ranking[ 0 : numShow if level < 3 else None ]:
+            print( "    %-32s %5.2f %7u %8u %8s" % ( resourceName, score, numBest, numFirst,
+                    "-" if meanLead is None else "%7.1fs" % meanLead ) )
+        if level >= 3:
+            print( "Loss series                          Resource                          Peak  Lead  Lag0  PeakLag" )
+            #      "    LLLLLLLLLLLLLLLLLLLLLLLLLLLLLLLL RRRRRRRRRRRRRRRRRRRRRRRRRRRRRRRR PPPPP LLLLs ZZZZZ SSSSSSSs" )
+            for ( i, lossName ) in enumerate( self._lossNames ):
+                if not np.any( ~np.isnan( self._peakCorr[i] ) ):
+                    continue
+                j = int( np.nanargmax( self._peakCorr[i] ) )
+                print( "    %-32s %-32s %5.2f %4us %5.2f %+7ds" % ( lossName, self._resourceNames[j],
+                        self._peakCorr[i, j], self._peakLag[i, j], self._zeroCorr[i, j], self._signedLag[i, j] ) )
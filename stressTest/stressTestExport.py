@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import functools
+import json
+import os
+import sys
+import textwrap
+import numpy as np
+
+from stressTestClient import *
+from stressTestFile import *
+from stressTestGateway import isGatewayClientDir
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Export layout, for a test exported to EXPORT:
+#   EXPORT/schema.json                      Format, version and column names and types
+#   EXPORT/pvSeries/HOST/CLIENT.FORMAT      Per-second series for each PV of each client
+#   EXPORT/clientSeries/HOST/CLIENT.FORMAT  Per-second series for each client
+#   EXPORT/hostSeries.FORMAT                Per-second series for each host
+#   EXPORT/latency.FORMAT                   Latency percentiles for the whole test per PV, client, host and test
+# FORMAT is parquet if pyarrow is available, else npz w/ one array per column.
+# pvGetGateway clients capture gateway statistics, not test PVs, so they
+# aren't exported, and don't count in the host series.
+# All series tables share one schema, w/ empty names for the levels above
+# the row, ex. pvName is '' in client rows.  sec is EPICS secPastEpoch.
+# Latency columns are NaN for seconds w/o latencies, and in host rows,
+# as per-second host latencies would need all of a host's raw samples.
+EXPORT_VERSION = 2
+LATENCY_PERCENTILES = ( 50.0, 99.0, 99.9, 100.0 )
+SERIES_SCHEMA = [   ( 'testName',    'str' ),
+                    ( 'hostName',    'str' ),
+                    ( 'clientName',  'str' ),
+                    ( 'pvName',      'str' ),
+                    ( 'sec',         'int64' ),
+                    ( 'numPVs',      'int64' ),
+                    ( 'tsRate',      'int64' ),
+                    ( 'missRate',    'int64' ),
+                    ( 'timeoutRate', 'int64' ),
+                    ( 'byteRate',    'float64' ),
+                    ( 'latencyP50',  'float64' ),
+                    ( 'latencyP99',  'float64' ),
+                    ( 'latencyP999', 'float64' ),
+                    ( 'latencyMax',  'float64' ) ]
+LATENCY_SCHEMA = [  ( 'testName',    'str' ),
+                    ( 'hostName',    'str' ),
+                    ( 'clientName',  'str' ),
+                    ( 'pvName',      'str' ),
+                    ( 'count',       'int64' ),
+                    ( 'latencyP50',  'float64' ),
+                    ( 'latencyP99',  'float64' ),
+                    ( 'latencyP999', 'float64' ),
+                    ( 'latencyMax',  'float64' ),
+                    ( 'latencyMean', 'float64' ) ]
+
+def getExportFormat( exportFormat=None ):
+    '''Returns the format to write, parquet if available unless exportFormat is given.'''
+    if exportFormat is None:
+        exportFormat = 'parquet' if pyarrow is not None else 'npz'
+    if exportFormat == 'parquet' and pyarrow is None:
+        raise ImportError( "stressTestExport Error: parquet export requires pyarrow" )
+    return exportFormat
+
+def writeTable( filePath, schema, columns, exportFormat ):
+    '''Write a dict of column lists or arrays w/ the given schema.'''
+    arrays = {}
+    for ( name, dtype ) in schema:
+        if dtype == 'str':
+            arrays[name] = np.asarray( columns[name], dtype=np.str_ )
+        else:
+            arrays[name] = np.asarray( columns[name], dtype=np.dtype( dtype ) )
+    os.makedirs( os.path.dirname( filePath ), mode=0o775, exist_ok=True )
+    if exportFormat == 'parquet':
+        fields = [ ( name, pyarrow.string() if dtype == 'str' else pyarrow.from_numpy_dtype( np.dtype( dtype ) ) )
+                   for ( name, dtype ) in schema ]
+        table = pyarrow.table( [ pyarrow.array( arrays[name].tolist() if dtype == 'str' else arrays[name] )
+                                 for ( name, dtype ) in schema ], schema=pyarrow.schema( fields ) )
+        pyarrow.parquet.write_table( table, filePath )
+    else:
+        with open( filePath, 'wb' ) as f:
+            np.savez( f, **arrays )
+
+class seriesTable:
+    '''Accumulates per-second series rows in SERIES_SCHEMA.'''
+    def __init__( self, testName ):
+        self._testName = testName
+        self._columns  = { name: [] for ( name, dtype ) in SERIES_SCHEMA }
+
+    def getColumns( self ):
+        return { name: np.concatenate( self._columns[name] ) if self._columns[name] else np.zeros( 0 )
+                 for name in self._columns }
+
+    def addSeries( self, hostName, clientName, pvName, startSec, numPVs, tsRates, missRates, timeoutRates,
+                   byteRates=None, latencies=None ):
+        numSecs = len(tsRates)
+        if startSec is None or numSecs == 0:
+            return
+        def dense( series, dtype ):
+            # Pad short or missing series, ex. empty byteRates, to numSecs
+            result = np.zeros( numSecs, dtype=dtype )
+            if series is not None:
+                result[ 0 : len(series) ] = series[ 0 : numSecs ]
+            return result
+        if latencies is None:
+            latencies = np.full( ( numSecs, len(LATENCY_PERCENTILES) ), np.nan )
+        rows = {    'testName':    np.full( numSecs, self._testName ),
+                    'hostName':    np.full( numSecs, hostName ),
+                    'clientName':  np.full( numSecs, clientName ),
+                    'pvName':      np.full( numSecs, pvName ),
+                    'sec':         np.arange( numSecs, dtype=np.int64 ) + startSec,
+                    'numPVs':      dense( numPVs, np.int64 ),
+                    'tsRate':      dense( tsRates, np.int64 ),
+                    'missRate':    dense( missRates, np.int64 ),
+                    'timeoutRate': dense( timeoutRates, np.int64 ),
+                    'byteRate':    dense( byteRates, np.float64 ),
+                    'latencyP50':  latencies[:,0],
+                    'latencyP99':  latencies[:,1],
+                    'latencyP999': latencies[:,2],
+                    'latencyMax':  latencies[:,3] }
+        for name in rows:
+            self._columns[name].append( rows[name] )
+
+def getLatencyPercentiles( testPVs, startSec, numSecs ):
+    '''Per-second latency percentiles over the raw samples of all testPVs.'''
+    secs = []
+    latencies = []
+    for testPV in testPVs:
+        pvLatencies = testPV.getTsValues().getLatencies()
+        if pvLatencies is None:
+            continue
+        ( sec, nsec, values, timeouts ) = testPV.getTsValues().getArrays()
+        secs.append( sec[~timeouts] )
+        latencies.append( pvLatencies[~timeouts] )
+    if len(secs) == 0:
+        return None
+    return computeLatencyPercentiles( np.concatenate( secs ), np.concatenate( latencies ),
+                                      startSec, numSecs, LATENCY_PERCENTILES )
+
+def exportTest( testTop, exportPath, exportFormat=None, jobs=1, useCache=True, verbose=False ):
+    '''Export per-second series for each PV, client and host of the test under testTop.
+    Clients are read, analyzed and written one at a time, so memory use is
+    bounded by the largest client.  Returns the number of clients exported.'''
+    exportFormat = getExportFormat( exportFormat )
+    testTop  = os.path.normpath( testTop )
+    testName = os.path.split( testTop )[1]
+    if not os.path.isdir( testTop ):
+        raise InvalidStressTestPathError( "%s is not a directory!" % testTop )
+
+    # Group client files by ( hostName, clientName )
+    clientFiles = {}
+    for dirPath, dirs, files in os.walk( testTop, topdown=True ):
+        dirs[:] = [ d for d in dirs if not d.startswith( '.' ) ]
+        dirs.sort()
+        if isGatewayClientDir( dirPath ):
+            if verbose:
+                print( "exportTest: Skipping gateway stats in %s" % dirPath )
+            continue
+        for fileName in sorted( files ):
+            if getTestFileClass( fileName ) is None:
+                continue
+            filePath = os.path.join( dirPath, fileName )
+            ( fileTestName, hostName, appType, appName, pvName ) = pathToTestAttr( filePath )
+            if appType == "client" and pvName is not None:
+                clientFiles.setdefault( ( hostName, appName ), [] ).append( ( pvName, filePath ) )
+
+    readFile = readTestFile
+    if useCache:
+        readFile = functools.partial( readTestFile, cacheTop=testTop )
+    executor = None
+    if jobs != 1:
+        executor = concurrent.futures.ProcessPoolExecutor( max_workers=jobs if jobs else None )
+
+    hostSeries  = {}    # Per-host ( startSec, series dict ), key is hostName
+    hostHists   = {}    # Per-host stressTestHistogram, key is hostName
+    testHist    = stressTestHistogram()
+    latencyRows = { name: [] for ( name, dtype ) in LATENCY_SCHEMA }
+    def addLatencyRow( hostName, clientName, pvName, hist ):
+        if hist.getTotalCount() == 0:
+            return
+        ( p50, p99, p999 ) = hist.getPercentiles( LATENCY_PERCENTILES[0:3] )
+        row = ( testName, hostName, clientName, pvName, hist.getTotalCount(), p50, p99, p999, hist.getMax(), hist.getMean() )
+        for ( ( name, dtype ), value ) in zip( LATENCY_SCHEMA, row ):
+            latencyRows[name].append( value )
+
+    try:
+        for ( hostName, clientName ) in sorted( clientFiles ):
+            if verbose:
+                print( "exportTest: %s %s" % ( hostName, clientName ) )
+            files = clientFiles[ ( hostName, clientName ) ]
+            filePaths = [ filePath for ( pvName, filePath ) in files ]
+            testFiles = executor.map( readFile, filePaths ) if executor else map( readFile, filePaths )
+            client = stressTestClient( clientName, hostName )
+            for ( ( pvName, filePath ), testFile ) in zip( files, testFiles ):
+                if testFile is not None:
+                    client.addTestFile( pvName, testFile )
+            client.analyze()
+
+            pvTable = seriesTable( testName )
+            testPVs = client.getTestPVs()
+            for pvName in sorted( testPVs ):
+                testPV = testPVs[pvName]
+                numSecs = len(testPV.getTsRates())
+                pvTable.addSeries( hostName, clientName, pvName, testPV.getStartSec(), np.ones( numSecs ),
+                                   testPV.getTsRates(), testPV.getTsMissRates(), testPV.getTimeoutRates(),
+                                   testPV.getByteRates(), getLatencyPercentiles( [ testPV ], testPV.getStartSec(), numSecs ) )
+                addLatencyRow( hostName, clientName, pvName, testPV.getLatencyHist() )
+            writeTable( os.path.join( exportPath, 'pvSeries', hostName, clientName + '.' + exportFormat ),
+                        SERIES_SCHEMA, pvTable.getColumns(), exportFormat )
+
+            clientTable = seriesTable( testName )
+            clientTable.addSeries( hostName, clientName, '', client.getStartSec(), client.getTsNumPVs(),
+                                   client.getTsRates(), client.getTsMissRates(),
+                                   client.getTimeoutRates(), client.getByteRates(),
+                                   getLatencyPercentiles( testPVs.values(), client.getStartSec(), len(client.getTsRates()) ) )
+            writeTable( os.path.join( exportPath, 'clientSeries', hostName, clientName + '.' + exportFormat ),
+                        SERIES_SCHEMA, clientTable.getColumns(), exportFormat )
+            addLatencyRow( hostName, clientName, '', client.getLatencyHist() )
+
+            # Host series and latencies are small, so they're kept till the end
+            ( startSec, series ) = hostSeries.get( hostName, ( None, {} ) )
+            clientSeries = {    'numPVs': client.getTsNumPVs(), 'tsRates': client.getTsRates(),
+                                'missRates': client.getTsMissRates(), 'timeoutRates': client.getTimeoutRates(),
+                                'byteRates': client.getByteRates() }
+            if client.getStartSec() is not None:
+                merged = {}
+                for name in clientSeries:
+                    ( mergedStartSec, merged[name] ) = addSeries( startSec, series.get( name, np.zeros( 0 ) ),
+                                                                  client.getStartSec(), clientSeries[name] )
+                hostSeries[hostName] = ( mergedStartSec, merged )
+            hostHists.setdefault( hostName, stressTestHistogram() ).merge( client.getLatencyHist() )
+            testHist.merge( client.getLatencyHist() )
+    finally:
+        if executor is not None:
+            executor.shutdown( wait=True )
+
+    hostTable = seriesTable( testName )
+    for hostName in sorted( hostSeries ):
+        ( startSec, series ) = hostSeries[hostName]
+        hostTable.addSeries( hostName, '', '', startSec, series['numPVs'], series['tsRates'],
+                             series['missRates'], series['timeoutRates'], series['byteRates'] )
+        addLatencyRow( hostName, '', '', hostHists[hostName] )
+    addLatencyRow( '', '', '', testHist )
+    writeTable( os.path.join( exportPath, 'hostSeries.' + exportFormat ), SERIES_SCHEMA, hostTable.getColumns(), exportFormat )
+    writeTable( os.path.join( exportPath, 'latency.' + exportFormat ), LATENCY_SCHEMA, latencyRows, exportFormat )
+
+    with open( os.path.join( exportPath, 'schema.json' ), 'w' ) as f:
+        json.dump( {    'version': EXPORT_VERSION, 'format': exportFormat, 'testName': testName,
+                        'series': SERIES_SCHEMA, 'latency': LATENCY_SCHEMA }, f, indent=1 )
+    return len(clientFiles)
+
+def process_options(argv):
+    if argv is None:
+        argv = sys.argv[1:]
+    description =   'stressTestExport writes per-second PV, client and host series of a test as columnar files.\n'
+    epilog_fmt  =   '\nExamples:\n' \
+                    'stressTestExport -t PATH/TO/TEST/TOP -o PATH/TO/EXPORT\n'
+    epilog = textwrap.dedent( epilog_fmt )
+    parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
+    parser.add_argument( '-t', '--top',     action="store", required=True, help='Top directory of test results.' )
+    parser.add_argument( '-o', '--output',  action="store", default=None, help='Export directory. Defaults to TOP.export' )
+    parser.add_argument( '--format',        action="store", choices=[ 'parquet', 'npz' ], default=None,
+                                            help='Output format. Defaults to parquet if pyarrow is installed, else npz.' )
+    parser.add_argument( '-j', '--jobs',    action="store", type=int, default=1, help='Number of worker processes for reading files. 0 for one per cpu.' )
+    parser.add_argument( '--noCache',       action="store_true", help='Ignore and don\'t update the .stressTestCache of parsed files.' )
+    parser.add_argument( '-v', '--verbose', action="store_true", help='show more verbose output.' )
+
+    options = parser.parse_args( argv )
+
+    return options
+
+def main(argv=None):
+    options = process_options(argv)
+    exportPath = options.output
+    if exportPath is None:
+        exportPath = os.path.normpath( options.top ) + '.export'
+    numClients = exportTest( options.top, exportPath, exportFormat=options.format, jobs=options.jobs,
+                             useCache=not options.noCache, verbose=options.verbose )
+    print( "Exported %d clients to %s" % ( numClients, exportPath ) )
+    return 0
+
+if __name__ == '__main__':
+    status = main()
+    sys.exit(status)
@@ -5,6 +5,10 @@ import io
 import os
 import re
 import json
+import time
+import numpy as np
+from stressTestTsValues import *
+from stressTestCache import *
 
 TS_VALUE_TIMEOUT = [ [ None, None ], None ]
 
@@ -18,28 +22,146 @@ def fileGetNumLines( filePath ):
             numLines += 1
     return numLines
 
-def fixPVCaptureFile( filePath ):
-    fileLines = []
-    with open( filePath, mode='r' ) as fd:
-        for line in fd:
-            fileLines.append( line )
-    if len(fileLines) < 1:
-        return
-    lastLine = fileLines[-1]
-    if lastLine.endswith(',\n'):
-        fileLines[-1] = lastLine[0:-2] + "\n"
-        fileLines.append( "]\n" )
-
-        print( "Corrupted file: %s" % ( filePath + ".bak" ) )
-        #print( "Saving  corrupted  file as: %s\n" % ( filePath + ".bak" ) )
-        #print( "Successfully restored file: %s\n" % ( filePath ) )
-        os.rename( filePath, filePath + ".bak" )
-        with open( filePath, mode="w" ) as fw:
-            for line in fileLines:
-                fw.write( line )
-            fw.close()
-            print( "Restored  file: %s" % ( filePath ) )
-            #print( "Successfully restored file: %s\n" % ( filePath ) )
+class pvCaptureParser:
+    '''Incremental parser for pvCapture json files.
+    Text is fed in arbitrary sized chunks and each complete
+    [ [ secPastEpoch, nsec ], value ] record is returned as a
+    ( secPastEpoch, nsec, value ) tuple as soon as it is available,
+    so memory use is bounded by the chunk size, not the file size.
+    A missing closing bracket, trailing comma or partial last record,
+    as left behind when pvCapture is killed, are tolerated by close().
+    A corrupt record is skipped once a later record can be decoded,
+    and counted in getNumCorrupt().
+    '''
+    maxRecordSize = 1024 * 1024
+
+    def __init__( self, filePath=None ):
+        self._filePath  = filePath
+        self._buf       = ''
+        self._state     = 'start'   # start, record, sep or done
+        self._decoder   = json.JSONDecoder()
+        self._numRecords = 0
+        self._numCorrupt = 0
+
+    def getNumRecords( self ):
+        return self._numRecords
+    def getNumCorrupt( self ):
+        return self._numCorrupt
+    def isDone( self ):
+        return self._state == 'done'
+
+    def feed( self, text ):
+        '''Parse text appended to any unconsumed prior input.
+        Returns a list of ( secPastEpoch, nsec, value ) tuples.'''
+        self._buf += text
+        buf = self._buf
+        idx = 0
+        tsValues = []
+        while self._state != 'done':
+            while idx < len(buf) and buf[idx].isspace():
+                idx += 1
+            if idx >= len(buf):
+                break
+            if self._state == 'start':
+                if buf[idx] != '[':
+                    raise InvalidStressTestCaptureFile( "pvCaptureParser Error: %s: Expected '[' at start of file" % self._filePath )
+                idx += 1
+                self._state = 'record'
+                continue
+            if self._state == 'sep':
+                if buf[idx] == ',':
+                    idx += 1
+                    self._state = 'record'
+                    continue
+                if buf[idx] == ']':
+                    idx += 1
+                    self._state = 'done'
+                    continue
+                raise InvalidStressTestCaptureFile( "pvCaptureParser Error: %s: Expected ',' or ']' after record %d" %
+                                                    ( self._filePath, self._numRecords ) )
+            # self._state == 'record'
+            if buf[idx] == ']':
+                idx += 1
+                self._state = 'done'
+                continue
+            try:
+                ( tsValue, idx ) = self._decoder.raw_decode( buf, idx )
+            except ValueError:
+                nextIdx = self.findNextRecord( buf, idx )
+                if nextIdx is None:
+                    # Incomplete record, wait for more input
+                    if len(buf) - idx > self.maxRecordSize:
+                        raise InvalidStressTestCaptureFile( "pvCaptureParser Error: %s: Invalid record %d" %
+                                                            ( self._filePath, self._numRecords ) )
+                    break
+                # Corrupt record, skip to the next one
+                self._numCorrupt += 1
+                idx = nextIdx
+                continue
+            try:
+                timeStamp = tsValue[0]  # timeStamp should be [ secPastEpoch, nsec ]
+                tsValues.append( ( timeStamp[0], timeStamp[1], tsValue[1] ) )
+            except ( TypeError, IndexError, KeyError ):
+                raise InvalidStressTestCaptureFile( "pvCaptureParser Error: %s: Invalid tsValue in record %d: %s" %
+                                                    ( self._filePath, self._numRecords, tsValue ) )
+            self._numRecords += 1
+            self._state = 'sep'
+        self._buf = buf[idx:]
+        return tsValues
+
+    def findNextRecord( self, buf, idx ):
+        '''Returns the index of the first line after idx which starts a
+        record that can be decoded, or ends the list, else None.'''
+        while True:
+            idx = buf.find( '\n', idx )
+            if idx < 0:
+                return None
+            idx += 1
+            nextIdx = idx
+            while nextIdx < len(buf) and buf[nextIdx].isspace():
+                nextIdx += 1
+            if nextIdx >= len(buf):
+                return None
+            if buf[nextIdx] == ']':
+                return nextIdx
+            if buf[nextIdx] != '[':
+                continue
+            try:
+                self._decoder.raw_decode( buf, nextIdx )
+                return nextIdx
+            except ValueError:
+                continue
+
+    def close( self ):
+        '''Call at end of input.  Returns True if the file was complete,
+        False if it was truncated after the last complete record.'''
+        remainder = self._buf.strip()
+        if self._state == 'record' and remainder and not remainder.startswith( '[' ):
+            # Not a record cut short, so corrupt
+            self._numCorrupt += 1
+        complete = self._state == 'done' or ( self._state == 'start' and len(remainder) == 0 )
+        self._buf = ''
+        return complete
+
+def iterPVCaptureFile( filePath, chunkSize=1024*1024, parser=None ):
+    '''Generator which streams ( secPastEpoch, nsec, value ) tuples
+    from a pvCapture file without loading the whole file.
+    See readPVCaptureFile for the expected syntax.
+    Pass a pvCaptureParser as parser to check its getNumCorrupt() afterwards.'''
+    if parser is None:
+        parser = pvCaptureParser( filePath )
+    with open( filePath, 'r' ) as f:
+        while True:
+            text = f.read( chunkSize )
+            if not text:
+                break
+            for tsValue in parser.feed( text ):
+                yield tsValue
+    complete = parser.close()
+    if parser.getNumCorrupt():
+        print( "Corrupt file: %s, %d corrupt records skipped" % ( filePath, parser.getNumCorrupt() ) )
+    if not complete:
+        print( "Truncated file: %s, %d records" % ( filePath, parser.getNumRecords() ) )
 
 def readPVCaptureFile( filePath ):
     '''Capture files should follow json syntax and contain
@@ -51,21 +173,142 @@ def readPVCaptureFile( filePath ):
         [ [ 1559217327, 738206558], 8349 ],
         [ [ 1559217327, 744054279], 8350 ]
     ]
+    Truncated files missing the closing bracket are accepted as is.
     '''
     try:
-        f = open( filePath )
-        contents = json.load( f )
+        contents = []
+        for ( sec, nsec, value ) in iterPVCaptureFile( filePath ):
+            contents.append( [ [ sec, nsec ], value ] )
         return contents
+    except InvalidStressTestCaptureFile:
+        raise
     except BaseException as e:
-        f.close()
-        # Try to fix the most common json errors in PVCapture files
-        fixPVCaptureFile( filePath )
-        try:
-            f2 = open( filePath )
-            contents = json.load( f2 )
-            return contents
-        except BaseException as e:
-            raise InvalidStressTestCaptureFile( "readPVCaptureFile Error: %s: %s" % ( filePath, e ) )
+        raise InvalidStressTestCaptureFile( "readPVCaptureFile Error: %s: %s" % ( filePath, e ) )
+
+# Seconds from the POSIX epoch, 1970-01-01 UTC, to the EPICS epoch, 1990-01-01 UTC
+POSIX_TIME_AT_EPICS_EPOCH = 631152000
+
+MONTH_NUMBERS = {   'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4,  'May': 5,  'Jun': 6,
+                    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12 }
+
+# Pre-compile regular expressions for speed
+# [PV:NAME] YYYY-MM-DD HH:MM:SS[.FFF] VALUE
+pvgetRegEx   = re.compile( r"^(?:(\S+)\s+)?(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2}:\d{2})(?:\.(\d+))?\s+(\S+)" )
+# AAA bbb dd HH:MM:SS[.FFF] [zzz] YYYY, i.e. output of date
+dateRegExStr = r"\S+\s+(\S{3})\s+(\d+)\s+(\d+):(\d+):(\d+)(?:\.(\d+))?\s+(?:\S+\s+)?(\d{4})"
+# Get: DATE
+pvgetTsRegEx = re.compile( r"^Get:\s+" + dateRegExStr )
+# Read NNN bytes: DATE
+pvgetArrayReadRegEx = re.compile( r"^Read\s+(\d+)\s+bytes:\s+" + dateRegExStr )
+# Timeout: DATE
+pvgetArrayTimeoutRegEx = re.compile( r"^Timeout:\s+" + dateRegExStr )
+
+class pvgetParser:
+    '''Single pass line parser for pvget output.
+    Appends each value or timeout directly to a stressTestTsValues.
+    Local date and time strings are converted to EPICS secPastEpoch
+    w/ time.mktime(), so the local UTC offset, including any DST change,
+    is applied to each time.  Successive lines in the same second reuse
+    the last result, so no datetime objects are created per line.
+    '''
+    def __init__( self, filePath=None ):
+        self._filePath    = filePath
+        self._tsValues    = stressTestTsValues()
+        self._numLines    = 0
+        self._numTimeouts = 0       # All timeouts, including those w/o a timestamp
+        self._pvName      = None
+        self._priorTs     = None    # ( sec, nsec ) of last value or timeout
+        self._getTs       = None    # ( sec, nsec ) of last Get: line
+        self._secCache    = ( None, None, None )    # Last ( date, time, secPastEpoch ) strings and value
+
+    def getTsValues( self ):
+        return self._tsValues
+    def getNumLines( self ):
+        return self._numLines
+    def getNumTimeouts( self ):
+        return self._numTimeouts
+    def getPVName( self ):
+        return self._pvName
+    def takeTsValues( self ):
+        '''Returns the values parsed since the last call and starts a new
+        stressTestTsValues, so lines can be parsed incrementally.'''
+        tsValues = self._tsValues
+        self._tsValues = stressTestTsValues()
+        return tsValues
+
+    def getLocalSec( self, year, month, day, hh, mm, ss ):
+        '''EPICS secPastEpoch for the given local date and time.'''
+        return int( time.mktime( ( year, month, day, hh, mm, ss, 0, 0, -1 ) ) ) - POSIX_TIME_AT_EPICS_EPOCH
+
+    def getSec( self, dateStr, timeStr ):
+        '''EPICS secPastEpoch for YYYY-MM-DD and HH:MM:SS local time strings.
+        Successive lines are usually in the same second, so the last result is cached.'''
+        ( lastDate, lastTime, sec ) = self._secCache
+        if timeStr == lastTime and dateStr == lastDate:
+            return sec
+        ( YY, MM, DD ) = dateStr.split( '-' )
+        ( hh, mm, ss ) = timeStr.split( ':' )
+        sec = self.getLocalSec( int(YY), int(MM), int(DD), int(hh), int(mm), int(ss) )
+        self._secCache = ( dateStr, timeStr, sec )
+        return sec
+
+    def getDateTs( self, dateFields ):
+        '''( sec, nsec ) for the ( mon, DD, hh, mm, ss, frac, YY ) groups of dateRegExStr,
+        or None if the month isn't recognized.'''
+        ( mon, DD, hh, mm, ss, frac, YY ) = dateFields
+        month = MONTH_NUMBERS.get( mon )
+        if month is None:
+            return None
+        sec  = self.getLocalSec( int(YY), month, int(DD), int(hh), int(mm), int(ss) )
+        nsec = int( ( frac + '00000000' )[0:9] ) if frac else 0
+        return ( sec, nsec )
+
+    def parseLine( self, line ):
+        self._numLines += 1
+        match = pvgetRegEx.match( line )
+        if match:
+            ( pvName, dateStr, timeStr, frac, value ) = match.groups()
+            sec  = self.getSec( dateStr, timeStr )
+            nsec = int( ( frac + '00000000' )[0:9] ) if frac else 0
+            try:
+                value = float( value )
+            except ValueError:
+                value = None
+            if pvName:
+                self._pvName = pvName
+            # No latency, as the value timestamp is from the server clock, not the get completion
+            self._tsValues.append( sec, nsec, value )
+            self._priorTs = ( sec, nsec )
+            self._getTs   = None
+            return
+
+        if line.startswith( 'Timeout' ):
+            self._numTimeouts += 1
+            if self._getTs is not None:
+                timeStamp = self._getTs
+            elif self._priorTs is not None:
+                # Hack till I get timestamped timeouts in *.pvget
+                timeStamp = ( self._priorTs[0] + 2, self._priorTs[1] + 1 )
+            else:
+                return
+            self._tsValues.appendTimeout( timeStamp[0], timeStamp[1] )
+            self._priorTs = timeStamp
+            self._getTs   = None
+            return
+
+        # Some PVA pv's just provide one timestamp on Get: line
+        match = pvgetTsRegEx.match( line )
+        if match:
+            timeStamp = self.getDateTs( match.groups() )
+            if timeStamp is not None:
+                self._getTs = timeStamp
+            return
+        # Other lines, ex. the PV:NAME line after a Timeout, are ignored
+
+    def parseFile( self, f ):
+        for line in f:
+            self.parseLine( line )
+        return self
 
 def readpvgetFile( filePath ):
     '''pvget files are a temporary hack while pvGet app is not ready.
@@ -77,87 +320,97 @@ def readpvgetFile( filePath ):
     PV:NAME
 
     Note that a timeout generates 2 lines.
-    
-    Returns: list of tsPV
-    Each tsPV is a list of timestamp, value.
-    Each timestamp is a list of EPICS secPastEpoch, nsec.
-    Timeout instances set tsPV to [ [ None, None ], None ]
-    TODO: Convert timestamp from [sec,nsec] to float in these file readers
-    and return a list of tsValues [ floatTs, floatValue ]
-    Ex.
-    [
-        [ [ 1559217327, 738206558], 8349 ],
-        [ [ None, None], None ],
-        [ [ 1559217327, 744054279], 8350 ]
-    ]
-
-    TODO: Rework run_pvget.sh to suppress redundant pvName
-    and generate more precision in the timestamp seconds.
-    Parser could handle either by allowing pvName field
-    to be optional.  Lines w/o timeout or tsValue are ignored. 
+    The pvName field is optional, and lines w/o a timeout or tsValue
+    are ignored, except for request timestamps from date:
+    Get: AAA bbb dd HH:MM:SS zzz YYYY
+    which are used as the timestamp of a following timeout.
+    pvget output has no completion time, so no latencies are recorded.
+
+    Returns: pvgetParser w/ the parsed stressTestTsValues
+    Timestamps are local times converted to EPICS secPastEpoch, nsec.
+    Timeouts w/o a Get: timestamp are assigned the prior timestamp + 2 sec.
+    Timeouts w/o either are counted in getNumTimeouts(), but not stored.
     '''
-    pvNameRawEx = r"(\S*)"
-    dateRawEx   = r"(\d{4}-\d{2}-\d{2})"
-    floatRawEx  = r"(\d+\.?\d*)"
-    timeRawEx   = r"(\d{2}:\d{2}:\d+\.?\d*)"
-
-    pvgetRawEx  = pvNameRawEx
-    pvgetRawEx  = pvgetRawEx + r"\s+" + dateRawEx
-    pvgetRawEx  = pvgetRawEx + r"\s+" + timeRawEx
-    pvgetRawEx  = pvgetRawEx + r"\s+" + floatRawEx
-    pvgetRegEx  = re.compile( pvgetRawEx )
-
-    pvgetRawTsEx  = r"Get: \S{3}\s+(.*)$"
-    pvgetTsRegEx  = re.compile( pvgetRawTsEx )
-    #pvgetRawEx = r"\S*\s*(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d+\.?\d*)\s\+(\d+\.?\d*)"
-    epicsEpoch  = datetime.datetime( 1990, 1, 1 )
     try:
-        contents = [[]]
-        pvName =  os.path.splitext( os.path.split[1] )
-        with open(filePath, 'r') as f:
-            for line in f:
-                if line.startswith( 'Timeout' ):
-                    contents[pvName] += [ TS_VALUE_TIMEOUT ]
-                    continue
-                match = re.match( r"Read\s+\d+", line )
-                if match:
-                    # TODO: pvgetArray needs to track # of bytes read w/ ts
-                    continue
+        parser = pvgetParser( filePath )
+        with open( filePath, 'r' ) as f:
+            parser.parseFile( f )
+        return parser
+    except BaseException as e:
+        raise InvalidStressTestCaptureFile( "readpvgetFile Error: %s: %s" % ( filePath, e ) )
 
-                # Some PVA pv's just provide one timestamp on Get: line
-                # Get: AAA bbb dd HH:MM:SS zzz YYYY
-                match = pvgetRegTsEx.match( line )
-                if match:
-                    timestamp = datetime.strptime( match.group(1), "%b %d %H:%M:%S %z %Y" )
-                    if timestamp:
-                        lastTs = timestamp
-                    continue
+class pvgetArrayParser( pvgetParser ):
+    '''Single pass line parser for run_pvgetarray.sh output.
+    Each Get: request line is paired w/ the following Read or Timeout
+    completion line.  A completed get is stored as one sample at the
+    completion time, w/ the number of bytes read as the value and the
+    seconds from request to completion as the latency.
+    A timeout, or a Get: w/o a completion before the next Get:, is
+    stored as a timeout at the request time.
+    '''
+    def parseLine( self, line ):
+        self._numLines += 1
+        match = pvgetTsRegEx.match( line )
+        if match:
+            timeStamp = self.getDateTs( match.groups() )
+            if timeStamp is None:
+                return
+            if self._getTs is not None:
+                # Prior get never completed
+                self._numTimeouts += 1
+                self._tsValues.appendTimeout( self._getTs[0], self._getTs[1] )
+            self._getTs = timeStamp
+            return
 
-                # TODO: Use regex and allow pvName to be optional
-                # PV:NAME  YYYY-MM-DD HH:MM:SS.FFF   FLOAT
-                match = pvgetRegEx.match( line )
+        match = pvgetArrayReadRegEx.match( line )
+        if match:
+            timeStamp = self.getDateTs( match.groups()[1:] )
+            if timeStamp is None:
+                return
+            latency = None
+            if self._getTs is not None:
+                latency = ( timeStamp[0] - self._getTs[0] ) + ( timeStamp[1] - self._getTs[1] ) * 1e-9
+            self._tsValues.append( timeStamp[0], timeStamp[1], int( match.group(1) ), latency=latency )
+            self._priorTs = timeStamp
+            self._getTs   = None
+            return
+
+        if line.startswith( 'Timeout' ):
+            self._numTimeouts += 1
+            timeStamp = self._getTs
+            if timeStamp is None:
+                match = pvgetArrayTimeoutRegEx.match( line )
                 if match:
-                    # TODO: 3.7 adds datetime.fromisoformat
-                    ( YY, MM, DD ) = match.group(2).split('-')
-                    ( hh, mm, ss ) = match.group(3).split(':')
-                    ( YY, MM, DD ) = ( int(YY), int(MM), int(DD) )
-                    ( hh, mm, ss ) = ( int(hh), int(mm), float(ss) )
-                    ( ss, us ) = ( int(ss), int(ss/100000) )
-                    timestamp = datetime.datetime( YY, MM, DD, hh, mm, ss, us )
-                    value     = float(match.group(4))
-                    deltaEpoch = (timestamp - epicsEpoch)
-                    deltaUsec = deltaEpoch / datetime.timedelta(microseconds=1)
-                    tsEpoch = deltaUsec / 1000.0
-                    tsEpochSec = int(tsEpoch)
-                    nSec = int( (tsEpoch - tsEpochSec) * 1e9 )
-                    tsValue = [ [ tsEpochSec, nSec ], value ]
-                    if match.group(1):
-                        pvName = match.group(1)
-                    contents[pvName] += [ tsValue ]
-                    continue
-        return contents
+                    timeStamp = self.getDateTs( match.groups() )
+            if timeStamp is not None:
+                self._tsValues.appendTimeout( timeStamp[0], timeStamp[1] )
+                self._priorTs = timeStamp
+            self._getTs = None
+            return
+        # Other lines are ignored
+
+def readpvgetArrayFile( filePath ):
+    '''pvgetarray files are written by run_pvgetarray.sh, which times
+    pvget for large array PVs w/ date before and after each get.
+    Expected syntax:
+    Get: AAA bbb dd HH:MM:SS.NNNNNNNNN zzz YYYY
+    Read NNN bytes: AAA bbb dd HH:MM:SS.NNNNNNNNN zzz YYYY
+    or
+    Get: AAA bbb dd HH:MM:SS.NNNNNNNNN zzz YYYY
+    Timeout: AAA bbb dd HH:MM:SS.NNNNNNNNN zzz YYYY
+
+    Fractional seconds are optional, as written by older scripts.
+
+    Returns: pvgetArrayParser w/ the parsed stressTestTsValues
+    Values are bytes read, and latencies are seconds from Get: to Read.
+    '''
+    try:
+        parser = pvgetArrayParser( filePath )
+        with open( filePath, 'r' ) as f:
+            parser.parseFile( f )
+        return parser
     except BaseException as e:
-        raise InvalidStressTestCaptureFile( "readpvgetFile Error: %s: %s" % ( filePath, e ) )
+        raise InvalidStressTestCaptureFile( "readpvgetArrayFile Error: %s: %s" % ( filePath, e ) )
 
 def readPVGetFile( filePath ):
     '''Get files should follow json syntax and contain
@@ -178,60 +431,79 @@ def readPVGetFile( filePath ):
         raise InvalidStressTestCaptureFile( "readPVGetFile Error: %s: %s" % ( filePath, e ) )
 
 class stressTestFile:
-    def __init__( self, pathTopToFile ):
+    '''Base class for parsed test files.
+    Subclasses parse the file in __init__ unless process is False,
+    in which case the parsed arrays are expected from setCacheArrays().'''
+    cacheSuffix = '.npz'    # Suffix of the parsed arrays in the .stressTestCache
+
+    def __init__( self, pathTopToFile, process=True ):
         ( self._filePath, self._fileName ) = os.path.split( pathTopToFile )
-        self._numLines = fileGetNumLines( pathTopToFile )
-        self._tsValues = {}
-        self._tsTimeouts = {}
+        self._numLines = fileGetNumLines( pathTopToFile ) if process else 0
+        self._tsValues = stressTestTsValues()    # Columnar timestamps, values and timeout flags
         self._numTimeouts = 0
+        self._summaryArrays = None  # Summary of the analyzed file, if read w/o raw samples
+        self._numParseErrors = 0    # Parse errors and corrupt records, files w/ errors aren't cached
 
     def getFileName( self ):
-        return self._FilePath
+        return self._fileName
     def getFilePath( self ):
-        return self._FilePath
+        return self._filePath
     def getFileType( self ):
         return None
     def getNumLines( self ):
         return self._numLines
     def getNumTsValues( self ):
+        if self._summaryArrays is not None:
+            return int( self._summaryArrays['fileNumTsValues'] )
         return len(self._tsValues)
     def getTsValues( self ):
         return self._tsValues
     def getNumTimeouts( self ):
         return self._numTimeouts
-    def getTsTimeouts( self ):
-        return self._tsTimeouts
+    def getSummaryArrays( self ):
+        return self._summaryArrays
+    def getNumParseErrors( self ):
+        return self._numParseErrors
+
+    def getCacheArrays( self ):
+        '''Returns a dict of numpy arrays w/ the parsed contents of this file.
+        Subclasses w/ more parsed data should extend the dict.'''
+        ( sec, nsec, values, timeouts ) = self._tsValues.getArrays()
+        arrays = {  'sec': sec, 'nsec': nsec, 'value': values, 'timeout': timeouts,
+                    'numLines': np.int64( self._numLines ), 'numTimeouts': np.int64( self._numTimeouts ) }
+        latencies = self._tsValues.getLatencies()
+        if latencies is not None:
+            arrays['latency'] = latencies
+        return arrays
+
+    def setCacheArrays( self, arrays ):
+        '''Restore the parsed contents of this file from getCacheArrays() output.'''
+        self._tsValues = stressTestTsValues()
+        self._tsValues.addArrays( arrays['sec'], arrays['nsec'], arrays['value'], arrays['timeout'],
+                                  latencies=arrays.get( 'latency' ) )
+        self._numLines    = int( arrays['numLines'] )
+        self._numTimeouts = int( arrays['numTimeouts'] )
+
+    def setSummaryArrays( self, arrays ):
+        '''Set file stats from stressTestSummary arrays, w/o any raw samples.'''
+        self._summaryArrays = arrays
+        self._numLines    = int( arrays['numLines'] )
+        self._numTimeouts = int( arrays['fileNumTimeouts'] )
 
 class stressTestFilePVGet( stressTestFile ):
-    def __init__( self, pathTopToFile ):
-        super().__init__( pathTopToFile )
-        self.processPVGetFile( pathTopToFile )
+    def __init__( self, pathTopToFile, process=True ):
+        super().__init__( pathTopToFile, process=process )
+        if process:
+            self.processPVGetFile( pathTopToFile )
 
     def getFileType( self ):
         return "pvget"
 
     def processPVGetFile( self, pathTopToFile ):
         try:
-            #tsValueList = {}
-            self._tsTimeouts = {}
-            self._numTimeouts = 0
-            priorTs = None
-            contents = readpvgetFile( pathTopToFile )
-            #for pvName in contents:
-            #for tsValue in contents[pvName]:
-            for tsValue in contents:
-                timeStamp = tsValue[0]  # timeStamp should be [ secPastEpoch, nsec ]
-                value = tsValue[1]
-                if value is None:
-                    self._numTimeouts = self._numTimeouts + 1
-                    if timeStamp is None or timeStamp[0] is None or timeStamp[1] is None:
-                        # Hack till I get timestamped timeouts in *.pvget
-                        if priorTs is not None:
-                            timeStamp = [ priorTs[0] + 2, priorTs[1] + 1 ]
-
-                if timeStamp[0] is not None and timeStamp[1] is not None:
-                    self._tsValues[ timeStamp[0] + timeStamp[1]*1e-9 ] = value
-                    priorTs = timeStamp
+            parser = readpvgetFile( pathTopToFile )
+            self._tsValues    = parser.getTsValues()
+            self._numTimeouts = parser.getNumTimeouts()
 
         except InvalidStressTestCaptureFile as e:
             print( e )
@@ -243,26 +515,25 @@ class stressTestFilePVGet( stressTestFile ):
             #pass
 
 class stressTestFilePVCapture( stressTestFile ):
-    def __init__( self, pathTopToFile ):
-        super().__init__( pathTopToFile )
-        self.processPVCaptureFile( pathTopToFile )
+    def __init__( self, pathTopToFile, process=True ):
+        super().__init__( pathTopToFile, process=process )
+        if process:
+            self.processPVCaptureFile( pathTopToFile )
 
     def processPVCaptureFile( self, pathTopToFile ):
+        parser = pvCaptureParser( pathTopToFile )
         try:
-            tsValueList = readPVCaptureFile( pathTopToFile )
-            # super(stressTestFile, self).getTsValues( self ) = {}
-            # self._tsValues = {}
-            for tsValue in tsValueList:
-                timeStamp = tsValue[0]  # timeStamp should be [ secPastEpoch, nsec ]
-                value = tsValue[1]
-                self._tsValues[ timeStamp[0] + timeStamp[1]*1e-9 ] = value
+            # Stream the records so the json list is never held in memory
+            for ( sec, nsec, value ) in iterPVCaptureFile( pathTopToFile, parser=parser ):
+                self._tsValues.append( sec, nsec, value )
 
         except InvalidStressTestCaptureFile as e:
             print( e )
-            pass
+            self._numParseErrors += 1
         except BaseException as e:
             print( "processPVCaptureFile Error: %s: %s" % ( pathTopToFile, e ) )
-            pass
+            self._numParseErrors += 1
+        self._numParseErrors += parser.getNumCorrupt()
 
     def getFileType( self ):
         return "pvCapture"
@@ -275,53 +546,120 @@ class stressTestFilePVCapture( stressTestFile ):
 #        super().__setitem__(key, value)         # no change needed
 
 class stressTestFilePVGetArray( stressTestFile ):
-    def __init__( self, pathTopToFile ):
-        super( stressTestFile, self ).__init__( pathTopToFile )
-        self.processPVGetArrayFile( pathTopToFile )
+    def __init__( self, pathTopToFile, process=True ):
+        super().__init__( pathTopToFile, process=process )
+        if process:
+            self.processPVGetArrayFile( pathTopToFile )
     def getFileType( self ):
         return "pvgetarray"
 
     def processPVGetArrayFile( self, pathTopToFile ):
         try:
-            #tsValueList = {}
-            self._tsTimeouts = {}
-            self._numTimeouts = 0
-            priorTs = None
-            return
-            contents = readpvgetArrayFile( pathTopToFile )
-            for tsValue in contents:
-                timeStamp = tsValue[0]  # timeStamp should be [ secPastEpoch, nsec ]
-                value = tsValue[1]
-                if value is None:
-                    self._numTimeouts = self._numTimeouts + 1
-                    if timeStamp is None or timeStamp[0] is None or timeStamp[1] is None:
-                        # Hack till I get timestamped timeouts in *.pvget
-                        if priorTs is not None:
-                            timeStamp = [ priorTs[0] + 2, priorTs[1] + 1 ]
-
-                if timeStamp[0] is not None and timeStamp[1] is not None:
-                    self._tsValues[ timeStamp[0] + timeStamp[1]*1e-9 ] = value
-                    priorTs = timeStamp
+            parser = readpvgetArrayFile( pathTopToFile )
+            self._tsValues    = parser.getTsValues()
+            self._numTimeouts = parser.getNumTimeouts()
 
         except InvalidStressTestCaptureFile as e:
             print( e )
             raise
             #pass
         except BaseException as e:
-            print( "processPVGetFile Error: %s: %s" % ( pathTopToFile, e ) )
+            print( "processPVGetArrayFile Error: %s: %s" % ( pathTopToFile, e ) )
             raise
             #pass
 
+def reduceGatewayValue( value ):
+    '''Reduce a captured gateway stat value to one number.
+    Scalars are returned as is, structures by their 'value' field,
+    NTTable columns are summed over rows, and lists of names, ex. the
+    clients or cache lists, are counted.  Returns NaN if nothing numeric.'''
+    if isinstance( value, bool ):
+        return float( value )
+    if isinstance( value, ( int, float ) ):
+        return value
+    if isinstance( value, list ):
+        if all( [ isinstance( v, ( int, float ) ) for v in value ] ):
+            return sum( value )
+        return len( value )
+    if isinstance( value, dict ):
+        if 'value' in value:
+            return reduceGatewayValue( value['value'] )
+        # NTTable columns: sum the numeric ones, or count the rows
+        total   = None
+        numRows = 0
+        for column in value.values():
+            if isinstance( column, list ):
+                numRows = max( numRows, len(column) )
+                if len(column) and all( [ isinstance( v, ( int, float ) ) for v in column ] ):
+                    total = ( total or 0 ) + sum( column )
+        return total if total is not None else numRows
+    return np.nan
+
 class stressTestFileGWStats( stressTestFile ):
-    def __init__( self, pathTopToFile ):
-        super( stressTestFile, self ).__init__( pathTopToFile )
-    def getFileType( self ):
-        return "gwstats"
+    '''pvCapture file of a gateway statistics PV, captured by a pvGetGateway client.
+    Structured values are reduced to one number by reduceGatewayValue().'''
+    # Cached apart from the pvCapture arrays of the same file, w/ structured values as NaN
+    cacheSuffix = '.gwstats.npz'
 
+    def __init__( self, pathTopToFile, process=True ):
+        super().__init__( pathTopToFile, process=process )
+        if process:
+            self.processGWStatsFile( pathTopToFile )
 
-class stressTestFileGWStats( stressTestFile ):
-    def __init__( self, pathTopToFile ):
-        super( stressTestFile, self ).__init__( pathTopToFile )
     def getFileType( self ):
         return "gwstats"
 
+    def processGWStatsFile( self, pathTopToFile ):
+        parser = pvCaptureParser( pathTopToFile )
+        try:
+            for ( sec, nsec, value ) in iterPVCaptureFile( pathTopToFile, parser=parser ):
+                self._tsValues.append( sec, nsec, reduceGatewayValue( value ) )
+
+        except InvalidStressTestCaptureFile as e:
+            print( e )
+            self._numParseErrors += 1
+        except BaseException as e:
+            print( "processGWStatsFile Error: %s: %s" % ( pathTopToFile, e ) )
+            self._numParseErrors += 1
+        self._numParseErrors += parser.getNumCorrupt()
+
+def getTestFileClass( fileName ):
+    '''Returns the stressTestFile class used to read fileName,
+    or None if the file isn't a test file.'''
+    if fileName.endswith( '.pvget' ):
+        return stressTestFilePVGet
+    elif fileName.endswith( '.pvgetarray' ):
+        return stressTestFilePVGetArray
+    elif fileName.endswith( 'pvCapture' ):
+        return stressTestFilePVCapture
+    #elif fileName.endswith( '.log' ):
+        # readLogFile( fileName )
+    #elif fileName.endswith( '.list' ):
+    #   continue
+    #elif fileName.endswith( '.cfg' ):
+    #   continue
+    #elif fileName.endswith( '.info' ):
+        # readInfoFile( fileName )
+    return None
+
+def readTestFile( filePath, cacheTop=None, testFileClass=None ):
+    '''Parse one test file.  Module level so it can run in a worker process.
+    If cacheTop is the test top directory, previously parsed arrays are
+    loaded from the .stressTestCache there, and newly parsed files w/o parse
+    errors are saved to it.
+    testFileClass overrides the class from getTestFileClass(), ex. stressTestFileGWStats.'''
+    if testFileClass is None:
+        testFileClass = getTestFileClass( os.path.split( filePath )[1] )
+    if testFileClass is None:
+        return None
+    if cacheTop is None:
+        return testFileClass( filePath )
+    testFile = loadCachedTestFile( cacheTop, filePath, testFileClass )
+    if testFile is not None:
+        return testFile
+    fileKey  = getFileKey( filePath )
+    testFile = testFileClass( filePath )
+    # Parse errors aren't cached, so the file is parsed and reported again on each read
+    if testFile.getNumParseErrors() == 0:
+        saveCachedTestFile( cacheTop, filePath, testFile, fileKey=fileKey )
+    return testFile
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import codecs
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+import numpy as np
+
+from stressTestClient import *
+from stressTestFile import *
+from stressTestGateway import *
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY       = 0x00000002
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_Q_OVERFLOW   = 0x00004000
+IN_IGNORED      = 0x00008000
+IN_ISDIR        = 0x40000000
+IN_NONBLOCK     = os.O_NONBLOCK
+IN_CLOEXEC      = 0o2000000
+INOTIFY_EVENT   = struct.Struct( 'iIII' )   # wd, mask, cookie, len
+
+class inotifyWatcher:
+    '''Wait for changes under watched directories w/ Linux inotify via ctypes.
+    Raises OSError if inotify isn't available, ex. on other platforms
+    or when the per user watch limit is reached.'''
+    watchMask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__( self ):
+        libcPath = ctypes.util.find_library( 'c' )
+        self._libc = ctypes.CDLL( libcPath, use_errno=True )
+        if not hasattr( self._libc, 'inotify_init1' ):
+            raise OSError( "inotify not supported by %s" % libcPath )
+        self._fd = self._libc.inotify_init1( IN_NONBLOCK | IN_CLOEXEC )
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError( errno, "inotify_init1: %s" % os.strerror( errno ) )
+        self._wdPaths = {}  # Watched directory paths, key is watch descriptor
+
+    def addDir( self, dirPath ):
+        wd = self._libc.inotify_add_watch( self._fd, os.fsencode( dirPath ), self.watchMask )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError( errno, "inotify_add_watch %s: %s" % ( dirPath, os.strerror( errno ) ) )
+        self._wdPaths[wd] = dirPath
+
+    def wait( self, timeout ):
+        '''Wait up to timeout sec for changes.
+        Returns a list of ( path, isDir ) for changed entries,
+        or None if events were lost and everything should be checked.'''
+        ( readable, writable, exceptional ) = select.select( [ self._fd ], [], [], timeout )
+        if not readable:
+            return []
+        changes = []
+        while True:
+            try:
+                buf = os.read( self._fd, 65536 )
+            except BlockingIOError:
+                break
+            idx = 0
+            while idx + INOTIFY_EVENT.size <= len(buf):
+                ( wd, mask, cookie, nameLen ) = INOTIFY_EVENT.unpack_from( buf, idx )
+                idx += INOTIFY_EVENT.size
+                name = buf[ idx : idx + nameLen ].rstrip( b'\0' )
+                idx += nameLen
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self._wdPaths.pop( wd, None )
+                    continue
+                dirPath = self._wdPaths.get( wd )
+                if dirPath is None or not name:
+                    continue
+                changes.append( ( os.path.join( dirPath, os.fsdecode( name ) ), bool( mask & IN_ISDIR ) ) )
+        return changes
+
+    def close( self ):
+        os.close( self._fd )
+
+class pollingWatcher:
+    '''Fallback for inotifyWatcher which just sleeps, so every file is checked w/ stat.'''
+    def addDir( self, dirPath ):
+        pass
+    def wait( self, timeout ):
+        time.sleep( timeout )
+        return None
+    def close( self ):
+        pass
+
+class stressTestFileFollower:
+    '''Tail one growing test file, parsing only the bytes added since the last read.'''
+    def __init__( self, filePath ):
+        self._filePath = filePath
+        self._fileType = getTestFileClass( os.path.split( filePath )[1] )
+        self.reset()
+
+    def reset( self ):
+        self._offset  = 0
+        self._decoder = codecs.getincrementaldecoder( 'utf-8' )( errors='replace' )
+        self._partial = ''  # Unterminated last line for line based files
+        self._invalid = False   # Set on a pvCapture parse error, until the file is replaced
+        if self._fileType is stressTestFilePVCapture:
+            self._parser = pvCaptureParser( self._filePath )
+        elif self._fileType is stressTestFilePVGetArray:
+            self._parser = pvgetArrayParser( self._filePath )
+        else:
+            self._parser = pvgetParser( self._filePath )
+
+    def read( self ):
+        '''Returns a stressTestTsValues w/ the samples added since the last read,
+        or None if the file hasn't grown.'''
+        try:
+            fileSize = os.stat( self._filePath ).st_size
+        except OSError:
+            return None
+        if fileSize < self._offset:
+            # File was truncated or replaced, start over
+            self.reset()
+        if fileSize == self._offset or self._invalid:
+            return None
+        with open( self._filePath, 'rb' ) as f:
+            f.seek( self._offset )
+            data = f.read( fileSize - self._offset )
+        self._offset += len(data)
+        text = self._decoder.decode( data )
+
+        tsValues = stressTestTsValues()
+        if self._fileType is stressTestFilePVCapture:
+            try:
+                for ( sec, nsec, value ) in self._parser.feed( text ):
+                    tsValues.append( sec, nsec, value )
+            except InvalidStressTestCaptureFile as e:
+                # Skip the rest of the file, the parser would fail again on each read
+                print( "%s, skipping file" % e )
+                self._invalid = True
+            return tsValues
+        lines = ( self._partial + text ).split( '\n' )
+        self._partial = lines.pop()
+        for line in lines:
+            self._parser.parseLine( line )
+        return self._parser.takeTsValues()
+
+class stressTestPVFollowState:
+    '''Incremental per-PV state for a followed test.
+    Keeps the last valid value, so counter gaps spanning reads are counted,
+    and per-second counts for the most recent numKeep seconds.'''
+    numKeep = 60
+
+    def __init__( self, pvName ):
+        self._pvName      = pvName
+        self._lastValue   = None
+        self._curSec      = None    # Latest secPastEpoch seen
+        self._secCounts   = {}      # [ numTsValues, numMissed, numTimeouts ], key is secPastEpoch
+        self._numTsValues = 0
+        self._numMissed   = 0
+        self._numTimeouts = 0
+
+    def getNumTsValues( self ):
+        return self._numTsValues
+    def getNumMissed( self ):
+        return self._numMissed
+    def getNumTimeouts( self ):
+        return self._numTimeouts
+    def getCurSec( self ):
+        return self._curSec
+    def getSecCounts( self, sec ):
+        return self._secCounts.get( sec, [ 0, 0, 0 ] )
+
+    def addTsValues( self, tsValues ):
+        '''Update counts w/ newly read samples, assumed to be in time order.'''
+        ( sec, nsec, values, timeouts ) = tsValues.getArrays()
+        if len(sec) == 0:
+            return
+        valid = ~timeouts & ~np.isnan( values )
+        validValues = values[valid]
+        validSec    = sec[valid]
+        if self._lastValue is not None:
+            validValues = np.concatenate( ( [ self._lastValue ], validValues ) )
+        else:
+            validSec = validSec[1:]
+        if len(validValues):
+            self._lastValue = float( validValues[-1] )
+        deltas = np.diff( validValues )
+        missed = np.where( deltas > 1, deltas - 1, 0 )
+
+        # Bin the new samples by second, w/ the same rules as computeRates()
+        ( uniqueSec, inverse ) = np.unique( sec, return_inverse=True )
+        counts       = np.bincount( inverse, minlength=len(uniqueSec) )
+        timeoutCounts= np.bincount( inverse[timeouts], minlength=len(uniqueSec) )
+        missCounts   = np.bincount( np.searchsorted( uniqueSec, validSec ), weights=missed, minlength=len(uniqueSec) )
+        for i in range( len(uniqueSec) ):
+            secCounts = self._secCounts.setdefault( int(uniqueSec[i]), [ 0, 0, 0 ] )
+            secCounts[0] += int(counts[i])
+            secCounts[1] += int(round(missCounts[i]))
+            secCounts[2] += int(timeoutCounts[i])
+        self._numTsValues += len(sec)
+        self._numMissed   += int( missed.sum() )
+        self._numTimeouts += int( np.count_nonzero( timeouts ) )
+        self._curSec = max( int(sec[-1]), self._curSec or 0 )
+        for oldSec in [ s for s in self._secCounts if s < self._curSec - self.numKeep ]:
+            del self._secCounts[oldSec]
+
+class stressTestFollower:
+    '''Follow a running test, updating per-PV rates and miss counts
+    as the client files grow.  Uses inotify to wake up when files
+    change, or stat polling if inotify is unavailable or usePolling.'''
+    def __init__( self, testTop, usePolling=False, verbose=False ):
+        self._testTop   = os.path.normpath( testTop )
+        self._verbose   = verbose
+        self._files     = {}    # stressTestFileFollower instances, key is file path
+        self._pvStates  = {}    # stressTestPVFollowState instances, key is ( hostName, clientName, pvName )
+        self._watched   = set() # Watched directory paths
+        self._watcher   = None
+        if not usePolling:
+            try:
+                self._watcher = inotifyWatcher()
+            except OSError as e:
+                print( "stressTestFollower: inotify unavailable, polling instead: %s" % e )
+        if self._watcher is None:
+            self._watcher = pollingWatcher()
+
+    def getPVStates( self ):
+        return self._pvStates
+
+    def scan( self ):
+        '''Find new test files and directories under the test top.'''
+        for dirPath, dirs, files in os.walk( self._testTop, topdown=True ):
+            dirs[:] = [ d for d in dirs if not d.startswith( '.' ) ]
+            if dirPath not in self._watched:
+                try:
+                    self._watcher.addDir( dirPath )
+                except OSError as e:
+                    print( "stressTestFollower: %s, polling instead" % e )
+                    self._watcher.close()
+                    self._watcher = pollingWatcher()
+                self._watched.add( dirPath )
+            for fileName in files:
+                self.addFile( os.path.join( dirPath, fileName ) )
+
+    def addFile( self, filePath ):
+        if filePath in self._files or getTestFileClass( os.path.split( filePath )[1] ) is None:
+            return
+        try:
+            ( testName, hostName, appType, appName, pvName ) = pathToTestAttr( filePath )
+        except InvalidStressTestPathError:
+            return
+        if appType != "client" or pvName is None:
+            return
+        if isGatewayStatsDir( os.path.dirname( filePath ) ):
+            # Gateway stats aren't counters, so have no missed counts to follow
+            return
+        if self._verbose:
+            print( "stressTestFollower: Following %s" % filePath )
+        self._files[filePath] = stressTestFileFollower( filePath )
+        self._pvStates[ ( hostName, appName, pvName ) ] = stressTestPVFollowState( pvName )
+
+    def readAll( self ):
+        for filePath in self._files:
+            self.readFile( filePath )
+
+    def readFile( self, filePath ):
+        tsValues = self._files[filePath].read()
+        if tsValues is None or len(tsValues) == 0:
+            return
+        ( testName, hostName, appType, appName, pvName ) = pathToTestAttr( filePath )
+        self._pvStates[ ( hostName, appName, pvName ) ].addTsValues( tsValues )
+
+    def update( self, timeout=1.0 ):
+        '''Wait up to timeout sec for changes, then read whatever was added.'''
+        changes = self._watcher.wait( timeout )
+        if changes is None:
+            self.scan()
+            changedFiles = list( self._files )
+        else:
+            changedFiles = []
+            for ( path, isDir ) in changes:
+                if isDir:
+                    self.scan()
+                elif path not in self._files:
+                    self.addFile( path )
+                if path in self._files and path not in changedFiles:
+                    changedFiles.append( path )
+        for filePath in changedFiles:
+            self.readFile( filePath )
+
+    def report( self ):
+        '''Print one Follow: line per client and a total for the last complete second.'''
+        curSecs = [ pvState.getCurSec() for pvState in self._pvStates.values() if pvState.getCurSec() is not None ]
+        if len(curSecs) == 0:
+            print( "Follow: No values yet" )
+            return
+        sec = max( curSecs ) - 1
+        clients = {}    # [ numPVs, rate, numTsValues, numMissed, numTimeouts ], key is HOST/CLIENT
+        for ( ( hostName, clientName, pvName ), pvState ) in self._pvStates.items():
+            ( rate, missRate, timeoutRate ) = pvState.getSecCounts( sec )
+            counts = clients.setdefault( hostName + '/' + clientName, [ 0, 0, 0, 0, 0 ] )
+            for ( i, count ) in enumerate( [ 1, rate, pvState.getNumTsValues(), pvState.getNumMissed(), pvState.getNumTimeouts() ] ):
+                counts[i] += count
+        timeStr = time.strftime( "%H:%M:%S", time.localtime( sec + POSIX_TIME_AT_EPICS_EPOCH ) )
+        print( "Follow: %s Host/Client                    NumPVs  Rate/s NumTsValues NumMissed Timeouts" % timeStr )
+        total = [ 0, 0, 0, 0, 0 ]
+        for clientName in sorted( clients ):
+            counts = clients[clientName]
+            print( "Follow: %s   %-28s %6u %7u %11u %9u %8u" % ( timeStr, clientName, *counts ) )
+            total = [ t + c for ( t, c ) in zip( total, counts ) ]
+        print( "Follow: %s   %-28s %6u %7u %11u %9u %8u" % ( timeStr, "Total", *total ) )
+        sys.stdout.flush()
+
+    def close( self ):
+        self._watcher.close()
+
+def followTest( testTop, interval=1.0, usePolling=False, duration=None, verbose=False ):
+    '''Follow a running test until interrupted, or for duration sec,
+    printing client rates and miss counts every interval sec.'''
+    follower = stressTestFollower( testTop, usePolling=usePolling, verbose=verbose )
+    follower.scan()
+    follower.readAll()
+    startTime  = time.time()
+    nextReport = startTime + interval
+    try:
+        while duration is None or time.time() - startTime < duration:
+            follower.update( timeout=max( 0.0, nextReport - time.time() ) )
+            if time.time() >= nextReport:
+                follower.report()
+                nextReport = max( nextReport + interval, time.time() )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+    return follower
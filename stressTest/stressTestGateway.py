@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import os
+import numpy as np
+
+from stressTestTsValues import *
+
+# Gateway statistics PVs captured by pvGetGateway clients, w/o the TEST_GW_PREFIX,
+# as listed by testManager.generateGatewayPVLists()
+GW_PVA_STATS = [    'cache', 'clients', 'refs', 'stats',
+                    'ds:byhost:rx', 'ds:byhost:tx', 'ds:bypv:rx', 'ds:bypv:tx',
+                    'us:byhost:rx', 'us:byhost:tx', 'us:bypv:rx', 'us:bypv:tx' ]
+GW_CA_STATS  = [    'vctotal', 'pvtotal', 'connected', 'active', 'inactive', 'unconnected',
+                    'connecting', 'disconnected', 'dead', 'clientEventRate', 'clientPostRate',
+                    'existTestRate', 'loopRate', 'cpuFract', 'load', 'serverEventRate', 'serverPostRate' ]
+# Longest first, so ex. unconnected isn't matched as connected
+GW_STAT_NAMES = sorted( GW_PVA_STATS + GW_CA_STATS, key=len, reverse=True )
+
+# Fan-out metrics derived from the stats: ( label, numerator stats, denominator stats )
+# The first of each list of alternatives w/ samples is used, ex. byhost or bypv tables
+FANOUT_METRICS = {  'byteFanout':    ( 'Downstream/upstream bytes',   [ 'ds:byhost:tx', 'ds:bypv:tx' ], [ 'us:byhost:rx', 'us:bypv:rx' ] ),
+                    'eventFanout':   ( 'Client/server events',        [ 'clientEventRate' ],            [ 'serverEventRate' ] ),
+                    'eventsPerCpu':  ( 'Client events per cpuFract',  [ 'clientEventRate' ],            [ 'cpuFract' ] ),
+                    # Fraction of downstream traffic served w/o its own upstream traffic, 1 - 1 / fan-out
+                    'cacheHitRatio': ( 'Cache hit ratio',             None,                             None ) }
+
+# Stats shown in the level 2 report, if captured
+GW_REPORT_STATS = [ 'cpuFract', 'load', 'vctotal', 'pvtotal', 'clientEventRate', 'serverEventRate',
+                    'clients', 'cache', 'ds:byhost:tx', 'us:byhost:rx' ]
+
+def getGatewayStatName( pvName ):
+    '''Returns the GW_STAT_NAMES entry pvName ends w/, or None.'''
+    for statName in GW_STAT_NAMES:
+        if pvName.endswith( statName ):
+            return statName
+    return None
+
+def isGatewayStatsDir( dirPath ):
+    '''True if dirPath is a pvGetGateway client directory, whose pvs.list
+    has only gateway statistics PVs.'''
+    listPath = os.path.join( dirPath, 'pvs.list' )
+    if not os.path.isfile( listPath ):
+        return False
+    with open( listPath, 'r' ) as f:
+        pvNames = [ line.strip() for line in f if line.strip() ]
+    return len(pvNames) > 0 and all( [ getGatewayStatName( pvName ) is not None for pvName in pvNames ] )
+
+def isGatewayClientDir( dirPath ):
+    '''True if dirPath is a TEST_TOP/HOST/clients/CLIENT directory of gateway statistics.'''
+    return os.path.split( os.path.split( dirPath )[0] )[1] == "clients" and isGatewayStatsDir( dirPath )
+
+def getGaugeSeries( tsValues, startSec, numSecs ):
+    '''Returns a float64 per-second series of a sampled gauge from numSecs
+    seconds from secPastEpoch startSec.  Each second has the last value
+    sampled at or before it, NaN before the first and after the last sample.'''
+    series = np.full( numSecs, np.nan )
+    ( sec, nsec, values, timeouts ) = tsValues.getArrays()
+    valid = ~np.isnan( values ) & ~timeouts
+    if numSecs == 0 or not np.any( valid ):
+        return series
+    order  = np.lexsort( ( nsec[valid], sec[valid] ) )
+    secs   = sec[valid][order] - startSec
+    values = values[valid][order]
+    # Last sample in each second
+    ( uniqueSecs, lastIndex ) = np.unique( secs[::-1], return_index=True )
+    lastValues = values[::-1][lastIndex]
+    # Hold each value until the next sample, from the first sample or startSec
+    firstSec = min( uniqueSecs[0], 0 )
+    held = np.full( uniqueSecs[-1] - firstSec + 1, np.nan )
+    held[ uniqueSecs - firstSec ] = lastValues
+    held = held[ np.maximum.accumulate( np.where( np.isnan( held ), 0, np.arange( len(held) ) ) ) ]
+    numHeld = min( numSecs, uniqueSecs[-1] + 1 )
+    if numHeld > 0:
+        series[ 0 : numHeld ] = held[ -firstSec : -firstSec + numHeld ]
+    return series
+
+def divideSeries( numerator, denominator ):
+    '''numerator / denominator, NaN where the denominator isn't positive.'''
+    ratio = np.full( len(numerator), np.nan )
+    valid = denominator > 0
+    ratio[valid] = numerator[valid] / denominator[valid]
+    return ratio
+
+class stressTestGateway:
+    '''Per-second series of the gateway statistics captured by one pvGetGateway
+    client, on the same time axis as the client rate series, and fan-out
+    efficiency metrics derived from them.'''
+    def __init__( self, gatewayName, hostName ):
+        self._gatewayName = gatewayName
+        self._hostName    = hostName
+        self._statValues  = {}      # map of stressTestTsValues, key is stat name
+        self._startSec    = None    # secPastEpoch of index 0 in the per-second series
+        self._series      = {}      # map of per-second float64 series, key is stat or FANOUT_METRICS name
+
+    # Accessors
+    def getName( self ):
+        return self._gatewayName
+    def getHostName( self ):
+        return self._hostName
+    def getStartSec( self ):
+        return self._startSec
+    def getStatNames( self ):
+        '''Captured stats, in GW_PVA_STATS or GW_CA_STATS order.'''
+        return [ statName for statName in GW_PVA_STATS + GW_CA_STATS if statName in self._statValues ]
+    def getMetricNames( self ):
+        '''FANOUT_METRICS w/ the stats they need.'''
+        return [ name for name in FANOUT_METRICS if name in self._series ]
+    def getSeries( self, name ):
+        '''Per-second series of a stat or FANOUT_METRICS name, or None if not captured.'''
+        return self._series.get( name )
+
+    def addTestFile( self, pvName, stressTestFile ):
+        statName = getGatewayStatName( pvName ) or pvName
+        self._statValues.setdefault( statName, stressTestTsValues() ).extend( stressTestFile.getTsValues() )
+
+    def analyze( self, startSec, numSecs ):
+        '''Compute the per-second series for numSecs seconds from secPastEpoch startSec.'''
+        self._startSec = startSec
+        self._series   = {}
+        for ( statName, tsValues ) in self._statValues.items():
+            self._series[statName] = getGaugeSeries( tsValues, startSec, numSecs )
+        for ( name, ( label, numerators, denominators ) ) in FANOUT_METRICS.items():
+            if numerators is None:
+                continue
+            numerator   = next( ( self._series[stat] for stat in numerators   if stat in self._series ), None )
+            denominator = next( ( self._series[stat] for stat in denominators if stat in self._series ), None )
+            if numerator is not None and denominator is not None:
+                self._series[name] = divideSeries( numerator, denominator )
+        fanout = self._series.get( 'eventFanout', self._series.get( 'byteFanout' ) )
+        if fanout is not None:
+            self._series['cacheHitRatio'] = np.clip( 1.0 - divideSeries( np.ones( numSecs ), fanout ), 0.0, 1.0 )
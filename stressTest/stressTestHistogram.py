@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import numpy as np
+
+class stressTestHistogram:
+    '''HDR style latency histogram w/ log bucketed counts.
+    Values are recorded as integer multiples of unitSec, by default 1 usec,
+    in buckets whose width doubles each power of 2, w/ 2**subBucketBits
+    sub-buckets per power of 2.  With the default 8 bits the value returned
+    for any recorded value is within 1/128, < 1%, of the recorded value.
+    Counts are a dense int64 array, so histograms w/ the same unitSec,
+    subBucketBits and maxSec are merged by adding the arrays.
+    Values above maxSec are counted in the top bucket, but the exact
+    maximum is kept separately.
+    '''
+    def __init__( self, unitSec=1e-6, subBucketBits=8, maxSec=3600.0 ):
+        self._unitSec       = unitSec
+        self._subBucketBits = subBucketBits
+        self._subBucketHalf = 1 << ( subBucketBits - 1 )
+        self._maxUnits      = int( maxSec / unitSec )
+        self._counts        = np.zeros( self._getIndices( np.array( [ self._maxUnits ] ) )[0] + 1, dtype=np.int64 )
+        self._totalCount    = 0
+        self._minSec        = None  # Exact minimum recorded value
+        self._maxSec        = None  # Exact maximum recorded value
+        self._sumSec        = 0.0
+
+    def _getIndices( self, units ):
+        '''Vectorized counts index for int64 values in units.'''
+        # Bit length of each value, exact for values < 2**53
+        bitLengths = np.frexp( units.astype( np.float64 ) )[1].astype( np.int64 )
+        bucketIndices = np.maximum( bitLengths - self._subBucketBits, 0 )
+        subBucketIndices = units >> bucketIndices
+        return bucketIndices * self._subBucketHalf + subBucketIndices
+
+    def _getIndexValue( self, index ):
+        '''Highest value in units that maps to counts index.'''
+        bucketIndex = max( index // self._subBucketHalf - 1, 0 )
+        subBucketIndex = index - bucketIndex * self._subBucketHalf
+        return ( ( subBucketIndex + 1 ) << bucketIndex ) - 1
+
+    def isCompatible( self, other ):
+        return  self._unitSec == other._unitSec and self._subBucketBits == other._subBucketBits \
+                and self._maxUnits == other._maxUnits
+
+    # Accessors
+    def getTotalCount( self ):
+        return self._totalCount
+    def getCounts( self ):
+        return self._counts
+    def getMin( self ):
+        return self._minSec
+    def getMax( self ):
+        return self._maxSec
+    def getMean( self ):
+        if self._totalCount == 0:
+            return None
+        return self._sumSec / self._totalCount
+
+    def recordValues( self, latencies ):
+        '''Record an array of latencies in seconds.  NaN and negative values are skipped.'''
+        latencies = np.asarray( latencies, dtype=np.float64 )
+        latencies = latencies[ latencies >= 0 ]
+        if len(latencies) == 0:
+            return
+        units = np.minimum( np.rint( latencies / self._unitSec ), self._maxUnits ).astype( np.int64 )
+        self._counts += np.bincount( self._getIndices( units ), minlength=len(self._counts) )
+        self._totalCount += len(latencies)
+        self._sumSec     += float( latencies.sum() )
+        ( minSec, maxSec ) = ( float( latencies.min() ), float( latencies.max() ) )
+        self._minSec = minSec if self._minSec is None else min( self._minSec, minSec )
+        self._maxSec = maxSec if self._maxSec is None else max( self._maxSec, maxSec )
+
+    def recordValue( self, latency ):
+        self.recordValues( [ latency ] )
+
+    def merge( self, other ):
+        '''Add the counts from another compatible histogram.'''
+        if not self.isCompatible( other ):
+            raise ValueError( "stressTestHistogram.merge Error: Incompatible histogram parameters" )
+        if other._totalCount == 0:
+            return
+        self._counts     += other._counts
+        self._totalCount += other._totalCount
+        self._sumSec     += other._sumSec
+        self._minSec = other._minSec if self._minSec is None else min( self._minSec, other._minSec )
+        self._maxSec = other._maxSec if self._maxSec is None else max( self._maxSec, other._maxSec )
+
+    def getValueAtPercentile( self, percentile ):
+        '''Latency in seconds at or below which percentile % of the recorded values fall,
+        or None if the histogram is empty.'''
+        return self.getPercentiles( [ percentile ] )[0]
+
+    def getPercentiles( self, percentiles=( 50.0, 99.0, 99.9 ) ):
+        '''Returns a list of latencies in seconds, one per percentile, all None if empty.'''
+        if self._totalCount == 0:
+            return [ None ] * len(percentiles)
+        cumCounts = np.cumsum( self._counts )
+        values = []
+        for percentile in percentiles:
+            target = max( 1, int( np.ceil( percentile / 100.0 * self._totalCount ) ) )
+            index = int( np.searchsorted( cumCounts, target, side='left' ) )
+            value = self._getIndexValue( index ) * self._unitSec
+            values.append( min( max( value, self._minSec ), self._maxSec ) )
+        return values
+
+    def getArrays( self ):
+        '''Returns a dict of numpy arrays w/ the nonzero counts, for saving in an npz file.'''
+        indices = np.flatnonzero( self._counts )
+        return {    'histIndex': indices, 'histCount': self._counts[indices],
+                    'histMin': np.float64( np.nan if self._minSec is None else self._minSec ),
+                    'histMax': np.float64( np.nan if self._maxSec is None else self._maxSec ),
+                    'histSum': np.float64( self._sumSec ) }
+
+    def addArrays( self, arrays ):
+        '''Merge counts saved by getArrays() from a histogram w/ the default parameters.'''
+        counts = arrays['histCount']
+        if len(counts) == 0:
+            return
+        self._counts[ arrays['histIndex'] ] += counts
+        self._totalCount += int( counts.sum() )
+        self._sumSec     += float( arrays['histSum'] )
+        ( minSec, maxSec ) = ( float( arrays['histMin'] ), float( arrays['histMax'] ) )
+        self._minSec = minSec if self._minSec is None else min( self._minSec, minSec )
+        self._maxSec = maxSec if self._maxSec is None else max( self._maxSec, maxSec )
@@ -4,22 +4,30 @@
 #	A python tool to launch and manage EPICS CA and PVA stress tests
 #	One instance should run on each host machine which will be used in the test. 
 #
+#	Runs as a persistent agent, serving JSON line requests from testManager on a
+#	unix socket, so test clients are launched w/o a new ssh session and env setup.
+#
 #	Example:
-#		stressTestMonitor --testDir /path/to/test/top --testName yourTestName
+#		stressTestMonitor --socket /tmp/stressTestAgent.$USER.sock
 #
 #	Requested features to be added:
 #
 #==============================================================
 from __future__ import print_function
 import argparse
+import asyncio
 import io
 import datetime
 import glob
+import json
 import locale
 import os
+import pwd
 import re
 #import procServUtils
+import shutil
 import signal
+import socket
 import subprocess
 import sys
 import tempfile
@@ -54,11 +62,16 @@ class StressTest(object):
         self._pathToTestTop	= pathToTestTop
         self._clientList = []
         self._testDuration = None
-        self._testDuration = 10
         self._startTest = None
+        self._clientProcs = {}      # map of launched processes, key is clientName, value is list of [ procName, proc, port ]
+        self._clientStopTimes = {}  # map of client stop times in seconds since the epoch, key is clientName
+        self._clientLogs = {}       # map of TEST_LOG paths, key is clientName, removed once Done: is logged
 
-    def startTest( self ):
-        self._startTest = datetime.datetime.now()
+    def startTest( self, startTime=None ):
+        if startTime is None:
+            self._startTest = datetime.datetime.now()
+        else:
+            self._startTest = datetime.datetime.fromtimestamp( startTime )
         print( "Start:   %s at %s" % ( self._pathToTestTop, self._startTest.strftime("%c") ) )
         try:
             # Remove any stale stopTest file
@@ -68,16 +81,67 @@ class StressTest(object):
 
     def stopTest( self ):
         print( "Stop:    %s" % self._pathToTestTop )
-        activeTests.remove( self )
+        self.killClients()
+        if self in activeTests:
+            activeTests.remove( self )
 
-    def monitorTest( self ):
-        print( "Monitor: %s" % self._pathToTestTop )
+    def monitorTest( self, verbose=False ):
+        if verbose:
+            print( "Monitor: %s" % self._pathToTestTop )
+        currentTime = time.time()
+        for clientName in list( self._clientStopTimes ):
+            if currentTime > self._clientStopTimes[clientName]:
+                print( "Stop:    %s client %s" % ( self._pathToTestTop, clientName ) )
+                self.killClients( clientName )
+        for clientName in list( self._clientLogs ):
+            if all( [ proc.poll() is not None for ( procName, proc, port ) in self._clientProcs.get( clientName, [] ) ] ):
+                # Log the end of the client as launch_client.sh does
+                try:
+                    with open( self._clientLogs.pop( clientName ), 'a' ) as f:
+                        f.write( "Done: %s\n" % time.strftime( "%a %b %e %H:%M:%S %Z %Y" ) )
+                except OSError:
+                    pass
         stopTime = self.getStopTime()
         if stopTime:
             currentTime = datetime.datetime.now()
             if currentTime > stopTime:
                 self.stopTest()
 
+    def addClientProcs( self, clientName, procs, stopTime=None, logFile=None ):
+        '''Add a client's launched processes, a list of [ procName, proc, port ].
+        If stopTime is given, monitorTest() kills them after stopTime.
+        If logFile is given, monitorTest() appends Done: to it after they exit.'''
+        self._clientProcs[clientName] = self._clientProcs.get( clientName, [] ) + procs
+        if stopTime is not None:
+            self._clientStopTimes[clientName] = stopTime
+        if logFile is not None:
+            self._clientLogs[clientName] = logFile
+
+    def isDone( self ):
+        '''True once all launched processes have exited and no client stop is pending.'''
+        if len(self._clientProcs) == 0 or len(self._clientStopTimes) > 0 or len(self._clientLogs) > 0:
+            return False
+        return all( [ proc.poll() is not None for procs in self._clientProcs.values() for ( procName, proc, port ) in procs ] )
+
+    def killClients( self, clientName=None ):
+        '''Kill the processes for clientName, or for all clients if None.'''
+        clientNames = list( self._clientProcs ) if clientName is None else [ clientName ]
+        for name in clientNames:
+            self._clientStopTimes.pop( name, None )
+            for ( procName, proc, port ) in self._clientProcs.get( name, [] ):
+                if proc.poll() is None:
+                    proc.terminate()
+
+    def getClientStatus( self ):
+        '''Returns a dict w/ numProcs, numRunning and exitCodes for each client.'''
+        status = {}
+        for ( clientName, procs ) in self._clientProcs.items():
+            exitCodes = [ proc.poll() for ( procName, proc, port ) in procs ]
+            status[clientName] = {  'numProcs':   len(procs),
+                                    'numRunning': exitCodes.count( None ),
+                                    'exitCodes':  [ code for code in exitCodes if code is not None ] }
+        return status
+
     def getTestTop( self ):
         return self._pathToTestTop
 
@@ -160,9 +224,9 @@ def hasMacros( strWithMacros ):
         macrosFound = True
     return macrosFound
 
-def launchProcess( command, procNumber=0, procNameBase="stressTest_", basePort=40000, logDir=None, verbose=False ):
+def launchProcess( command, procNumber=0, procNameBase="stressTest_", basePort=40000, logDir=None, env=None, startTime=None, verbose=False ):
     # No I/O supported or collected for these processes
-    procEnv = os.environ
+    procEnv = dict( os.environ if env is None else env )
     procEnv['PYPROC_ID'] = "%02u" % procNumber
     procName = "%s%02u" % ( procNameBase, procNumber )
 
@@ -230,6 +294,13 @@ def launchProcess( command, procNumber=0, procNameBase="stressTest_", basePort=4
     # Finish w/ procServ connection port and process command
     procCmd.append( str(basePort + procNumber) )
     cmdArgs = ' '.join(command).split()
+    if startTime is not None:
+        # Pre-spawn the process, held by startBarrier until startTime
+        barrierCmd = [ os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'startBarrier.py' ),
+                        '--startTime', '%.6f' % startTime ]
+        if logDir is not None:
+            barrierCmd += [ '--startFile', os.path.join( logDir, procName + ".start" ) ]
+        cmdArgs = barrierCmd + [ '--' ] + cmdArgs
     if verbose:
         print( "launchProcess: %s %s\n" % ( ' '.join(procCmd), ' '.join(cmdArgs) ) )
     proc = None
@@ -254,7 +325,10 @@ def launchProcess( command, procNumber=0, procNameBase="stressTest_", basePort=4
         print( "Unknown exception thrown" )
         print( e )
         pass
-    return ( proc, proc.stdin )
+    if logFile is not None:
+        # The child has its own copy of the log file descriptor
+        logFile.close()
+    return ( proc, proc.stdin if proc is not None else None )
 
 def killProcess( proc, port, verbose=False ):
     #if verbose:
@@ -288,6 +362,8 @@ def killProcesses():
             procTuple[2] = None
         if hasattr( procInput, 'close' ):
             procInput.close()
+    for test in activeTests:
+        test.killClients()
 
 def stressTest_signal_handler( signum, frame ):
     print( "\nstressTest_signal_handler: Received signal %d" % signum )
@@ -300,15 +376,279 @@ signal.signal( signal.SIGINT,  stressTest_signal_handler )
 #signal.signal( signal.SIGKILL, stressTest_signal_handler )
 
 
+def getAgentSocket( userName ):
+    '''Default agent socket for userName, a unix socket so only local processes,
+    or testManager via a forwarded ssh connection, can send requests.
+    Each user has their own, so agents of different users don't collide.'''
+    return '/tmp/stressTestAgent.%s.sock' % userName
+
+AGENT_SOCKET = getAgentSocket( pwd.getpwuid( os.getuid() ).pw_name )
+
+def getHostEnv( verbose=False ):
+    '''Returns the env for test processes on this host.
+    Adds the paths launch_client.sh finds w/ which on every client launch,
+    looked up once here for the life of the agent.'''
+    hostEnv = dict( os.environ )
+    hostEnv['SCRIPTDIR'] = os.path.abspath( os.path.dirname( __file__ ) )
+    hostEnv['HOST_NAME'] = socket.gethostname().split( '.' )[0]
+    hostEnv['PYPROCMGR'] = os.path.join( hostEnv['SCRIPTDIR'], 'pyProcMgr.py' )
+    for ( name, exe ) in [ ( 'PROCSERV', 'procServ' ), ( 'LOADSERVER', 'loadServer' ),
+                           ( 'PVCAPTURE', 'pvCapture' ), ( 'PVGET', 'pvGet' ) ]:
+        path = shutil.which( exe )
+        if path is None:
+            print( "getHostEnv: %s not found!" % exe )
+            continue
+        hostEnv[name] = path
+    if 'LOADSERVER' in hostEnv:
+        hostEnv['LOADSERVER_BIN'] = os.path.dirname( hostEnv['LOADSERVER'] )
+        hostEnv['LOADSERVER_TOP'] = os.path.realpath( os.path.join( hostEnv['LOADSERVER_BIN'], '..', '..' ) )
+    if verbose:
+        for name in [ 'SCRIPTDIR', 'HOST_NAME', 'PROCSERV', 'LOADSERVER', 'PVCAPTURE', 'PVGET' ]:
+            print( "getHostEnv: %s=%s" % ( name, hostEnv.get( name ) ) )
+    return hostEnv
+
+def readHostMetrics( ):
+    '''Returns a dict of host load and memory metrics from /proc.'''
+    metrics = { 'numCpus': os.cpu_count() }
+    try:
+        with open( '/proc/loadavg', 'r' ) as f:
+            metrics['loadavg'] = [ float(v) for v in f.read().split()[0:3] ]
+        with open( '/proc/meminfo', 'r' ) as f:
+            for line in f:
+                fields = line.split()
+                if fields[0] in [ 'MemTotal:', 'MemAvailable:' ]:
+                    metrics[ fields[0][0:-1] ] = int( fields[1] )   # kB
+    except ( OSError, ValueError, IndexError ):
+        pass
+    return metrics
+
+def startTelemetrySampler( testHostDir, env=None ):
+    '''Start telemetrySampler for the test host directory, in its own session
+    so it outlives the agent.  It exits after the test's processes are gone.
+    env has the test ports whose socket queues are sampled.'''
+    sampler = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'telemetrySampler.py' )
+    return subprocess.Popen( [ sys.executable, sampler, '-D', testHostDir ], stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, start_new_session=True )
+
+def getSourcedEnv( scriptPath, env ):
+    '''Returns env w/ the changes made by sourcing the bash script scriptPath
+    and exporting the test env as launch_client.sh does, or None on error.'''
+    exportScript = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'exportStressTestEnv.sh' )
+    try:
+        output = subprocess.check_output( [ 'bash', '-c', 'source "$0" > /dev/null && source "$1" > /dev/null && env -0',
+                                            scriptPath, exportScript ], stdin=subprocess.DEVNULL, env=env )
+    except ( OSError, subprocess.CalledProcessError ) as e:
+        print( "getSourcedEnv Error: %s: %s" % ( scriptPath, e ) )
+        return None
+    sourcedEnv = {}
+    for entry in output.split( b'\0' ):
+        ( name, sep, value ) = entry.decode( errors='replace' ).partition( '=' )
+        if sep and name != '_':
+            sourcedEnv[name] = value
+    return sourcedEnv
+
+def logStartOfTest( env ):
+    '''Run logStartOfTest.sh into env['TEST_LOG'] as launch_client.sh does,
+    which also saves host info in env['TEST_HOST_DIR'].'''
+    logScript = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'logStartOfTest.sh' )
+    try:
+        with open( env['TEST_LOG'], 'w' ) as f:
+            subprocess.call( [ logScript ], stdin=subprocess.DEVNULL, stdout=f, stderr=subprocess.STDOUT, env=env )
+    except OSError as e:
+        print( "logStartOfTest Error: %s: %s" % ( env['TEST_LOG'], e ) )
+
+class StressTestAgent(object):
+    '''class StressTestAgent( socketPath )
+    Persistent per-host agent serving JSON line requests on a unix socket.
+    Each request is one JSON object w/ a 'cmd', answered w/ one JSON object
+    w/ 'ok' and either results or an 'error':
+        ping                        Agent host, pid and uptime
+        launch  testTop client env startTime
+                                    Launch env['TEST_N_CLIENTS'] processes of env['CLIENT_CMD'],
+                                    held until startTime, and stopped after env['TEST_DURATION']
+        kill    testTop [client]    Kill a client's processes, or all of the test's
+        status  testTop [interval]  Process status for each client and host metrics,
+                                    repeated every interval seconds if given
+        metrics                     Host metrics
+        shutdown                    Kill all processes and exit
+    '''
+    def __init__( self, socketPath=AGENT_SOCKET, testDir=None, verbose=False ):
+        self._socketPath = socketPath
+        self._testDir    = testDir
+        self._verbose    = verbose
+        self._hostEnv    = getHostEnv( verbose=verbose )
+        self._startTime  = time.time()
+        self._server     = None
+        self._samplers   = []   # telemetrySampler processes, reaped by monitorTests()
+
+    def getTest( self, testTop, create=False ):
+        for test in activeTests:
+            if testTop == test.getTestTop():
+                return test
+        if not create:
+            return None
+        test = StressTest( testTop )
+        activeTests.append( test )
+        return test
+
+    async def launchClient( self, request ):
+        testTop    = request['testTop']
+        clientName = request['client']
+        env = dict( self._hostEnv )
+        env.update( { name: str(value) for ( name, value ) in request.get( 'env', {} ).items() if isinstance( value, str ) } )
+        env['TEST_TOP']      = testTop
+        env['CLIENT_NAME']   = clientName
+        env['TEST_HOST_DIR'] = os.path.join( testTop, self._hostEnv['HOST_NAME'] )
+        env['TEST_DIR']      = os.path.join( env['TEST_HOST_DIR'], 'clients' )
+        env['TEST_LOG']      = os.path.join( env['TEST_DIR'], clientName + '.log' )
+        # See if host has custom site_setup_env.sh, sourced by launch_client.sh for each client
+        hostSetup = os.path.join( env['TEST_HOST_DIR'], 'site_setup_env.sh' )
+        loop = asyncio.get_running_loop()
+        if os.path.isfile( hostSetup ):
+            # Sourcing and logStartOfTest.sh run in the executor so other connections aren't blocked
+            env = await loop.run_in_executor( None, getSourcedEnv, hostSetup, env )
+            if env is None:
+                return { 'ok': False, 'error': 'Unable to source %s for %s' % ( hostSetup, clientName ) }
+        command = env.get( 'CLIENT_CMD' )
+        if not command:
+            return { 'ok': False, 'error': 'CLIENT_CMD not defined for %s' % clientName }
+        try:
+            count    = int(   env.get( 'TEST_N_CLIENTS', 1 ) )
+            delay    = float( env.get( 'TEST_DELAY_PER_CLIENT', 0 ) )
+            basePort = int(   env.get( 'TEST_BASEPORT', 40000 ) )
+            duration = float( env['TEST_DURATION'] ) if env.get( 'TEST_DURATION' ) else None
+        except ValueError as e:
+            return { 'ok': False, 'error': 'Invalid %s env: %s' % ( clientName, e ) }
+
+        os.makedirs( env['TEST_DIR'], mode=0o775, exist_ok=True )
+        test = self.getTest( testTop )
+        if test is None:
+            test = self.getTest( testTop, create=True )
+            self._samplers.append( startTelemetrySampler( env['TEST_HOST_DIR'], env=env ) )
+        await loop.run_in_executor( None, logStartOfTest, env )
+        # Stagger starts by TEST_DELAY_PER_CLIENT w/ startBarrier, w/o blocking the agent
+        startTime = request.get( 'startTime' ) or time.time()
+        test.startTest( startTime )
+        procs = []
+        for procNumber in range( count ):
+            ( proc, procInput ) = launchProcess( [ command ], procNumber=procNumber, procNameBase=clientName,
+                                                 basePort=basePort, logDir=env['TEST_DIR'], env=env,
+                                                 startTime=startTime + procNumber * delay, verbose=self._verbose )
+            if proc is not None:
+                procs.append( [ "%s%02u" % ( clientName, procNumber ), proc, basePort + procNumber ] )
+        stopTime = None
+        if duration is not None:
+            stopTime = startTime + ( count - 1 ) * delay + duration
+        test.addClientProcs( clientName, procs, stopTime=stopTime, logFile=env['TEST_LOG'] )
+        print( "Launched %d of %d %s processes for %s" % ( len(procs), count, clientName, testTop ), flush=True )
+        return { 'ok': len(procs) == count, 'numProcs': len(procs), 'pids': [ proc.pid for ( procName, proc, port ) in procs ],
+                 'error': None if len(procs) == count else 'Launched %d of %d processes' % ( len(procs), count ) }
+
+    def getStatus( self, request ):
+        status = { 'ok': True, 'host': self._hostEnv['HOST_NAME'], 'time': time.time(),
+                   'metrics': readHostMetrics(), 'clients': {} }
+        test = self.getTest( request.get( 'testTop' ) )
+        if test is not None:
+            status['clients'] = test.getClientStatus()
+        return status
+
+    async def handleRequest( self, request ):
+        cmd = request.get( 'cmd' )
+        if cmd == 'ping':
+            return { 'ok': True, 'host': self._hostEnv['HOST_NAME'], 'pid': os.getpid(),
+                     'uptime': time.time() - self._startTime }
+        if cmd == 'launch':
+            return await self.launchClient( request )
+        if cmd == 'kill':
+            test = self.getTest( request.get( 'testTop' ) )
+            if test is not None:
+                test.killClients( request.get( 'client' ) )
+            return { 'ok': True }
+        if cmd == 'status':
+            return self.getStatus( request )
+        if cmd == 'metrics':
+            return { 'ok': True, 'metrics': readHostMetrics() }
+        if cmd == 'shutdown':
+            killProcesses()
+            return { 'ok': True }
+        return { 'ok': False, 'error': 'Unknown cmd: %s' % cmd }
+
+    async def sendReply( self, writer, reply ):
+        writer.write( json.dumps( reply ).encode() + b'\n' )
+        await writer.drain()
+
+    async def handleConnection( self, reader, writer ):
+        try:
+            while not abortAll:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads( line )
+                    if request.get( 'cmd' ) == 'status' and request.get( 'interval' ):
+                        # Stream status until the connection closes
+                        while not abortAll:
+                            await self.sendReply( writer, self.getStatus( request ) )
+                            await asyncio.sleep( float( request['interval'] ) )
+                        break
+                    reply = await self.handleRequest( request )
+                except ( ValueError, KeyError, TypeError, AttributeError ) as e:
+                    reply = { 'ok': False, 'error': 'Invalid request: %s' % e }
+                await self.sendReply( writer, reply )
+        except ( ConnectionError, OSError, asyncio.CancelledError ):
+            # Client disconnected, or the agent is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def monitorTests( self ):
+        while not abortAll:
+            if self._testDir:
+                for f in glob.glob( os.path.join( self._testDir, "startTest" ) ):
+                    checkStartTest( f, None )
+            for test in list( activeTests ):
+                test.monitorTest( verbose=self._verbose )
+                if test.isDone():
+                    # So a rerun of the same test directory starts a new StressTest
+                    print( "Done:    %s" % test.getTestTop(), flush=True )
+                    activeTests.remove( test )
+            self._samplers = [ sampler for sampler in self._samplers if sampler.poll() is None ]
+            await asyncio.sleep( 1.0 )
+
+    async def serve( self ):
+        '''Serve requests until aborted.  Returns 1 w/o serving if another agent has the socket.'''
+        if os.path.exists( self._socketPath ):
+            try:
+                ( reader, writer ) = await asyncio.open_unix_connection( self._socketPath )
+                writer.close()
+                print( "stressTestAgent Error: Another agent is serving on %s" % self._socketPath, flush=True )
+                return 1
+            except ( ConnectionRefusedError, FileNotFoundError ):
+                # Remove the socket of an agent that didn't exit cleanly
+                os.remove( self._socketPath )
+            except OSError as e:
+                print( "stressTestAgent Error: %s: %s" % ( self._socketPath, e ), flush=True )
+                return 1
+        self._server = await asyncio.start_unix_server( self.handleConnection, path=self._socketPath )
+        # Only this user may launch processes
+        os.chmod( self._socketPath, 0o600 )
+        print( "stressTestAgent: Serving on %s" % self._socketPath, flush=True )
+        try:
+            await self.monitorTests()
+        finally:
+            self._server.close()
+            os.remove( self._socketPath )
+        return 0
+
 def process_options(argv):
     if argv is None:
         argv = sys.argv[1:]
-    description =	'stressTestMonitor supports launching one or more processes.\n' \
-                +	'Command strings w/ arguments should be quoted.\n' \
-                +	'stressTestMonitor will run as long as any of it\'s child processes are still running,\n' \
-                +	'and if killed via Ctrl-C will kill any remaining child processes.'
+    description =	'stressTestMonitor is a per-host agent which launches and kills test processes\n' \
+                +	'for testManager, and reports their status and host metrics.\n' \
+                +	'Requests are JSON lines on a unix socket, see StressTestAgent.\n' \
+                +	'If killed via Ctrl-C, stressTestMonitor will kill any remaining child processes.'
     epilog_fmt  =	'\nExamples:\n' \
-                    'stressTestMonitor -t "/path/to/testTop/*"\n'
+                    'stressTestMonitor --socket /tmp/stressTestAgent.$USER.sock\n'
     epilog = textwrap.dedent( epilog_fmt )
     parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
     #parser.add_argument( 'cmd',  help='Command to launch.  Should be an executable file.' )
@@ -320,6 +660,7 @@ def process_options(argv):
     parser.add_argument( '-n', '--name',  action="store", default="stressTest_", help='process basename, name is basename + str(procNumber)' )
     parser.add_argument( '-D', '--logDir',  action="store", default=None, help='log file directory.' )
     parser.add_argument( '-t', '--testDir', action="store", help='Path to test directory. Can contain * and other glob syntax.' )
+    parser.add_argument( '-s', '--socket',  action="store", default=AGENT_SOCKET, help='Unix socket path for agent requests.' )
 
     options = parser.parse_args( )
 
@@ -328,67 +669,11 @@ def process_options(argv):
 def main(argv=None):
     global procList
     options = process_options(argv)
-    #args = ' '.join( options.arg )
-    #if options.verbose:
-    #	print( "Full Cmd: %s %s" % ( options.cmd, args ) )
-    #	print( "logDir=%s\n" % options.logDir )
-    procNumber = 1
-    testInProcess = False
-    while True:
-        if abortAll:
-            break
-
-        #if testInProcess = True and currentTime > loadavgPriorTime + loadavgInterval:
-        #	loadavgDumpToHostLog()
-
-        startTest = False
-        startTestFiles = glob.glob( os.path.join( options.testDir, "startTest" ) )
-        for f in startTestFiles:
-            checkStartTest( f, options )
-
-        for test in activeTests:
-            test.monitorTest( )
-
-        time.sleep(1.0)
-            #clientList = getClientList()
-            #for client in clientList:
-            #	if client.host() != os.hostname():
-            #		continue
-            #testEnv = {}
-            # testEnv = readTestEnvFiles( $STRESSTEST_TOP/$TEST_NAME, testEnv )
-            # testEnv = client.testEnv()
-            # client.setup()
-            # client.launch()
-            #try:
-            #	( proc, procInput ) = launchProcess( [ options.cmd ] + options.arg,
-            #								procNameBase=options.name,
-            #								basePort=options.port,
-            #								logDir=options.logDir,
-            #	if proc is not None:
-            #		procNumber += 1
-            #		procList.append( [ proc, procInput, options.port + procNumber ] )
-            #								verbose=options.verbose )
-            #except BaseException as e:
-            #	print( "Error launching proc %d: %s %s" % ( procNumber, options.cmd, args ) )
-            #	break
-
-        # if currentTime >= startTime + testDuration:
-            #for client in clientList:
-            #	if client.host() != os.hostname():
-            #		continue
-            #	if currentTime >= client.stopTime()
-            #		client.stop()
-
-        #if getNumActiveClients() == 0:
-        #	testInProcess = False
-
-    #time.sleep(1)
-    #print( "Waiting for %d processes:" % len(procList) )
-    #for procTuple in procList:
-    #	procTuple[0].wait()
+    agent = StressTestAgent( options.socket, testDir=options.testDir, verbose=options.verbose )
+    status = asyncio.run( agent.serve() )
 
     print( "Done:" )
-    return 0
+    return status
 
 if __name__ == '__main__':
     status = 0
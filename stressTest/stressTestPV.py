@@ -1,21 +1,32 @@
 #!/usr/bin/env python3
+import numpy as np
+from stressTestTsValues import *
+from stressTestRates import *
+from stressTestHistogram import *
 
 class stressTestPV:
     def __init__( self, pvName ):
         self._pvName = pvName
-        self._tsValues    = {}      # Dict of collected values,   keys are float timestamps
-        self._tsRates     = {}      # Dict of collection rates,   keys are int secPastEpoch values
-        self._tsMissRates = {}      # Dict of missed count rates, keys are int secPastEpoch values
-        self._timeoutRates= {}      # Dict of timeout rates, keys are int secPastEpoch values
+        self._tsValues    = stressTestTsValues()  # Columnar collected values, timestamps and timeout flags
+        self._startSec    = None    # secPastEpoch of index 0 in the per-second rate arrays
+        self._tsRates     = np.zeros( 0, dtype=np.int64 )   # Array of collection rates per second
+        self._tsMissRates = np.zeros( 0, dtype=np.int64 )   # Array of missed count rates per second
+        self._timeoutRates= np.zeros( 0, dtype=np.int64 )   # Array of timeout rates per second
+        self._byteRates   = np.zeros( 0, dtype=np.float64 ) # Array of bytes read per second, for pvgetarray PVs
+        self._numBytes    = 0       # Cumulative number of bytes read, for pvgetarray PVs
+        self._latencyHist = stressTestHistogram()   # Request to response latencies
         self._numMissed   = 0       # Cumulative number of missed counts
         self._numTimeouts = 0       # Cumulative number of timeouts
         self._startTime   = None    # Earliest timestamp of all collected values
         self._endTime     = None    # Latest   timestamp of all collected values
+        self._numSummaryValues = None   # Number of values, if analyzed from summary arrays w/o tsValues
 
     # Accessors
     def getName( self ):
         return self._pvName
     def getNumTsValues( self ):
+        if self._numSummaryValues is not None:
+            return self._numSummaryValues
         return len(self._tsValues)
     def getNumMissed( self ):
         return self._numMissed
@@ -25,6 +36,9 @@ class stressTestPV:
         return self._endTime;
     def getStartTime( self ):
         return self._startTime;
+    def getStartSec( self ):
+        '''secPastEpoch for index 0 of the per-second rate arrays.'''
+        return self._startSec
     def getTsValues( self ):
         return self._tsValues
     def getTsRates( self ):
@@ -33,59 +47,83 @@ class stressTestPV:
         return self._tsMissRates
     def getTimeoutRates( self ):
         return self._timeoutRates
+    def getByteRates( self ):
+        return self._byteRates
+    def getNumBytes( self ):
+        return self._numBytes
+    def getLatencyHist( self ):
+        return self._latencyHist
 
     def addTsValues( self, tsValues ):
-        # TODO: check for more than one value for the same timestamp
-        self._tsValues.update( tsValues )
+        '''Add a stressTestTsValues instance.
+        Timeouts are flagged in the same arrays as the values.'''
+        self._tsValues.extend( tsValues )
 
-    def addTsTimeouts( self, tsTimeouts ):
-        self._tsTimeouts.update( tsTimeouts )
+    def getSummaryArrays( self ):
+        '''Returns a dict of numpy arrays w/ the analysis results, call after analyze().
+        Restoring these w/ addSummaryArrays() gives the same counts, rates
+        and latencies w/o the raw samples.'''
+        arrays = {  'numTsValues': np.int64( self.getNumTsValues() ),
+                    'startSec': np.int64( -1 if self._startSec is None else self._startSec ),
+                    'startTime': np.float64( np.nan if self._startTime is None else self._startTime ),
+                    'endTime': np.float64( np.nan if self._endTime is None else self._endTime ),
+                    'tsRates': self._tsRates, 'tsMissRates': self._tsMissRates,
+                    'timeoutRates': self._timeoutRates, 'byteRates': self._byteRates }
+        arrays.update( self._latencyHist.getArrays() )
+        return arrays
+
+    def addSummaryArrays( self, arrays ):
+        '''Add analysis results saved by getSummaryArrays() in place of raw samples.
+        analyze() leaves these results as is.'''
+        startSec = int( arrays['startSec'] )
+        self._numSummaryValues = ( self._numSummaryValues or 0 ) + int( arrays['numTsValues'] )
+        self._latencyHist.addArrays( arrays )
+        if startSec < 0:
+            return
+        startSecs = {}
+        for name in [ 'tsRates', 'tsMissRates', 'timeoutRates', 'byteRates' ]:
+            attr = '_' + name
+            ( startSecs[name], merged ) = addSeries( self._startSec, getattr( self, attr ), startSec, arrays[name] )
+            setattr( self, attr, merged )
+        self._startSec = startSecs['tsRates']
+        if len(self._byteRates) and startSecs['byteRates'] != self._startSec:
+            # Keep bytes on the same time axis as the rates
+            padding = np.zeros( startSecs['byteRates'] - self._startSec, dtype=self._byteRates.dtype )
+            self._byteRates = np.concatenate( ( padding, self._byteRates ) )
+        self._numMissed   = int( self._tsMissRates.sum() )
+        self._numTimeouts = int( self._timeoutRates.sum() )
+        self._numBytes    = int( self._byteRates.sum() )
+        startTime = float( arrays['startTime'] )
+        endTime   = float( arrays['endTime'] )
+        self._startTime = startTime if self._startTime is None else min( self._startTime, startTime )
+        self._endTime   = endTime   if self._endTime   is None else max( self._endTime,   endTime )
 
     # stressTestPV.analyze
     def analyze( self ):
-        ( priorSec, priorValue ) = ( None, None )
-        ( count, missed, timeouts ) = ( 0, 0, 0 )
-        sec = None
-        for timestamp in self._tsValues:
-            sec = int(timestamp)
-            if priorSec is None:
-                self._endTime   = timestamp
-                self._startTime = timestamp
-                priorSec = sec - 1
-            if sec != priorSec:
-                if  self._endTime < sec:
-                    self._endTime = sec
-                self._tsRates[priorSec] = count
-                self._tsMissRates[priorSec] = missed
-                self._timeoutRates[priorSec] = timeouts
-                self._numMissed += missed
-                self._numTimeouts += timeouts
-                ( count, missed, timeouts ) = ( 0, 0, 0 )
-                # Advance priorSec, filling gaps w/ zeroes
-                while True:
-                    priorSec += 1
-                    if priorSec >= sec:
-                        break
-                    self._tsRates[priorSec] = 0
-                    self._tsMissRates[priorSec] = 0
-                    self._timeoutRates[priorSec] = 0
-                priorSec = sec
-            count += 1
-            value = self._tsValues[timestamp]
-            if value is None:
-                timeouts += 1
-                continue
-            if priorValue is not None:
-                if priorValue + 1 != value:
-                    # Keep track of miss incidents
-                    #missed += 1
-                    # or
-                    # Keep track of how many we missed
-                    missed += ( value - priorValue + 1 )
-            priorValue = value
-
-        if sec:
-            self._tsRates[sec] = count
-            self._tsMissRates[sec] = missed
-            self._timeoutRates[sec] = timeouts
+        if self._numSummaryValues is not None:
+            # Already analyzed from summary arrays
+            return
+        # Sorting also drops duplicate timestamps
+        self._tsValues.sort()
+        ( sec, nsec, values, timeouts ) = self._tsValues.getArrays()
+        ( self._startSec, self._tsRates, self._tsMissRates, self._timeoutRates ) = computeRates( sec, values, timeouts )
+        self._numMissed   = int( self._tsMissRates.sum() )
+        self._numTimeouts = int( self._timeoutRates.sum() )
+        self._latencyHist = stressTestHistogram()
+        latencies = self._tsValues.getLatencies()
+        if latencies is not None:
+            self._latencyHist.recordValues( latencies[ ~timeouts ] )
+        if self._startSec is None:
+            ( self._startTime, self._endTime ) = ( None, None )
+            return
+        self._startTime = sec[0]  + nsec[0]  * 1e-9
+        self._endTime   = sec[-1] + nsec[-1] * 1e-9
 
+    def analyzeThroughput( self ):
+        '''Compute per-second bytes read for PVs whose values are byte counts,
+        ex. pvgetarray Read lines.  Call after analyze().'''
+        if self._numSummaryValues is not None:
+            return
+        ( sec, nsec, values, timeouts ) = self._tsValues.getArrays()
+        self._byteRates = computeSums( sec, values, timeouts, startSec=self._startSec, numSecs=len(self._tsRates) )
+        self._numBytes  = int( self._byteRates.sum() )
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import numpy as np
+import matplotlib
+import matplotlib.collections
+import matplotlib.pyplot as plt
+
+from stressTestAggregate import *
+
+# Plot modes for the per-second series
+PLOT_MODES = [ 'pv', 'client', 'host', 'band' ]
+
+# Total points drawn for all PV lines, each line gets at least 2 * MIN_LINE_BINS
+MAX_PLOT_POINTS = 200000
+MIN_LINE_BINS   = 32
+
+# Series plotted by each rate plot: ( series name, title, client types or None for all )
+RATE_PLOTS = {  'rates':    ( 'tsRates',      'PV Rates',               [ 'pvCapture' ] ),
+                'misses':   ( 'tsMissRates',  'PV Missed Count Rates',  None ),
+                'timeouts': ( 'timeoutRates', 'pvget timeout Rates',    [ 'pvget', 'pvgetarray' ] ) }
+
+def useStyle():
+    '''Use the whitegrid style, renamed seaborn-v0_8-whitegrid in matplotlib 3.6.'''
+    for style in [ 'seaborn-whitegrid', 'seaborn-v0_8-whitegrid' ]:
+        try:
+            matplotlib.style.use( style )
+            return
+        except OSError:
+            continue
+
+def decimateMinMax( times, values, numBins ):
+    '''Reduce a series to at most 2 * numBins points, keeping the min and max
+    of each bin in time order, so spikes survive at any zoom out.
+    Returns ( times, values ), unchanged if already small enough.'''
+    numValues = len(values)
+    if numBins <= 0 or numValues <= 2 * numBins:
+        return ( times, values )
+    binSize = int( np.ceil( numValues / numBins ) )
+    numFull = numValues // binSize
+    starts  = np.arange( numFull ) * binSize
+    bins    = values[ 0 : numFull * binSize ].reshape( numFull, binSize )
+    iMin = starts + np.argmin( bins, axis=1 )
+    iMax = starts + np.argmax( bins, axis=1 )
+    indices = [ np.minimum( iMin, iMax ), np.maximum( iMin, iMax ) ]
+    indices = np.stack( indices, axis=1 ).ravel()
+    if numFull * binSize < numValues:
+        rest = np.arange( numFull * binSize, numValues )
+        indices = np.concatenate( ( indices, [ rest[ np.argmin( values[rest] ) ], rest[ np.argmax( values[rest] ) ] ] ) )
+        indices = np.unique( indices )
+    return ( times[indices], values[indices] )
+
+def getPixelWidth( fig, ax ):
+    '''Width of the axes in pixels, the useful number of decimation bins.'''
+    return max( int( ax.get_position().width * fig.get_figwidth() * fig.dpi ), 1 )
+
+def getPlotPVs( sTest, clientTypes=None ):
+    '''Returns a sorted list of ( clientName, pvName, testPV ) to plot.'''
+    plotPVs = []
+    testClients = sTest.getTestClients()
+    for clientName in sorted( testClients ):
+        client = testClients[clientName]
+        if clientTypes is not None and client.getClientType() not in clientTypes:
+            continue
+        testPVs = client.getTestPVs()
+        for pvName in sorted( testPVs ):
+            plotPVs.append( ( clientName, pvName, testPVs[pvName] ) )
+    return plotPVs
+
+def getPVMatrix( plotPVs, seriesName, startSec, numSecs ):
+    '''Returns a ( numPVs, numSecs ) float64 array of one series for each PV
+    on the common time axis, w/ NaN outside each PV's samples.'''
+    matrix = np.full( ( len(plotPVs), numSecs ), np.nan )
+    for ( row, ( clientName, pvName, testPV ) ) in enumerate( plotPVs ):
+        pvStartSec = testPV.getStartSec()
+        if pvStartSec is None:
+            continue
+        series = getPVSeries( testPV, seriesName )
+        offset = pvStartSec - startSec
+        matrix[ row, offset : offset + len(series) ] = series
+    return matrix
+
+def makeRatePlot( sTest, plotName, mode='pv', maxLegend=10 ):
+    '''Returns a figure w/ one of the RATE_PLOTS series, or None if there's nothing to plot.
+    mode is one of PLOT_MODES:
+        pv      One decimated line per PV
+        client  Sum over each client's PVs
+        host    Sum over each host's clients
+        band    Median and 5th to 95th percentile band across PVs
+    '''
+    ( seriesName, title, clientTypes ) = RATE_PLOTS[plotName]
+    aggregate = sTest.getAggregate()
+    if aggregate is None or aggregate.getStartSec() is None:
+        return None
+    startSec  = aggregate.getStartSec()
+    numSecs   = aggregate.getNumSecs()
+    startTime = sTest.getStartTime()
+    timeZero  = int(startTime) if startTime else startSec
+
+    fig, ax = plt.subplots( 1, 1 )
+    ax.set_title( 'stressTest %s %s' % ( sTest.getTestName(), title ) )
+    ax.set_xlabel( 'Seconds since test start' )
+    numBins = getPixelWidth( fig, ax )
+    times = np.arange( numSecs, dtype=np.float64 ) + ( startSec - timeZero )
+
+    lines  = []     # ( label, times, values )
+    if mode == 'pv':
+        plotPVs = getPlotPVs( sTest, clientTypes )
+        # Fewer bins per line when there are too many lines to draw at full resolution
+        lineBins = min( numBins, max( MAX_PLOT_POINTS // ( 2 * max( len(plotPVs), 1 ) ), MIN_LINE_BINS ) )
+        for ( clientName, pvName, testPV ) in plotPVs:
+            series = getPVSeries( testPV, seriesName )
+            if len(series) == 0:
+                continue
+            pvTimes = np.arange( len(series), dtype=np.float64 ) + ( testPV.getStartSec() - timeZero )
+            lines.append( ( pvName, ) + decimateMinMax( pvTimes, series, lineBins ) )
+    elif mode in [ 'client', 'host' ]:
+        testClients = sTest.getTestClients()
+        names = aggregate.getClientNames() if mode == 'client' else aggregate.getHostNames()
+        for name in sorted( names ):
+            if mode == 'client':
+                if clientTypes is not None and testClients[name].getClientType() not in clientTypes:
+                    continue
+                series = aggregate.getClientSeries( seriesName, name )
+            else:
+                if clientTypes is not None and not any( [ client.getHostName() == name and client.getClientType() in clientTypes
+                                                         for client in testClients.values() ] ):
+                    continue
+                series = aggregate.getHostSeries( seriesName, name )
+            lines.append( ( name, ) + decimateMinMax( times, series, numBins ) )
+    elif mode == 'band':
+        plotPVs = getPlotPVs( sTest, clientTypes )
+        if len(plotPVs):
+            matrix = getPVMatrix( plotPVs, seriesName, startSec, numSecs )
+            active = np.any( ~np.isnan( matrix ), axis=0 )
+            bands  = np.full( ( 3, numSecs ), np.nan )
+            if np.any( active ):
+                bands[ :, active ] = np.nanpercentile( matrix[ :, active ], [ 5, 50, 95 ], axis=0 )
+            ( lowTimes, low )   = decimateMinMax( times, np.nan_to_num( bands[0] ), numBins )
+            ( highTimes, high ) = decimateMinMax( times, np.nan_to_num( bands[2] ), numBins )
+            ax.fill_between( lowTimes, low, np.interp( lowTimes, highTimes, high ), alpha=0.3,
+                             label='5th to 95th percentile of %d PVs' % len(plotPVs) )
+            lines.append( ( 'median', ) + decimateMinMax( times, np.nan_to_num( bands[1] ), numBins ) )
+    else:
+        raise ValueError( "makeRatePlot Error: Unknown mode %s" % mode )
+
+    if len(lines) == 0:
+        plt.close( fig )
+        return None
+    if len(lines) <= maxLegend:
+        for ( label, lineTimes, values ) in lines:
+            ax.plot( lineTimes, values, label=label )
+        ax.legend( loc='best', fontsize='small' )
+    else:
+        # One LineCollection draws thousands of PVs much faster than separate plot() calls
+        segments = [ np.column_stack( ( lineTimes, values ) ) for ( label, lineTimes, values ) in lines ]
+        colors = plt.rcParams['axes.prop_cycle'].by_key().get( 'color', [ 'C0' ] )
+        ax.add_collection( matplotlib.collections.LineCollection( segments, colors=colors, linewidths=0.8,
+                                                                    antialiaseds=False ) )
+        ax.autoscale_view()
+    return fig
+
+def makeMissHeatmap( sTest, maxRows=2000 ):
+    '''Returns a figure w/ a PV x time heatmap of missed counts, or None if no PVs.
+    Time is summed into pixel width bins, and PVs into at most maxRows rows.'''
+    aggregate = sTest.getAggregate()
+    if aggregate is None or aggregate.getStartSec() is None:
+        return None
+    plotPVs = getPlotPVs( sTest )
+    if len(plotPVs) == 0:
+        return None
+    startSec  = aggregate.getStartSec()
+    numSecs   = aggregate.getNumSecs()
+    startTime = sTest.getStartTime()
+    timeZero  = int(startTime) if startTime else startSec
+    matrix = np.nan_to_num( getPVMatrix( plotPVs, 'tsMissRates', startSec, numSecs ) )
+
+    fig, ax = plt.subplots( 1, 1 )
+    ax.set_title( 'stressTest %s PV Missed Counts' % sTest.getTestName() )
+    ax.set_xlabel( 'Seconds since test start' )
+    numBins = getPixelWidth( fig, ax )
+    if numSecs > numBins:
+        binSize = int( np.ceil( numSecs / numBins ) )
+        matrix  = np.add.reduceat( matrix, np.arange( 0, numSecs, binSize ), axis=1 )
+    if len(plotPVs) > maxRows:
+        rowSize = int( np.ceil( len(plotPVs) / maxRows ) )
+        matrix  = np.add.reduceat( matrix, np.arange( 0, len(plotPVs), rowSize ), axis=0 )
+    extent = [ startSec - timeZero, startSec - timeZero + numSecs, 0, len(plotPVs) ]
+    image = ax.imshow( matrix, aspect='auto', origin='lower', interpolation='nearest', extent=extent, cmap='viridis' )
+    fig.colorbar( image, ax=ax, label='Missed counts' )
+    if len(plotPVs) <= 40:
+        ax.set_yticks( np.arange( len(plotPVs) ) + 0.5 )
+        ax.set_yticklabels( [ '%s %s' % ( clientName, pvName ) for ( clientName, pvName, testPV ) in plotPVs ], fontsize='x-small' )
+    else:
+        ax.set_ylabel( 'PV index' )
+    return fig
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import numpy as np
+
+def computeRates( sec, values, timeouts ):
+    '''Vectorized per-second analysis of time sorted PV samples.
+    sec, values and timeouts are the columns of a sorted stressTestTsValues.
+    Returns ( startSec, tsRates, tsMissRates, timeoutRates )
+        startSec        First secPastEpoch, or None if there are no samples
+        tsRates         Number of samples, timeouts included, in each second
+        tsMissRates     Number of counts missed, i.e. the size of counter gaps,
+                        binned at the second of the sample after the gap.
+                        A step from v0 to v1 > v0 + 1 misses v1 - v0 - 1 counts,
+                        repeated values and counter resets, v1 <= v0, miss none.
+        timeoutRates    Number of timeouts in each second
+    The rate arrays are dense int64 arrays, index 0 is startSec.
+    '''
+    if len(sec) == 0:
+        empty = np.zeros( 0, dtype=np.int64 )
+        return ( None, empty, empty.copy(), empty.copy() )
+    startSec = int(sec[0])
+    bins     = sec - startSec
+    numSecs  = int(bins[-1]) + 1
+    tsRates      = np.bincount( bins, minlength=numSecs )
+    timeoutRates = np.bincount( bins[timeouts], minlength=numSecs )
+
+    # Counter gaps are measured between successive valid values,
+    # skipping timeouts and non-numeric values
+    valid = ~timeouts & ~np.isnan( values )
+    validValues = values[valid]
+    if len(validValues) > 1:
+        deltas = np.diff( validValues )
+        # Count how many we missed. Counter resets (negative deltas) are not misses.
+        missed = np.where( deltas > 1, deltas - 1, 0 )
+        tsMissRates = np.bincount( bins[valid][1:], weights=missed, minlength=numSecs )
+        tsMissRates = np.rint( tsMissRates ).astype( np.int64 )
+    else:
+        tsMissRates = np.zeros( numSecs, dtype=np.int64 )
+    return ( startSec, tsRates, tsMissRates, timeoutRates )
+
+def computeSums( sec, values, timeouts, startSec=None, numSecs=None ):
+    '''Vectorized per-second sums of valid sample values, ex. bytes read.
+    Timeouts and NaN values are skipped.  Bins start at startSec,
+    or sec[0] if None, and cover numSecs seconds, or through sec[-1].
+    Returns a dense float64 array.'''
+    if len(sec) == 0:
+        return np.zeros( 0 if numSecs is None else numSecs, dtype=np.float64 )
+    if startSec is None:
+        startSec = int(sec[0])
+    bins = sec - startSec
+    if numSecs is None:
+        numSecs = int(bins[-1]) + 1
+    valid = ~timeouts & ~np.isnan( values )
+    return np.bincount( bins[valid], weights=values[valid], minlength=numSecs )
+
+def addSeries( startSecA, seriesA, startSecB, seriesB ):
+    '''Add two dense per-second series w/ different start times.
+    A startSec of None is an empty series.
+    Returns ( startSec, series ) on the union of both time axes.'''
+    if startSecA is None or len(seriesA) == 0:
+        return ( startSecB, seriesB.copy() )
+    if startSecB is None or len(seriesB) == 0:
+        return ( startSecA, seriesA.copy() )
+    startSec = min( startSecA, startSecB )
+    endSec   = max( startSecA + len(seriesA), startSecB + len(seriesB) )
+    series   = np.zeros( endSec - startSec, dtype=np.result_type( seriesA, seriesB ) )
+    series[ startSecA - startSec : startSecA - startSec + len(seriesA) ] += seriesA
+    series[ startSecB - startSec : startSecB - startSec + len(seriesB) ] += seriesB
+    return ( startSec, series )
+
+def computeLatencyPercentiles( sec, latencies, startSec, numSecs, percentiles=( 50.0, 99.0, 99.9, 100.0 ) ):
+    '''Vectorized per-second latency percentiles.
+    sec and latencies are matching arrays, NaN latencies are skipped.
+    Returns a ( numSecs, len(percentiles) ) float64 array, index 0 is startSec,
+    w/ NaN for seconds w/o latencies.  Percentiles use the nearest rank.'''
+    result = np.full( ( numSecs, len(percentiles) ), np.nan )
+    valid = ~np.isnan( latencies )
+    bins = sec[valid] - startSec
+    latencies = latencies[valid]
+    inRange = ( bins >= 0 ) & ( bins < numSecs )
+    bins = bins[inRange]
+    latencies = latencies[inRange]
+    if len(bins) == 0:
+        return result
+    order = np.lexsort( ( latencies, bins ) )
+    bins = bins[order]
+    latencies = latencies[order]
+    ( uniqueBins, firsts, counts ) = np.unique( bins, return_index=True, return_counts=True )
+    for ( i, percentile ) in enumerate( percentiles ):
+        ranks = np.maximum( np.ceil( percentile / 100.0 * counts ).astype( np.int64 ), 1 )
+        result[ uniqueBins, i ] = latencies[ firsts + ranks - 1 ]
+    return result
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import matplotlib
+# Headless: render w/o X on analysis nodes
+matplotlib.use( 'Agg' )
+
+import argparse
+import base64
+import concurrent.futures
+import contextlib
+import html
+import io
+import os
+import sys
+import textwrap
+import time
+import matplotlib.pyplot as plt
+
+from stressTest import *
+from stressTestPlot import *
+
+# Plots in the report, in order: ( plotName, mode )
+# plotName is a RATE_PLOTS key or 'heatmap', mode one of PLOT_MODES
+REPORT_PLOTS = [ ( 'heatmap', None ) ]
+for plotName in [ 'misses', 'timeouts', 'rates' ]:
+    REPORT_PLOTS += [ ( plotName, mode ) for mode in [ 'host', 'client', 'band', 'pv' ] ]
+
+# Test read by each report worker process
+_reportTest = None
+
+def readReportTest( testTop, useCache=True, jobs=1, verbose=False ):
+    '''Returns an analyzed stressTest for testTop w/ only the per-file summaries,
+    which have all the per-second series the report plots need.'''
+    testName = os.path.split( os.path.normpath( testTop ) )[1]
+    sTest = stressTest( testName, testTop )
+    with contextlib.redirect_stdout( io.StringIO() ):
+        sTest.readFiles( testTop, verbose=verbose, jobs=jobs, useCache=useCache, summaryOnly=True )
+    return sTest
+
+def initReportWorker( testTop, useCache ):
+    global _reportTest
+    _reportTest = readReportTest( testTop, useCache=useCache )
+
+def getPlotFileName( plotName, mode ):
+    return plotName if mode is None else '%s_%s' % ( plotName, mode )
+
+def renderPlot( sTest, plotName, mode, dpi=100 ):
+    '''Returns the PNG bytes of one REPORT_PLOTS plot, or None if there's nothing to plot.'''
+    if plotName == 'heatmap':
+        fig = makeMissHeatmap( sTest )
+    else:
+        fig = makeRatePlot( sTest, plotName, mode=mode )
+    if fig is None:
+        return None
+    fig.set_size_inches( 12, 5 )
+    buf = io.BytesIO()
+    fig.savefig( buf, format='png', dpi=dpi, bbox_inches='tight' )
+    plt.close( fig )
+    return buf.getvalue()
+
+def renderReportPlot( plotKey ):
+    '''Worker entry point, renders a plot of the test read by initReportWorker().'''
+    ( plotName, mode ) = plotKey
+    return renderPlot( _reportTest, plotName, mode )
+
+def getReportText( sTest, level ):
+    '''Returns the text printed by stressTest.report().'''
+    buf = io.StringIO()
+    with contextlib.redirect_stdout( buf ):
+        sTest.report( level )
+    return buf.getvalue()
+
+def writeHtmlReport( reportPath, sTest, reportText, plots ):
+    '''Write a self-contained index.html w/ the report text and the plots inlined.
+    plots is a list of ( plotName, mode, fileName, pngBytes ).'''
+    lines = [   '<!DOCTYPE html>',
+                '<html><head><meta charset="utf-8">',
+                '<title>stressTest %s</title>' % html.escape( sTest.getTestName() ),
+                '<style>body { font-family: sans-serif; } pre { font-size: small; } img { max-width: 100%; }</style>',
+                '</head><body>',
+                '<h1>stressTest %s</h1>' % html.escape( sTest.getTestName() ),
+                '<p>Generated %s</p>' % time.strftime( '%c' ),
+                '<h2>Summary</h2>',
+                '<pre>%s</pre>' % html.escape( reportText ) ]
+    section = None
+    for ( plotName, mode, fileName, png ) in plots:
+        if plotName != section:
+            section = plotName
+            title = 'Missed count heatmap' if plotName == 'heatmap' else RATE_PLOTS[plotName][1]
+            lines.append( '<h2>%s</h2>' % html.escape( title ) )
+        if mode is not None:
+            lines.append( '<h3>By %s</h3>' % mode )
+        lines.append( '<a href="%s"><img alt="%s" src="data:image/png;base64,%s"></a>' %
+                        ( fileName, fileName, base64.b64encode( png ).decode() ) )
+    lines.append( '</body></html>' )
+    with open( os.path.join( reportPath, 'index.html' ), 'w' ) as f:
+        f.write( '\n'.join( lines ) + '\n' )
+
+def generateReport( testTop, reportPath=None, level=2, jobs=1, useCache=True, verbose=False ):
+    '''Render all REPORT_PLOTS of the test in testTop to PNG files in reportPath,
+    TOP/report by default, and write reportPath/index.html w/ the summary
+    tables of stressTest.report() and the plots inlined.
+    Plots are rendered by jobs worker processes, one per cpu if jobs is 0.
+    Each worker reads the test's cached per-file summaries once, so w/ useCache
+    the files are only parsed and summarized by the first reader.
+    Returns the path to index.html.'''
+    if reportPath is None:
+        reportPath = os.path.join( testTop, 'report' )
+    os.makedirs( reportPath, exist_ok=True )
+    if jobs == 0:
+        jobs = os.cpu_count()
+
+    # Reading here first also fills the summary cache for the workers
+    sTest = readReportTest( testTop, useCache=useCache, jobs=jobs, verbose=verbose )
+    reportText = getReportText( sTest, level )
+
+    if jobs == 1:
+        pngs = [ renderPlot( sTest, plotName, mode ) for ( plotName, mode ) in REPORT_PLOTS ]
+    else:
+        with concurrent.futures.ProcessPoolExecutor( max_workers=min( jobs, len(REPORT_PLOTS) ),
+                initializer=initReportWorker, initargs=( testTop, useCache ) ) as executor:
+            pngs = list( executor.map( renderReportPlot, REPORT_PLOTS ) )
+
+    plots = []
+    for ( ( plotName, mode ), png ) in zip( REPORT_PLOTS, pngs ):
+        if png is None:
+            continue
+        fileName = getPlotFileName( plotName, mode ) + '.png'
+        with open( os.path.join( reportPath, fileName ), 'wb' ) as f:
+            f.write( png )
+        plots.append( ( plotName, mode, fileName, png ) )
+        if verbose:
+            print( "Wrote %s" % os.path.join( reportPath, fileName ) )
+
+    writeHtmlReport( reportPath, sTest, reportText, plots )
+    return os.path.join( reportPath, 'index.html' )
+
+def process_options(argv):
+    if argv is None:
+        argv = sys.argv[1:]
+    description =   'stressTestReport renders a static HTML report w/ PNG plots of a test, w/o a display.\n'
+    epilog_fmt  =   '\nExamples:\n' \
+                    'stressTestReport -t PATH/TO/TEST/TOP -j 0\n'
+    epilog = textwrap.dedent( epilog_fmt )
+    parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
+    parser.add_argument( '-t', '--top',     action="store", required=True, help='Top directory of test results.' )
+    parser.add_argument( '-o', '--output',  action="store", default=None, help='Report directory. Defaults to TOP/report' )
+    parser.add_argument( '-j', '--jobs',    action="store", type=int, default=0, help='Number of worker processes for rendering plots. 0 for one per cpu.' )
+    parser.add_argument( '-r', '--report',  action="store", type=int, default=2, help='Set report level.    Higher numbers show more detail.' )
+    parser.add_argument( '--noCache',       action="store_true", help='Ignore and don\'t update the .stressTestCache of parsed files.' )
+    parser.add_argument( '-v', '--verbose', action="store_true", help='show more verbose output.' )
+
+    options = parser.parse_args( argv )
+
+    return options
+
+def main(argv=None):
+    options = process_options(argv)
+    if not os.path.isdir( options.top ):
+        print( "%s is not a directory!" % options.top )
+        return 1
+    reportFile = generateReport( options.top, reportPath=options.output, level=options.report, jobs=options.jobs,
+                                 useCache=not options.noCache, verbose=options.verbose )
+    print( "Wrote report %s" % reportFile )
+    return 0
+
+if __name__ == '__main__':
+    status = main()
+    sys.exit(status)
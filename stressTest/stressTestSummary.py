@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import os
+from stressTestFile import *
+from stressTestPV import *
+
+# Summaries are saved next to the parsed arrays in the .stressTestCache,
+# as HOSTNAME/clients/CLIENTNAME/PVNAME.*.summary.npz
+SUMMARY_SUFFIX = '.summary.npz'
+
+def makeSummaryArrays( testFile ):
+    '''Returns a dict of numpy arrays summarizing a parsed test file:
+    counts, first and last timestamps, the per-second rate arrays
+    and latency histogram of its analyzed samples, and file stats.'''
+    testPV = stressTestPV( os.path.splitext( testFile.getFileName() )[0] )
+    testPV.addTsValues( testFile.getTsValues() )
+    testPV.analyze()
+    if testFile.getFileType() == 'pvgetarray':
+        testPV.analyzeThroughput()
+    arrays = testPV.getSummaryArrays()
+    arrays['numLines']        = np.int64( testFile.getNumLines() )
+    arrays['fileNumTsValues'] = np.int64( testFile.getNumTsValues() )
+    arrays['fileNumTimeouts'] = np.int64( testFile.getNumTimeouts() )
+    return arrays
+
+def readTestFileSummary( filePath, cacheTop=None ):
+    '''Returns a stressTestFile w/ only the summary of filePath, no raw samples.
+    Module level so it can run in a worker process.
+    If cacheTop is the test top directory, the summary is loaded from the
+    .stressTestCache there if the file is unchanged, and otherwise made from
+    the parsed file and saved, so each file is only summarized once.'''
+    testFileClass = getTestFileClass( os.path.split( filePath )[1] )
+    if testFileClass is None:
+        return None
+    arrays = None
+    if cacheTop is not None:
+        arrays = loadCacheArrays( cacheTop, filePath, suffix=SUMMARY_SUFFIX )
+    if arrays is None:
+        fileKey  = getFileKey( filePath )
+        parsedFile = readTestFile( filePath, cacheTop=cacheTop )
+        arrays = makeSummaryArrays( parsedFile )
+        if cacheTop is not None and parsedFile.getNumParseErrors() == 0:
+            saveCacheArrays( cacheTop, filePath, arrays, fileKey=fileKey, suffix=SUMMARY_SUFFIX )
+    testFile = testFileClass( filePath, process=False )
+    testFile.setSummaryArrays( arrays )
+    return testFile
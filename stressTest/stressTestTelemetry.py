@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import os
+import numpy as np
+
+from telemetrySampler import HOST_FILE, PROC_FILE, PROC_NAMES_FILE, NET_FILE, HOST_RECORD, PROC_RECORD, NET_RECORD
+from telemetrySampler import NET_COUNTERS, NET_GAUGES
+from stressTestFile import POSIX_TIME_AT_EPICS_EPOCH
+
+# numpy dtypes of the telemetrySampler records, w/ sec converted to secPastEpoch on read
+HOST_DTYPE = np.dtype( [ ( 'sec', '<i8' ), ( 'load1', '<f4' ), ( 'load5', '<f4' ), ( 'load15', '<f4' ),
+                         ( 'cpuBusy', '<f4' ), ( 'cpuIowait', '<f4' ),
+                         ( 'memAvailable', '<i8' ), ( 'memTotal', '<i8' ) ] )
+PROC_DTYPE = np.dtype( [ ( 'sec', '<i8' ), ( 'procIndex', '<i4' ), ( 'cpu', '<f4' ), ( 'rss', '<i8' ) ] )
+NET_DTYPE  = np.dtype( [ ( 'sec', '<i8' ) ] + [ ( name, '<i8' ) for name in NET_COUNTERS + NET_GAUGES ] )
+assert HOST_DTYPE.itemsize == HOST_RECORD.size and PROC_DTYPE.itemsize == PROC_RECORD.size
+assert NET_DTYPE.itemsize == NET_RECORD.size
+
+# Host series: memAvailable and memTotal are kB, cpu fractions of all cpus
+# cpu series are NaN for the first sample of each run, as for unsampled seconds
+HOST_SERIES = [ 'load1', 'load5', 'load15', 'cpuBusy', 'cpuIowait', 'memAvailable', 'memTotal' ]
+# Test process series: cpu as a fraction of one cpu, NaN for each process's first sample, rss in kB
+PROC_SERIES = [ 'cpu', 'rss' ]
+# Network series: per-second deltas of the NET_COUNTERS, and the NET_GAUGES queue bytes
+NET_SERIES  = list( NET_COUNTERS + NET_GAUGES )
+
+def readRecords( filePath, dtype ):
+    '''Read the whole records of a telemetry file, ignoring a partly written last record.'''
+    if not os.path.exists( filePath ):
+        return np.zeros( 0, dtype=dtype )
+    numRecords = os.path.getsize( filePath ) // dtype.itemsize
+    records = np.fromfile( filePath, dtype=dtype, count=numRecords )
+    records['sec'] -= POSIX_TIME_AT_EPICS_EPOCH
+    return records
+
+def alignSeries( secs, values, startSec, numSecs ):
+    '''Returns a float64 array of values on the per-second axis starting at
+    startSec, w/ NaN for seconds w/o a sample.'''
+    series = np.full( numSecs, np.nan )
+    index = secs - startSec
+    inRange = ( index >= 0 ) & ( index < numSecs )
+    series[ index[inRange] ] = values[inRange]
+    return series
+
+class stressTestTelemetry:
+    '''Host, test process and network usage sampled once per second by
+    telemetrySampler on one test host, read from TEST_TOP/HOSTNAME.
+    Samples are keyed by secPastEpoch, like the PV rate series, and
+    getHostSeries(), getProcSeries() and getNetSeries() place them on any
+    per-second axis such as the stressTestAggregate's.'''
+    def __init__( self, hostName, hostDir ):
+        self._hostName  = hostName
+        self._hostDir   = hostDir
+        self._hostRecords = readRecords( os.path.join( hostDir, HOST_FILE ), HOST_DTYPE )
+        self._procRecords = readRecords( os.path.join( hostDir, PROC_FILE ), PROC_DTYPE )
+        self._netRecords  = readRecords( os.path.join( hostDir, NET_FILE ),  NET_DTYPE )
+        self._procNames = []
+        namesPath = os.path.join( hostDir, PROC_NAMES_FILE )
+        if os.path.exists( namesPath ):
+            with open( namesPath, 'r' ) as f:
+                self._procNames = [ line.strip() for line in f ]
+
+    def getHostName( self ):
+        return self._hostName
+    def getNumSamples( self ):
+        return len(self._hostRecords)
+    def getProcNames( self ):
+        '''Names of the sampled test processes, the procServ --name of each.'''
+        return list( self._procNames )
+
+    def getHostSeries( self, name, startSec, numSecs ):
+        '''One of the HOST_SERIES for numSecs seconds from secPastEpoch startSec.'''
+        return alignSeries( self._hostRecords['sec'], self._hostRecords[name].astype( np.float64 ), startSec, numSecs )
+
+    def hasNetSamples( self ):
+        return len(self._netRecords) > 0
+
+    def getNetSeries( self, name, startSec, numSecs ):
+        '''One of the NET_SERIES for numSecs seconds from secPastEpoch startSec.
+        Counters are the change since the previous second, NaN if either
+        second wasn't sampled or the counter was reset.'''
+        if name in NET_GAUGES:
+            return alignSeries( self._netRecords['sec'], self._netRecords[name].astype( np.float64 ), startSec, numSecs )
+        # One extra second before startSec for the first delta
+        counts = alignSeries( self._netRecords['sec'], self._netRecords[name].astype( np.float64 ), startSec - 1, numSecs + 1 )
+        deltas = np.diff( counts )
+        deltas[ deltas < 0 ] = np.nan
+        return deltas
+
+    def getProcSeries( self, name, procName, startSec, numSecs ):
+        '''One of the PROC_SERIES of a test process for numSecs seconds from secPastEpoch startSec.'''
+        if procName not in self._procNames:
+            return np.full( numSecs, np.nan )
+        records = self._procRecords[ self._procRecords['procIndex'] == self._procNames.index( procName ) ]
+        return alignSeries( records['sec'], records[name].astype( np.float64 ), startSec, numSecs )
+
+    def getClientSeries( self, name, clientName, startSec, numSecs ):
+        '''One of the PROC_SERIES summed over a client's test processes,
+        named clientName w/ a 2 digit process number by pyProcMgr.'''
+        series = np.full( numSecs, np.nan )
+        for procName in self._procNames:
+            if procName.startswith( clientName ) and procName[ len(clientName): ].isdigit():
+                procSeries = self.getProcSeries( name, procName, startSec, numSecs )
+                series = np.where( np.isnan( series ), procSeries, series + np.nan_to_num( procSeries ) )
+        return series
+
+def readTestTelemetry( testTop ):
+    '''Returns a dict of stressTestTelemetry, key is hostName, for each
+    test host directory in testTop w/ telemetrySampler files.'''
+    telemetry = {}
+    if not os.path.isdir( testTop ):
+        return telemetry
+    for hostName in sorted( os.listdir( testTop ) ):
+        hostDir = os.path.join( testTop, hostName )
+        if os.path.exists( os.path.join( hostDir, HOST_FILE ) ):
+            telemetry[hostName] = stressTestTelemetry( hostName, hostDir )
+    return telemetry
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import array
+import numpy as np
+
+class stressTestTsValues:
+    '''Columnar storage for timestamped PV values.
+    Samples are kept in contiguous arrays instead of a dict keyed by
+    float timestamps:
+        sec      int64   EPICS secPastEpoch
+        nsec     int32   nanoseconds
+        value    float64 PV value, NaN for timeouts or non-numeric values
+        timeout  bool    True if the sample is a timeout
+        latency  float64 Optional request to response time in seconds, NaN if unknown.
+                         Only allocated once a latency has been added.
+    append() grows compact array.array builders and addArrays() / extend()
+    add whole numpy chunks without copying.  Chunks are concatenated
+    the first time the numpy arrays are requested.
+    '''
+    def __init__( self ):
+        self._secBuf     = array.array( 'q' )
+        self._nsecBuf    = array.array( 'i' )
+        self._valueBuf   = array.array( 'd' )
+        self._timeoutBuf = array.array( 'b' )
+        self._latencyBuf = None
+        self._chunks     = []   # List of ( sec, nsec, value, timeout, latency ) numpy array tuples, latency may be None
+
+    def __len__( self ):
+        return len(self._secBuf) + sum( [ len(chunk[0]) for chunk in self._chunks ] )
+
+    def append( self, sec, nsec, value, timeout=False, latency=None ):
+        if value is None:
+            value = np.nan
+        try:
+            self._valueBuf.append( value )
+        except TypeError:
+            # Non-numeric values, ex. structures or arrays, are stored as NaN
+            self._valueBuf.append( np.nan )
+        self._secBuf.append( sec )
+        self._nsecBuf.append( nsec )
+        self._timeoutBuf.append( timeout )
+        if latency is not None and self._latencyBuf is None:
+            # Backfill NaN for the samples appended before the first latency
+            self._latencyBuf = array.array( 'd', [ np.nan ] * ( len(self._secBuf) - 1 ) )
+        if self._latencyBuf is not None:
+            self._latencyBuf.append( np.nan if latency is None else latency )
+
+    def appendTimeout( self, sec, nsec ):
+        self.append( sec, nsec, None, timeout=True )
+
+    def addArrays( self, sec, nsec, values, timeouts=None, latencies=None ):
+        '''Add a chunk of samples from numpy arrays or sequences.'''
+        if len(sec) == 0:
+            return
+        sec    = np.asarray( sec,    dtype=np.int64 )
+        nsec   = np.asarray( nsec,   dtype=np.int32 )
+        values = np.asarray( values, dtype=np.float64 )
+        if timeouts is None:
+            timeouts = np.zeros( len(sec), dtype=bool )
+        timeouts = np.asarray( timeouts, dtype=bool )
+        if latencies is not None:
+            latencies = np.asarray( latencies, dtype=np.float64 )
+        self._flush()
+        self._chunks.append( ( sec, nsec, values, timeouts, latencies ) )
+
+    def extend( self, tsValues ):
+        '''Add all samples from another stressTestTsValues instance.'''
+        self.addArrays( *tsValues.getArrays(), latencies=tsValues.getLatencies() )
+
+    def __getstate__( self ):
+        # Pickle as consolidated numpy arrays, ex. when returned from worker processes
+        self.getArrays()
+        return self.__dict__
+
+    def _flush( self ):
+        if len(self._secBuf) == 0:
+            return
+        latencies = None
+        if self._latencyBuf is not None:
+            latencies = np.frombuffer( self._latencyBuf, dtype=np.float64 ).copy()
+        self._chunks.append( (  np.frombuffer( self._secBuf,     dtype=np.int64 ).copy(),
+                                np.frombuffer( self._nsecBuf,    dtype=np.int32 ).copy(),
+                                np.frombuffer( self._valueBuf,   dtype=np.float64 ).copy(),
+                                np.frombuffer( self._timeoutBuf, dtype=np.int8 ).astype( bool ),
+                                latencies ) )
+        self._secBuf     = array.array( 'q' )
+        self._nsecBuf    = array.array( 'i' )
+        self._valueBuf   = array.array( 'd' )
+        self._timeoutBuf = array.array( 'b' )
+        self._latencyBuf = None
+
+    def _consolidate( self ):
+        self._flush()
+        if len(self._chunks) <= 1:
+            return
+        latencies = None
+        if any( [ chunk[4] is not None for chunk in self._chunks ] ):
+            latencies = np.concatenate( [ chunk[4] if chunk[4] is not None else np.full( len(chunk[0]), np.nan )
+                                          for chunk in self._chunks ] )
+        columns = tuple( np.concatenate( [ chunk[i] for chunk in self._chunks ] ) for i in range(4) )
+        self._chunks = [ columns + ( latencies, ) ]
+
+    def getArrays( self ):
+        '''Returns ( sec, nsec, value, timeout ) numpy arrays.'''
+        self._consolidate()
+        if len(self._chunks) == 0:
+            return (    np.zeros( 0, dtype=np.int64 ), np.zeros( 0, dtype=np.int32 ),
+                        np.zeros( 0, dtype=np.float64 ), np.zeros( 0, dtype=bool ) )
+        return self._chunks[0][0:4]
+
+    def getLatencies( self ):
+        '''Returns the float64 latency array, or None if no latencies were added.'''
+        self._consolidate()
+        if len(self._chunks) == 0:
+            return None
+        return self._chunks[0][4]
+
+    def getSec( self ):
+        return self.getArrays()[0]
+    def getNsec( self ):
+        return self.getArrays()[1]
+    def getValues( self ):
+        return self.getArrays()[2]
+    def getTimeouts( self ):
+        return self.getArrays()[3]
+    def getTimes( self ):
+        '''Returns float64 timestamps in seconds past the EPICS epoch.'''
+        ( sec, nsec, values, timeouts ) = self.getArrays()
+        return sec + nsec * 1e-9
+    def getNumTimeouts( self ):
+        return int( np.count_nonzero( self.getTimeouts() ) )
+
+    def sort( self ):
+        '''Sort samples by timestamp.
+        As with the old dict keyed by timestamp, only the last
+        sample added for a given timestamp is kept.'''
+        ( sec, nsec, values, timeouts ) = self.getArrays()
+        if len(sec) < 2:
+            return
+        times = sec * 1000000000 + nsec
+        if np.all( times[1:] > times[:-1] ):
+            return
+        order = np.argsort( times, kind='stable' )
+        times = times[order]
+        keep = np.ones( len(times), dtype=bool )
+        keep[:-1] = times[1:] != times[:-1]
+        order = order[keep]
+        latencies = self.getLatencies()
+        if latencies is not None:
+            latencies = latencies[order]
+        self._chunks = [ ( sec[order], nsec[order], values[order], timeouts[order], latencies ) ]
@@ -6,142 +6,84 @@ import sys
 import json
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.style
-matplotlib.style.use( 'seaborn-whitegrid' )
 
 #from matplotlib.font_manager import FontProperties
 from stressTest import *
+from stressTestFollow import *
+from stressTestCompare import *
+from stressTestPlot import *
+useStyle()
+
+def viewPlots( sTest, level=2, block=True, mode='pv', heatmap=False ):
+    if heatmap:
+        plotMissHeatmap( sTest, level=level, block=False )
+    plotMissRates( sTest, level=level, block=False, mode=mode )
+    plotTimeoutRates( sTest, level=level, block=False, mode=mode )
+    plotCaptureRates( sTest, level=level, block=block, mode=mode )
+
+def showPlot( fig, block ):
+    plt.draw()
+    plt.show(block=block)
 
-def viewPlots( sTest, level=2, block=True ):
-    plotMissRates( sTest, level=level, block=False )
-    plotTimeoutRates( sTest, level=level, block=False )
-    plotCaptureRates( sTest, level=level, block=block )
-
-def plotCaptureRates( sTest, level=2, block=True ):
-    figTitle = 'stressTest %s PV Rates' % sTest._testName
-    #fig1 = plt.figure( figTitle, figsize=(20,30) )
-    fig1, ax1  = plt.subplots( 1, 1 )
-    ax1.set_title(figTitle)
-
-    startTime = sTest.getStartTime()
-    numPlots = 0
-    sortedClientNames = list(sTest._testClients.keys())
-    sortedClientNames.sort()
-    for clientName in sortedClientNames:
-        client = sTest._testClients[clientName]
-        if client.getClientType() != 'pvCapture':
-            continue
-        testPVs = client.getTestPVs()
-        for pvName in testPVs:
-            testPV      = testPVs[pvName]
-            tsRates     = testPV.getTsRates()
-            if len(tsRates) == 0:
-                continue
-            times  = np.array( list( tsRates.keys()   ) )
-            values = np.array( list( tsRates.values() ) )
-            if startTime:
-                times  -= int(startTime)
-            plt.plot( times, values, label=pvName )
-            numPlots = numPlots + 1
-
-    if numPlots == 0:
+def plotCaptureRates( sTest, level=2, block=True, mode='pv' ):
+    fig = makeRatePlot( sTest, 'rates', mode=mode )
+    if fig is None:
         print( "No PV rate data to plot." )
         return
+    showPlot( fig, block )
 
-    if numPlots <= 10:
-        #ax1.legend( loc='upper right')
-        ax1.legend( loc='best', fontsize='small' )
-    plt.draw()
-    plt.show(block=block)
-
-def plotMissRates( sTest, level=2, block=True ):
-    figTitle = 'stressTest %s PV Missed Count Rates' % sTest._testName
-    #fig1 = plt.figure( figTitle, figsize=(20,30) )
-    fig1, ax1  = plt.subplots( 1, 1 )
-    ax1.set_title(figTitle)
-
-    startTime = sTest.getStartTime()
-    numPlots = 0
-    sortedClientNames = list(sTest._testClients.keys())
-    sortedClientNames.sort()
-    for clientName in sortedClientNames:
-        client = sTest._testClients[clientName]
-        testPVs = client.getTestPVs()
-        for pvName in testPVs:
-            testPV = testPVs[pvName]
-            tsMissRates      = testPV.getTsMissRates()
-            if len(tsMissRates) == 0:
-                continue
-            times  = np.array( list( tsMissRates.keys()   ) )
-            values = np.array( list( tsMissRates.values() ) )
-            if startTime:
-                times  -= int(startTime)
-            plt.plot( times, values, label=pvName )
-            numPlots = numPlots + 1
-
-    if numPlots == 0:
+def plotMissRates( sTest, level=2, block=True, mode='pv' ):
+    fig = makeRatePlot( sTest, 'misses', mode=mode )
+    if fig is None:
         print( "No counter miss rate data to plot." )
         return
+    showPlot( fig, block )
 
-    if numPlots <= 10:
-        #legendFontProp = FontProperties()
-        #legendFontProp.set_size('small')
-        #ax1.legend( loc='best', prop=legendFontProp )
-        ax1.legend( loc='best', fontsize='small' )
-    plt.draw()
-    plt.show(block=block)
-
-def plotTimeoutRates( sTest, level=2, block=True ):
-    figTitle = 'stressTest %s pvget timeout Rates' % sTest._testName
-    #fig1 = plt.figure( figTitle, figsize=(20,30) )
-    fig1, ax1  = plt.subplots( 1, 1 )
-    ax1.set_title(figTitle)
-
-    startTime = sTest.getStartTime()
-    numPlots = 0
-    sortedClientNames = list(sTest._testClients.keys())
-    sortedClientNames.sort()
-    for clientName in sortedClientNames:
-        client = sTest._testClients[clientName]
-        if client.getClientType() != 'pvget':
-            continue
-        testPVs = client.getTestPVs()
-        for pvName in testPVs:
-            testPV          = testPVs[pvName]
-            timeoutRates    = testPV.getTimeoutRates()
-            if len(timeoutRates) == 0:
-                continue
-            times  = np.array( list( timeoutRates.keys()      ) )
-            values = np.array( list( timeoutRates.values() ) )
-            if startTime:
-                times  -= int(startTime)
-            plt.plot( times, values, label=pvName )
-            numPlots = numPlots + 1
-
-    if numPlots == 0:
+def plotTimeoutRates( sTest, level=2, block=True, mode='pv' ):
+    fig = makeRatePlot( sTest, 'timeouts', mode=mode )
+    if fig is None:
         print( "No PV timeout rate data to plot." )
         return
+    showPlot( fig, block )
 
-    if numPlots <= 10:
-        #ax1.legend( loc='upper right')
-        ax1.legend( loc='best', fontsize='small' )
-    plt.draw()
-    plt.show(block=block)
+def plotMissHeatmap( sTest, level=2, block=True ):
+    fig = makeMissHeatmap( sTest )
+    if fig is None:
+        print( "No counter miss data to plot." )
+        return
+    showPlot( fig, block )
 
 def process_options(argv):
     if argv is None:
         argv = sys.argv[1:]
     description =   'stressTestView supports viewing results from CA or PVA network stress tests.\n'
     epilog_fmt  =   '\nExamples:\n' \
-                    'stressTestView PATH/TO/TEST/TOP"\n'
+                    'stressTestView PATH/TO/TEST/TOP"\n' \
+                    'stressTestView -a PATH/TO/TEST/TOP.stressTestArchive --tStart 60 --tEnd 120\n' \
+                    'stressTestView -t PATH/TO/TEST/TOP --follow\n' \
+                    'stressTestView --compare PATH/TO/BASELINE/TOP PATH/TO/NEW/TOP --threshold 0.05\n'
     epilog = textwrap.dedent( epilog_fmt )
     parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
     #parser.add_argument( 'cmd',  help='Command to launch.  Should be an executable file.' )
     #parser.add_argument( 'arg', nargs='*', help='Arguments for command line. Enclose options in quotes.' )
     #parser.add_argument( '-c', '--count',  action="store", type=int, default=1, help='Number of processes to launch.' )
     #parser.add_argument( '-d', '--delay',  action="store", type=float, default=0.0, help='Delay between process launch.' )
+    parser.add_argument( '--noCache',   action="store_true", help='Ignore and don\'t update the .stressTestCache of parsed files.' )
     parser.add_argument( '--noPlot',    action="store_true", help='Suppress plot popups.' )
+    parser.add_argument( '--plotMode',  action="store", choices=PLOT_MODES, default='pv',
+                                        help='Plot each PV, client or host sums, or percentile bands across PVs.' )
+    parser.add_argument( '--heatmap',   action="store_true", help='Also plot a PV x time heatmap of missed counts.' )
     parser.add_argument( '-t', '--top',  action="store", help='Top directory of test results.' )
+    parser.add_argument( '-a', '--archive',  action="store", help='Read test results from a stressTestArchive instead of --top.' )
+    parser.add_argument( '--client',    action="store", nargs='+', default=None, help='Only read these clients from the archive.' )
+    parser.add_argument( '--tStart',    action="store", type=float, default=None, help='Only read archive or compare samples from this many seconds after test start.' )
+    parser.add_argument( '--tEnd',      action="store", type=float, default=None, help='Only read archive or compare samples up to this many seconds after test start.' )
+    parser.add_argument( '-f', '--follow',   action="store_true", help='Follow a running test, showing rates and misses as client files grow.' )
+    parser.add_argument( '--interval',  action="store", type=float, default=1.0, help='Seconds between --follow updates.' )
+    parser.add_argument( '--poll',      action="store_true", help='Use stat polling instead of inotify for --follow.' )
+    parser.add_argument( '--compare',   action="store", nargs='+', default=None, help='Compare tests to the first, the baseline.' )
+    parser.add_argument( '--threshold', action="store", type=float, default=0.1, help='--compare regression threshold, as a fraction of the baseline.' )
+    parser.add_argument( '-j', '--jobs',     action="store", type=int, default=1, help='Number of worker processes for reading files. 0 for one per cpu.' )
     parser.add_argument( '-r', '--report',   action="store", type=int, default=2, help='Set report level.    Higher numbers show more detail.' )
     parser.add_argument( '-v', '--verbose',  action="store_true", help='show more verbose output.' )
     #parser.add_argument( '-p', '--port',  action="store", type=int, default=40000, help='Base port number, procServ port is port + str(procNumber)' )
@@ -156,16 +98,51 @@ def main(argv=None):
     global procList
     options = process_options(argv)
 
-    if options.top:
+    test1 = None
+    if options.compare:
+        tests = []
+        for testTop in options.compare:
+            if not os.path.isdir( testTop ):
+                print( "%s is not a directory!" % testTop )
+                return 1
+            test = stressTest( os.path.split( os.path.normpath( testTop ) )[1], testTop )
+            # Comparisons only need per-second rates, so read the cached summaries
+            test.readFiles( testTop, verbose=options.verbose, jobs=options.jobs, useCache=not options.noCache,
+                            summaryOnly=True )
+            tests.append( test )
+        comparison = stressTestCompare( tests, threshold=options.threshold, tStart=options.tStart, tEnd=options.tEnd )
+        comparison.compare()
+        comparison.report( options.report )
+        return 1 if comparison.getNumRegressions() else 0
+    elif options.archive:
+        archive = stressTestArchive( options.archive )
+        test1 = stressTest( archive.getTestName(), options.archive )
+        ( startSec, endSec ) = ( None, None )
+        archiveStartSec = archive.getStartSec()
+        if archiveStartSec is not None:
+            if options.tStart is not None:
+                startSec = archiveStartSec + int(options.tStart)
+            if options.tEnd is not None:
+                endSec   = archiveStartSec + int(options.tEnd)
+        test1.readArchive( archive, clientNames=options.client, startSec=startSec, endSec=endSec )
+    elif options.top:
         if not os.path.isdir( options.top ):
             print( "%s is not a directory!" % options.top )
             return 1
+        if options.follow:
+            followTest( options.top, interval=options.interval, usePolling=options.poll, verbose=options.verbose )
+            return 0
         testName = os.path.split( options.top )[1]
         test1 = stressTest( testName, options.top )
-        test1.readFiles( options.top )
+        # Report levels 1 and 2 w/o plots only need the per-file summaries
+        summaryOnly = options.report <= 2 and options.noPlot
+        test1.readFiles( options.top, verbose=options.verbose, jobs=options.jobs, useCache=not options.noCache,
+                         summaryOnly=summaryOnly )
+
+    if test1:
         test1.report( options.report )
         if not options.noPlot:
-            viewPlots( test1, options.report )
+            viewPlots( test1, options.report, mode=options.plotMode, heatmap=options.heatmap )
 
     #if options.verbose:
     #   print( "Full Cmd: %s %s" % ( options.cmd, args ) )
@@ -184,8 +161,10 @@ if __name__ == '__main__':
         except BaseException as e:
             print( "Caught exception during main!" )
             print( e )
+            status = 1
 
     # Pre-exit cleanup
     #killProcesses()
 
-    #sys.exit(status)
+    # Non-zero when --compare finds a regression, so CI can check it
+    sys.exit(status)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+#  Name: telemetrySampler.py
+#  Abs:  Sample host and test process resource usage once per second
+#
+#  Appends fixed size binary records to files in the test host directory,
+#  TEST_TOP/HOSTNAME, read by stressTestTelemetry:
+#    telemetry.host.bin     HOST_RECORD per second
+#    telemetry.procs.bin    PROC_RECORD per second for each test process
+#    telemetry.procs.names  Test process names, one per line, in procIndex order
+#    telemetry.net.bin      NET_RECORD per second
+#  Test processes are the procServ instances launched by pyProcMgr or the
+#  stressTestMonitor agent, named by their procServ --name, each w/ the
+#  CPU and RSS of its whole process tree.
+#  Network records have the cumulative /proc/net/dev and /proc/net/snmp
+#  counters, and the queue depths and drops of the UDP and TCP sockets on
+#  the test ports, TEST_EPICS_PVA_SERVER_PORT and TEST_EPICS_PVA_BROADCAST_PORT
+#  by default, so lost updates can be traced to drops in the kernel.
+#  Only one sampler runs per test host directory, so every client launch
+#  can start one.  It exits after the test processes are gone.
+#  Uses only the standard library, so it runs on any test host.
+#
+#  Example:
+#    telemetrySampler.py -D $TEST_HOST_DIR &
+#
+#==============================================================
+import argparse
+import fcntl
+import os
+import struct
+import sys
+import textwrap
+import time
+
+HOST_FILE       = 'telemetry.host.bin'
+PROC_FILE       = 'telemetry.procs.bin'
+PROC_NAMES_FILE = 'telemetry.procs.names'
+NET_FILE        = 'telemetry.net.bin'
+LOCK_FILE       = 'telemetry.lock'
+
+# POSIX sec, loadavg 1, 5 and 15 min, cpu busy and iowait fractions of all cpus, MemAvailable kB, MemTotal kB
+HOST_RECORD = struct.Struct( '<qfffffqq' )
+# POSIX sec, procIndex, cpu as a fraction of one cpu, RSS kB
+PROC_RECORD = struct.Struct( '<qifq' )
+# cpu fields of the first host record of a run, and of each test process's first record,
+# which have no prior sample to measure from
+NO_SAMPLE = float( 'nan' )
+
+# Network fields after the POSIX sec, all int64:
+#   Cumulative counters, summed over all interfaces for the /proc/net/dev ones
+NET_COUNTERS = (    'rxPackets', 'rxDrops', 'txPackets', 'txDrops',
+                    'udpInDatagrams', 'udpNoPorts', 'udpInErrors', 'udpRcvbufErrors', 'udpSndbufErrors',
+                    'tcpOutSegs', 'tcpRetransSegs',
+                    'udpSockDrops' )    # drops column of the test port UDP sockets
+#   Bytes queued at sample time, summed over the test port sockets
+NET_GAUGES   = (    'udpRxQueue', 'tcpRxQueue', 'tcpTxQueue' )
+NET_RECORD  = struct.Struct( '<q%uq' % ( len(NET_COUNTERS) + len(NET_GAUGES) ) )
+
+# Processes whose procServ children are test processes
+ROOT_CMDS = ( 'pyProcMgr.py', 'stressTestMonitor.py' )
+
+CLK_TCK   = os.sysconf( 'SC_CLK_TCK' )
+PAGE_KB   = os.sysconf( 'SC_PAGE_SIZE' ) // 1024
+
+def readCpuTimes( ):
+    '''Returns ( busy, iowait, total ) jiffies for all cpus from /proc/stat.'''
+    with open( '/proc/stat', 'r' ) as f:
+        fields = [ int(v) for v in f.readline().split()[1:] ]
+    # user nice system idle iowait irq softirq steal ...
+    idle   = fields[3]
+    iowait = fields[4] if len(fields) > 4 else 0
+    total  = sum( fields[0:8] )
+    return ( total - idle - iowait, iowait, total )
+
+def readLoadAvg( ):
+    with open( '/proc/loadavg', 'r' ) as f:
+        return [ float(v) for v in f.read().split()[0:3] ]
+
+def readMemInfo( ):
+    '''Returns ( MemAvailable, MemTotal ) in kB.'''
+    memInfo = {}
+    with open( '/proc/meminfo', 'r' ) as f:
+        for line in f:
+            fields = line.split()
+            memInfo[ fields[0] ] = int( fields[1] )
+    return ( memInfo.get( 'MemAvailable:', memInfo.get( 'MemFree:', 0 ) ), memInfo.get( 'MemTotal:', 0 ) )
+
+def readNetDev( ):
+    '''Returns ( rxPackets, rxDrops, txPackets, txDrops ) summed over all interfaces.'''
+    totals = [ 0, 0, 0, 0 ]
+    with open( '/proc/net/dev', 'r' ) as f:
+        for line in f.readlines()[2:]:
+            fields = line.split( ':', 1 )[1].split()
+            # Receive: bytes packets errs drop ... Transmit: bytes packets errs drop ...
+            for ( i, field ) in enumerate( ( 1, 3, 9, 11 ) ):
+                totals[i] += int( fields[field] )
+    return totals
+
+def readSnmp( ):
+    '''Returns a dict of /proc/net/snmp counters, key is protocol + name, ex. UdpInErrors.'''
+    counters = {}
+    with open( '/proc/net/snmp', 'r' ) as f:
+        lines = f.readlines()
+    # Each protocol has a line of names followed by a line of values
+    for ( names, values ) in zip( lines[0::2], lines[1::2] ):
+        ( protocol, names )  = names.split( ':', 1 )
+        for ( name, value ) in zip( names.split(), values.split( ':', 1 )[1].split() ):
+            counters[ protocol + name ] = int( value )
+    return counters
+
+def readSocketQueues( protocol, ports ):
+    '''Returns ( txQueue, rxQueue, drops ) summed over the protocol's IPv4 and IPv6
+    sockets w/ a local or remote port in ports.  drops is 0 for tcp.'''
+    totals = [ 0, 0, 0 ]
+    for fileName in ( protocol, protocol + '6' ):
+        try:
+            with open( os.path.join( '/proc/net', fileName ), 'r' ) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            # sl local_address rem_address st tx_queue:rx_queue ... inode ref pointer drops
+            fields = line.split()
+            localPort  = int( fields[1].rsplit( ':', 1 )[1], 16 )
+            remotePort = int( fields[2].rsplit( ':', 1 )[1], 16 )
+            if localPort not in ports and remotePort not in ports:
+                continue
+            ( txQueue, rxQueue ) = fields[4].split( ':' )
+            totals[0] += int( txQueue, 16 )
+            totals[1] += int( rxQueue, 16 )
+            if protocol == 'udp' and len(fields) > 12:
+                totals[2] += int( fields[12] )
+    return totals
+
+def readNetCounters( ports ):
+    '''Returns the NET_COUNTERS and NET_GAUGES values, in order.'''
+    snmp = readSnmp()
+    ( udpTxQueue, udpRxQueue, udpSockDrops ) = readSocketQueues( 'udp', ports )
+    ( tcpTxQueue, tcpRxQueue, tcpDrops ) = readSocketQueues( 'tcp', ports )
+    return readNetDev() + [ snmp.get( 'UdpInDatagrams', 0 ), snmp.get( 'UdpNoPorts', 0 ), snmp.get( 'UdpInErrors', 0 ),
+                            snmp.get( 'UdpRcvbufErrors', 0 ), snmp.get( 'UdpSndbufErrors', 0 ),
+                            snmp.get( 'TcpOutSegs', 0 ), snmp.get( 'TcpRetransSegs', 0 ),
+                            udpSockDrops, udpRxQueue, tcpRxQueue, tcpTxQueue ]
+
+def getTestPorts( ):
+    '''The test's PVA server and broadcast ports from the env, if set.'''
+    ports = []
+    for name in [ 'TEST_EPICS_PVA_SERVER_PORT', 'TEST_EPICS_PVA_BROADCAST_PORT' ]:
+        if os.environ.get( name, '' ).isdigit():
+            ports.append( int( os.environ[name] ) )
+    return ports
+
+def readProcStats( ):
+    '''Returns a dict of ( ppid, starttime, cpu jiffies, rss pages ), key is pid.'''
+    procStats = {}
+    for entry in os.listdir( '/proc' ):
+        if not entry.isdigit():
+            continue
+        try:
+            with open( '/proc/%s/stat' % entry, 'r' ) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name in parens may contain spaces
+        fields = stat[ stat.rfind( ')' ) + 2 : ].split()
+        procStats[ int(entry) ] = ( int(fields[1]), int(fields[19]), int(fields[11]) + int(fields[12]), int(fields[21]) )
+    return procStats
+
+def readCmdLine( pid ):
+    try:
+        with open( '/proc/%d/cmdline' % pid, 'rb' ) as f:
+            return [ arg.decode( errors='replace' ) for arg in f.read().split( b'\0' ) if arg ]
+    except OSError:
+        return []
+
+class telemetrySampler:
+    def __init__( self, hostDir, ports=None ):
+        self._hostDir   = hostDir
+        self._ports     = set( ports or [] )
+        self._cmdLines  = {}    # Cached cmdlines, key is ( pid, starttime )
+        self._procNames = []    # Test process names, in procIndex order
+        self._prevTime  = None
+        self._prevCpu   = None
+        self._prevProcCpu = {}  # Last cpu jiffies for each test process name
+        namesPath = os.path.join( hostDir, PROC_NAMES_FILE )
+        if os.path.exists( namesPath ):
+            # Keep the indices of an earlier run of the same test
+            with open( namesPath, 'r' ) as f:
+                self._procNames = [ line.strip() for line in f ]
+        self._hostFile  = open( os.path.join( hostDir, HOST_FILE ), 'ab' )
+        self._procFile  = open( os.path.join( hostDir, PROC_FILE ), 'ab' )
+        self._netFile   = open( os.path.join( hostDir, NET_FILE ), 'ab' )
+        self._namesFile = open( namesPath, 'a' )
+
+    def getCmdLine( self, pid, startTime ):
+        key = ( pid, startTime )
+        if key not in self._cmdLines:
+            self._cmdLines[key] = readCmdLine( pid )
+        return self._cmdLines[key]
+
+    def getProcIndex( self, procName ):
+        if procName not in self._procNames:
+            self._procNames.append( procName )
+            self._namesFile.write( procName + '\n' )
+            self._namesFile.flush()
+        return self._procNames.index( procName )
+
+    def getTestProcs( self, procStats ):
+        '''Returns a dict of ( cpu jiffies, rss pages ) for each test process name,
+        summed over the procServ's process tree.'''
+        children = {}
+        for ( pid, ( ppid, startTime, cpu, rss ) ) in procStats.items():
+            children.setdefault( ppid, [] ).append( pid )
+        testProcs = {}
+        for ( pid, ( ppid, startTime, cpu, rss ) ) in procStats.items():
+            cmdLine = self.getCmdLine( pid, startTime )
+            if not any( [ arg.endswith( ROOT_CMDS ) for arg in cmdLine[0:2] ] ):
+                continue
+            for childPid in children.get( pid, [] ):
+                childCmd = self.getCmdLine( childPid, procStats[childPid][1] )
+                if not any( [ arg.endswith( 'procServ' ) for arg in childCmd[0:2] ] ) or '--name' not in childCmd:
+                    continue
+                procName = childCmd[ childCmd.index( '--name' ) + 1 ]
+                ( totalCpu, totalRss ) = ( 0, 0 )
+                tree = [ childPid ]
+                while tree:
+                    treePid = tree.pop()
+                    totalCpu += procStats[treePid][2]
+                    totalRss += procStats[treePid][3]
+                    tree += children.get( treePid, [] )
+                testProcs[procName] = ( totalCpu, totalRss )
+        # Forget cmdlines of exited processes
+        for key in [ key for key in self._cmdLines if key[0] not in procStats ]:
+            del self._cmdLines[key]
+        return testProcs
+
+    def sample( self ):
+        '''Append one host record and a record per test process.
+        Returns the number of test processes found.'''
+        curTime = time.time()
+        sec = int( round( curTime ) )
+        cpu = readCpuTimes()
+        # NaN w/o a prior sample to measure from, so readers treat it as unsampled
+        ( cpuBusy, cpuIowait ) = ( NO_SAMPLE, NO_SAMPLE )
+        if self._prevCpu is not None and cpu[2] > self._prevCpu[2]:
+            total     = cpu[2] - self._prevCpu[2]
+            cpuBusy   = ( cpu[0] - self._prevCpu[0] ) / total
+            cpuIowait = ( cpu[1] - self._prevCpu[1] ) / total
+        ( memAvailable, memTotal ) = readMemInfo()
+        self._hostFile.write( HOST_RECORD.pack( sec, *readLoadAvg(), cpuBusy, cpuIowait, memAvailable, memTotal ) )
+        self._hostFile.flush()
+        self._netFile.write( NET_RECORD.pack( sec, *readNetCounters( self._ports ) ) )
+        self._netFile.flush()
+
+        testProcs = self.getTestProcs( readProcStats() )
+        dt = curTime - self._prevTime if self._prevTime is not None else None
+        records = []
+        for ( procName, ( procCpu, rss ) ) in sorted( testProcs.items() ):
+            cpuFraction = NO_SAMPLE
+            if dt and procName in self._prevProcCpu:
+                cpuFraction = max( procCpu - self._prevProcCpu[procName], 0 ) / ( CLK_TCK * dt )
+            records.append( PROC_RECORD.pack( sec, self.getProcIndex( procName ), cpuFraction, rss * PAGE_KB ) )
+        self._procFile.write( b''.join( records ) )
+        self._procFile.flush()
+        self._prevProcCpu = { procName: procCpu for ( procName, ( procCpu, rss ) ) in testProcs.items() }
+        ( self._prevTime, self._prevCpu ) = ( curTime, cpu )
+        return len(testProcs)
+
+    def run( self, interval=1.0, idleExit=10.0, startWait=120.0, duration=None ):
+        '''Sample every interval seconds, on whole seconds, until no test processes
+        have been seen for idleExit seconds, or none within startWait seconds.'''
+        startTime = time.time()
+        lastSeen  = None
+        while duration is None or time.time() < startTime + duration:
+            time.sleep( interval - time.time() % interval )
+            if self.sample() > 0:
+                lastSeen = time.time()
+            elif lastSeen is None:
+                if time.time() > startTime + startWait:
+                    break
+            elif time.time() > lastSeen + idleExit:
+                break
+
+def process_options(argv):
+    if argv is None:
+        argv = sys.argv[1:]
+    description =   'telemetrySampler records host and test process resource usage once per second.\n'
+    epilog_fmt  =   '\nExamples:\n' \
+                    'telemetrySampler.py -D $TEST_HOST_DIR &\n'
+    epilog = textwrap.dedent( epilog_fmt )
+    parser = argparse.ArgumentParser( description=description, formatter_class=argparse.RawDescriptionHelpFormatter, epilog=epilog )
+    parser.add_argument( '-D', '--hostDir',  action="store", required=True, help='Test host directory, TEST_TOP/HOSTNAME.' )
+    parser.add_argument( '-i', '--interval', action="store", type=float, default=1.0, help='Seconds between samples.' )
+    parser.add_argument( '-p', '--ports',    action="store", type=int, nargs='*', default=getTestPorts(),
+                        help='Test ports for socket queue depths. Defaults to TEST_EPICS_PVA_SERVER_PORT and TEST_EPICS_PVA_BROADCAST_PORT.' )
+    parser.add_argument( '--idleExit',  action="store", type=float, default=10.0, help='Exit after no test processes for this many seconds.' )
+    parser.add_argument( '--duration',  action="store", type=float, default=None, help='Exit after this many seconds.' )
+
+    options = parser.parse_args( argv )
+
+    return options
+
+def main(argv=None):
+    options = process_options(argv)
+    os.makedirs( options.hostDir, mode=0o775, exist_ok=True )
+    lockFile = open( os.path.join( options.hostDir, LOCK_FILE ), 'w' )
+    try:
+        fcntl.flock( lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB )
+    except OSError:
+        # Another client launch already started the sampler for this host
+        return 0
+    sampler = telemetrySampler( options.hostDir, ports=options.ports )
+    sampler.run( interval=options.interval, idleExit=options.idleExit, duration=options.duration )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -2,7 +2,7 @@
 #	Name: testManager.py
 #	Abstract:
 #	A python tool to launch and manage EPICS CA and PVA stress tests
-#	Uses threading and paramiko ssh transport to run needed clients and servers on
+#	Uses asyncio and ssh subprocesses to run needed clients and servers on
 #	each host machine which will be used in the test. 
 #
 #	Example:
@@ -13,14 +13,19 @@
 #==============================================================
 from __future__ import print_function
 import argparse
-import concurrent.futures
+import asyncio
+import collections
 import io
 import datetime
+import getpass
 import glob
+import json
 import locale
+import math
 import os
 import re
 import pprint
+import shutil
 #import paramiko
 #import procServUtils
 import signal
@@ -35,15 +40,15 @@ import time
 
 procList = []
 activeTests = []
-testFutures = {}
-testExecutor = None
+testStopping = False
 testDir = None
+sshPool = None
 
 def makePrintable( rawOutput ):
     if isinstance( rawOutput, str ) and rawOutput.startswith( "b'" ):
         rawOutput = eval(rawOutput)
     if isinstance( rawOutput, bytes ):
-        rawOutput = rawOutput.decode()
+        rawOutput = rawOutput.decode( errors='replace' )
     if isinstance( rawOutput, list ):
         filtered = []
         for line in rawOutput:
@@ -197,13 +202,25 @@ def getClientConfig( config, clientName ):
             return c
     return None
 
-def getEnvFromFile( fileName, env, verbose=False ):
-    if verbose:
-        print( "getEnvFromFile: %s" % fileName )
+# Parsed env files, key is path, value is ( ( st_size, st_mtime_ns ), env )
+envFileCache = {}
+
+def readEnvFile( fileName, verbose=False ):
+    '''Returns a dict of the macro definitions in fileName, empty if not found.
+    Each file is parsed once, and again only if its size or mtime changes.
+    Don't modify the returned dict.'''
+    try:
+        fileStat = os.stat( fileName )
+    except OSError:
+        return {}
+    fileKey = ( fileStat.st_size, fileStat.st_mtime_ns )
+    cached = envFileCache.get( fileName )
+    if cached is not None and cached[0] == fileKey:
+        return cached[1]
+    env = {}
     try:
         with open( fileName, 'r' ) as f:
-            lines = f.readlines()
-            for line in lines:
+            for line in f:
                 line = line.strip()
                 if line.startswith('#'):
                     continue
@@ -212,53 +229,528 @@ def getEnvFromFile( fileName, env, verbose=False ):
                             macroDefDQuotedRegExp.search(line)	)
                 if not match:
                     continue
-                macroName = match.group(1)
-                macroValue = match.group(2)
-                env[macroName] = macroValue
+                env[match.group(1)] = match.group(2)
                 if verbose:
-                    print( "getEnvFromFile: %s = %s" % ( macroName, macroValue ) )
-    except:
-        pass
+                    print( "getEnvFromFile: %s = %s" % ( match.group(1), match.group(2) ) )
+    except OSError:
+        return {}
+    envFileCache[fileName] = ( fileKey, env )
     return env
 
-def readClientConfig( clientConfig, clientName, verbose=False ):
-    '''Duplicates the readIfFound env handling in launch_client.sh.'''
-    clientConfig[ 'CLIENT_NAME' ] = clientName
-    SCRIPTDIR  = clientConfig[ 'SCRIPTDIR' ]
-    testTop    = clientConfig[ 'TEST_TOP' ]
-    getEnvFromFile( os.path.join( SCRIPTDIR, 'stressTestDefault.env' ), clientConfig, verbose=verbose )
-    getEnvFromFile( os.path.join( SCRIPTDIR, 'stressTestDefault.env.local' ), clientConfig, verbose=verbose )
-    getEnvFromFile( os.path.join( testTop, '..', 'siteDefault.env' ), clientConfig, verbose=verbose )
-    getEnvFromFile( os.path.join( testTop, 'siteDefault.env' ), clientConfig, verbose=verbose )
-    #getEnvFromFile( os.path.join( TEST_HOST_DIR, 'host.env' ), clientConfig, verbose=verbose )
-    getEnvFromFile( os.path.join( testTop, 'test.env' ), clientConfig, verbose=verbose )
-
-    # Read env from clientName.env to get TEST_APPTYPE
-    if 'TEST_APPTYPE' in clientConfig:
-        print( "TODO: TEST_APPTYPE %s already defined in %s clientConfig!" % ( clientConfig['TEST_APPTYPE'], clientName ) )
-    else:
-        getEnvFromFile( os.path.join( testTop, clientName + '.env' ), clientConfig, verbose=verbose )
-    if 'TEST_APPTYPE' in clientConfig:
-        getEnvFromFile( os.path.join( SCRIPTDIR, clientConfig['TEST_APPTYPE'] + 'Default.env' ), clientConfig, verbose=verbose )
-        # Reread env from clientName.env to override ${TEST_APPTYPE}Default.env
-        getEnvFromFile( os.path.join( testTop, clientName + '.env' ), clientConfig, verbose=verbose )
+def getEnvFromFile( fileName, env, verbose=False ):
+    if verbose:
+        print( "getEnvFromFile: %s" % fileName )
+    env.update( readEnvFile( fileName, verbose=verbose ) )
+    return env
+
+class ConfigResolver(object):
+    '''Layered client configs, duplicating the readIfFound env handling in launch_client.sh:
+        stressTestDefault.env, stressTestDefault.env.local, ../siteDefault.env,
+        siteDefault.env, HOST/host.env, test.env, CLIENT.env, ${TEST_APPTYPE}Default.env, CLIENT.env
+    launch_client.sh reads host.env from TEST_TOP/$(hostname -s), so HOST is
+    the short name of the client's TEST_HOST, as resolved w/o any host.env.
+    The layers up to test.env are the same for all clients on a host, so are
+    merged once per host, and env files are parsed once via readEnvFile().  Each client's macros are
+    then expanded in one pass, each value after the values it refers to,
+    w/ the same $NAME syntax as expandMacros().  Macros in a cycle, ex. A=$B
+    and B=$A, keep their original values, w/ an error message, and
+    references to them are left unexpanded for the shell.'''
+    def __init__( self, testConfig, verbose=False ):
+        self._testConfig = testConfig
+        self._verbose    = verbose
+        self._scriptDir  = testConfig[ 'SCRIPTDIR' ]
+        self._testTop    = testConfig[ 'TEST_TOP' ]
+        self._siteEnv    = {}   # Layers before host.env
+        for fileName in [   os.path.join( self._scriptDir, 'stressTestDefault.env' ),
+                            os.path.join( self._scriptDir, 'stressTestDefault.env.local' ),
+                            os.path.join( self._testTop, '..', 'siteDefault.env' ),
+                            os.path.join( self._testTop, 'siteDefault.env' ) ]:
+            getEnvFromFile( fileName, self._siteEnv, verbose=verbose )
+        self._testEnv    = getEnvFromFile( os.path.join( self._testTop, 'test.env' ), {}, verbose=verbose )
+        self._baseEnv    = dict( self._siteEnv, **self._testEnv )   # Layers up to test.env w/o host.env
+        self._hostEnvs   = {}   # Layers up to test.env, key is host directory name
+
+    def getHostBaseEnv( self, hostDir ):
+        '''Returns the merged layers up to test.env, w/ hostDir's host.env if any.'''
+        if hostDir not in self._hostEnvs:
+            hostEnv = readEnvFile( os.path.join( self._testTop, hostDir, 'host.env' ), verbose=self._verbose )
+            self._hostEnvs[hostDir] = { **self._siteEnv, **hostEnv, **self._testEnv } if hostEnv else self._baseEnv
+        return self._hostEnvs[hostDir]
+
+    def getClientConfig( self, clientName ):
+        '''Returns the expanded config for clientName.'''
+        clientConfig = self.getLayeredConfig( clientName, self._baseEnv )
+        TEST_HOST = None
+        if 'TEST_HOST' in clientConfig:
+            # Only expand TEST_HOST and the macros it refers to, cycles are reported by expandConfig()
+            TEST_HOST = self.expandName( clientConfig, 'TEST_HOST', {}, set(), reportCycles=False )
+        if TEST_HOST and '$' not in TEST_HOST:
+            hostBaseEnv = self.getHostBaseEnv( TEST_HOST.split( '.' )[0] )
+            if hostBaseEnv is not self._baseEnv:
+                clientConfig = self.getLayeredConfig( clientName, hostBaseEnv )
+        return self.expandConfig( clientConfig )
+
+    def getLayeredConfig( self, clientName, baseEnv ):
+        '''Returns the unexpanded config for clientName, layered on baseEnv.'''
+        clientConfig = self._testConfig.copy()
+        clientConfig[ 'CLIENT_NAME' ] = clientName
+        clientConfig.update( baseEnv )
+        clientEnvFile = os.path.join( self._testTop, clientName + '.env' )
+        getEnvFromFile( clientEnvFile, clientConfig, verbose=self._verbose )
+        if 'TEST_APPTYPE' in clientConfig:
+            getEnvFromFile( os.path.join( self._scriptDir, clientConfig['TEST_APPTYPE'] + 'Default.env' ), clientConfig, verbose=self._verbose )
+            # Reread env from clientName.env to override ${TEST_APPTYPE}Default.env
+            getEnvFromFile( clientEnvFile, clientConfig, verbose=self._verbose )
+
+        # Make sure PYPROC_ID isn't in the clientConfig so it doesn't get expanded
+        clientConfig.pop( 'PYPROC_ID', None )
+        return clientConfig
+
+    def getClientConfigs( self, clientNames ):
+        '''Returns a list of the expanded config for each of clientNames.'''
+        return [ self.getClientConfig( clientName ) for clientName in clientNames ]
+
+    def expandConfig( self, config ):
+        '''Expand the macros in all config values, in place.'''
+        expanded = {}
+        cyclic   = set()
+        for macroName in config:
+            self.expandName( config, macroName, expanded, cyclic )
+        config.update( expanded )
+        return config
+
+    def expandName( self, config, macroName, expanded, cyclic, pending=None, reportCycles=True ):
+        '''Expand config[macroName] and the macros it refers to into the expanded dict.
+        Names found in a cycle are added to cyclic and keep their original value.
+        Returns the expanded value, or None if macroName is in a cycle.'''
+        if macroName in cyclic:
+            return None
+        if macroName in expanded:
+            return expanded[macroName]
+        if pending is None:
+            pending = []    # Names being expanded, to detect cycles
+        if macroName in pending:
+            cycle = pending[ pending.index( macroName ): ]
+            cyclic.update( cycle )
+            if reportCycles:
+                print( "ConfigResolver Error: %s: Macro cycle %s" % ( config.get( 'CLIENT_NAME' ),
+                        ' -> '.join( cycle + [ macroName ] ) ) )
+            return None
+        pending.append( macroName )
+        strWithMacros = config[macroName]
+        result = ''
+        while True:
+            macroMatch = macroRefRegExp.search( strWithMacros )
+            if not macroMatch:
+                break
+            refName = macroMatch.group(2)
+            value = None
+            if refName in config:
+                value = self.expandName( config, refName, expanded, cyclic, pending, reportCycles )
+            if value is None:
+                # Leave undefined macros, and macros in a cycle, for the shell
+                result += macroMatch.group(1) + '$' + refName
+            else:
+                result += macroMatch.group(1) + value
+            strWithMacros = macroMatch.group(3)
+        pending.pop()
+        if macroName in cyclic:
+            expanded[macroName] = config[macroName]
+            return None
+        expanded[macroName] = result + strWithMacros
+        return expanded[macroName]
+
+class TimerWheel(object):
+    '''Hashed timer wheel for scheduling many start and stop delays from one asyncio task.
+    Timers are kept in numSlots lists indexed by expiration tick modulo numSlots,
+    so adding a timer is O(1) and each tick only checks one slot, no matter
+    how many clients are waiting.  Resolution is one tick.'''
+    def __init__( self, tick=0.1, numSlots=512 ):
+        self._tick      = tick
+        self._numSlots  = numSlots
+        self._slots     = [ [] for i in range( numSlots ) ]
+        self._curTick   = 0
+        self._task      = None
+
+    def start( self ):
+        if self._task is None:
+            self._task = asyncio.ensure_future( self._run() )
+
+    def stop( self ):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def callLater( self, delay, callback, *args ):
+        '''Call callback(*args) after delay seconds.
+        Returns a timer handle, a list whose last item is a cancelled flag.'''
+        expireTick = self._curTick + max( int( math.ceil( delay / self._tick ) ), 1 )
+        timer = [ expireTick, callback, args, False ]
+        self._slots[ expireTick % self._numSlots ].append( timer )
+        return timer
+
+    def cancel( self, timer ):
+        timer[3] = True
+
+    def sleep( self, delay ):
+        '''Returns a future that completes after delay seconds.'''
+        future = asyncio.get_event_loop().create_future()
+        def wakeup():
+            if not future.done():
+                future.set_result( None )
+        self.callLater( delay, wakeup )
+        return future
+
+    async def _run( self ):
+        loop = asyncio.get_event_loop()
+        tickZero = loop.time() - self._curTick * self._tick
+        while True:
+            nextTime = tickZero + ( self._curTick + 1 ) * self._tick
+            await asyncio.sleep( max( nextTime - loop.time(), 0 ) )
+            self._curTick += 1
+            slot = self._slots[ self._curTick % self._numSlots ]
+            if not slot:
+                continue
+            expired = [ timer for timer in slot if timer[0] <= self._curTick ]
+            slot[:] = [ timer for timer in slot if timer[0] >  self._curTick ]
+            for ( expireTick, callback, args, cancelled ) in expired:
+                if not cancelled:
+                    callback( *args )
+
+class SshPool(object):
+    '''One ssh ControlMaster connection per host, shared by every launch, status check
+    and kill for that host.  After the masters are opened by openMasters(), each
+    ssh command only opens a new channel on the authenticated connection,
+    w/o another handshake.
+    Control sockets are in a private temporary directory, removed by closeAll().'''
+    def __init__( self, connectTimeout=10 ):
+        self._controlDir     = tempfile.mkdtemp( prefix='stSsh_', dir='/tmp' )
+        self._connectTimeout = connectTimeout
+        self._hosts          = set()    # Hosts w/ an open master
+        self._hostDirs       = {}       # TEST_HOST for each TEST_TOP/HOSTDIR name, the remote's hostname -s
+
+    def getControlPath( self, hostName ):
+        # Unix socket paths are limited to about 100 characters, so keep the directory short
+        return os.path.join( self._controlDir, hostName )
+
+    def getSshOptions( self, hostName ):
+        return [ '-o', 'ControlMaster=no', '-o', 'ControlPath=%s' % self.getControlPath( hostName ) ]
+
+    def getCommand( self, hostName, remoteArgs, tty=False ):
+        '''Returns the ssh command list to run remoteArgs on hostName.
+        Uses the host's master if open, else a separate connection.'''
+        cmdList = [ 'ssh' ]
+        if hostName in self._hosts:
+            cmdList += self.getSshOptions( hostName )
+        if tty:
+            cmdList += [ '-t', '-t' ]
+        return cmdList + [ hostName ] + list( remoteArgs )
+
+    async def openMaster( self, hostName, verbose=False ):
+        cmdList = [ 'ssh', '-o', 'ControlMaster=yes', '-o', 'ControlPersist=yes',
+                    '-o', 'ControlPath=%s' % self.getControlPath( hostName ),
+                    '-o', 'ConnectTimeout=%d' % self._connectTimeout, '-N', '-f', hostName ]
+        if verbose:
+            print( "SshPool: %s" % ' '.join( cmdList ), flush=True )
+        # -f returns once authenticated, leaving the master in the background
+        sshMaster = await asyncio.create_subprocess_exec( *cmdList, stdin=subprocess.DEVNULL,
+                                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+        if await sshMaster.wait() == 0:
+            self._hosts.add( hostName )
+            self.setHostDir( hostName, hostName.split( '.' )[0] )
+        else:
+            print( "SshPool Error: Unable to open ssh master for %s, using separate connections." % hostName )
+
+    async def openMasters( self, hostNames, verbose=False ):
+        '''Open the masters for all hosts in parallel.'''
+        hostNames = [ hostName for hostName in set( hostNames ) if hostName and hostName not in self._hosts ]
+        await asyncio.gather( *[ self.openMaster( hostName, verbose=verbose ) for hostName in hostNames ] )
+
+    async def forwardSocket( self, hostName, remotePath ):
+        '''Forward a local unix socket to remotePath on hostName over the host's master.
+        Returns the local socket path, or None if the host has no master.'''
+        if hostName not in self._hosts:
+            return None
+        localPath = self.getControlPath( hostName ) + '.agent'
+        cmdList = [ 'ssh', '-O', 'forward', '-o', 'ControlPath=%s' % self.getControlPath( hostName ),
+                    '-L', '%s:%s' % ( localPath, remotePath ), hostName ]
+        sshForward = await asyncio.create_subprocess_exec( *cmdList, stdin=subprocess.DEVNULL,
+                                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+        if await sshForward.wait() != 0:
+            return None
+        return localPath
+
+    async def getRemoteUser( self, hostName ):
+        '''Returns the user ssh logs in as on hostName, from the ssh config.'''
+        sshConfig = await asyncio.create_subprocess_exec( 'ssh', '-G', hostName, stdin=subprocess.DEVNULL,
+                                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL )
+        ( output, errors ) = await sshConfig.communicate()
+        for line in output.decode( errors='replace' ).splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0] == 'user':
+                return fields[1]
+        return getpass.getuser()
+
+    def setHostDir( self, hostName, hostDir ):
+        '''Map a test host directory name, the host's hostname -s, to its TEST_HOST.'''
+        self._hostDirs[hostDir] = hostName
+
+    def getHostForDir( self, hostDir ):
+        '''Returns the TEST_HOST for a test host directory name, or hostDir if unknown.'''
+        return self._hostDirs.get( hostDir, hostDir )
+
+    def checkMaster( self, hostName ):
+        '''True if hostName's master is open and running.
+        A master which has exited is dropped, so later commands use separate connections.'''
+        if hostName not in self._hosts:
+            return False
+        cmdList = [ 'ssh', '-O', 'check', '-o', 'ControlPath=%s' % self.getControlPath( hostName ), hostName ]
+        if subprocess.call( cmdList, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL ) == 0:
+            return True
+        print( "SshPool Error: ssh master for %s has exited, using separate connections." % hostName )
+        self._hosts.discard( hostName )
+        return False
+
+    def closeAll( self ):
+        for hostName in self._hosts:
+            cmdList = [ 'ssh', '-O', 'exit', '-o', 'ControlPath=%s' % self.getControlPath( hostName ), hostName ]
+            subprocess.call( cmdList, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+        self._hosts = set()
+        shutil.rmtree( self._controlDir, ignore_errors=True )
+
+def getAgentSocket( userName ):
+    '''Same as stressTestMonitor.getAgentSocket(), the host agent's unix socket for userName.'''
+    return '/tmp/stressTestAgent.%s.sock' % userName
+
+class AgentConnection(object):
+    '''JSON line RPC connection to a host's stressTestMonitor agent,
+    through a unix socket forwarded by the host's ssh master.
+    Requests from all of the host's clients share one connection, and status
+    is streamed on a second connection by startStatusStream().'''
+    def __init__( self, hostName, localPath ):
+        self._hostName   = hostName
+        self._localPath  = localPath
+        self._reader     = None
+        self._writer     = None
+        self._lock       = asyncio.Lock()
+        self._streamTask = None
+        self._lastStatus = None     # Last streamed status reply
+        self._agentHost  = None     # Agent's short host name, the name of its TEST_HOST_DIR
+
+    def getHostName( self ):
+        return self._hostName
+
+    def getAgentHostName( self ):
+        return self._agentHost or self._hostName.split( '.' )[0]
+
+    async def connect( self ):
+        ( self._reader, self._writer ) = await asyncio.open_unix_connection( self._localPath )
+
+    def close( self ):
+        if self._streamTask is not None:
+            self._streamTask.cancel()
+            self._streamTask = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def call( self, request ):
+        '''Send one request, returns the agent's reply dict.'''
+        async with self._lock:
+            if self._writer is None:
+                raise ConnectionError( "Agent on %s not connected" % self._hostName )
+            self._writer.write( json.dumps( request ).encode() + b'\n' )
+            await self._writer.drain()
+            line = await self._reader.readline()
+        if not line:
+            raise ConnectionError( "Agent on %s closed the connection" % self._hostName )
+        return json.loads( line )
+
+    def startStatusStream( self, testTop, interval=1.0, metricsLog=None ):
+        '''Stream the agent's status for testTop every interval seconds,
+        appending host metrics to the metricsLog file if given.'''
+        self._streamTask = asyncio.ensure_future( self._streamStatus( testTop, interval, metricsLog ) )
+
+    async def _streamStatus( self, testTop, interval, metricsLog ):
+        writer = None
+        try:
+            ( reader, writer ) = await asyncio.open_unix_connection( self._localPath )
+            writer.write( json.dumps( { 'cmd': 'status', 'testTop': testTop, 'interval': interval } ).encode() + b'\n' )
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._lastStatus = json.loads( line )
+                if metricsLog is not None:
+                    metrics = self._lastStatus.get( 'metrics', {} )
+                    numRunning = sum( [ c['numRunning'] for c in self._lastStatus.get( 'clients', {} ).values() ] )
+                    with open( metricsLog, 'a' ) as f:
+                        f.write( "%.3f %s %s %d\n" % ( self._lastStatus['time'],
+                                 ' '.join( [ str(v) for v in metrics.get( 'loadavg', [] ) ] ),
+                                 metrics.get( 'MemAvailable', '-' ), numRunning ) )
+        except ( OSError, ConnectionError, ValueError ) as e:
+            print( "AgentConnection %s: Status stream error: %s" % ( self._hostName, e ), flush=True )
+        finally:
+            # Fall back to status requests
+            self._lastStatus = None
+            if writer is not None:
+                writer.close()
+
+    async def getStatus( self, testTop, since=0.0 ):
+        '''Returns the last streamed status if newer than since, else requests it.'''
+        if self._lastStatus is not None and self._lastStatus['time'] >= since:
+            return self._lastStatus
+        return await self.call( { 'cmd': 'status', 'testTop': testTop } )
+
+async def connectAgent( hostName, scriptDir, verbose=False ):
+    '''Returns an AgentConnection to hostName's agent, or None if unavailable.
+    If no agent answers, one is started w/ launch_agent.sh, and stays running
+    for later tests.'''
+    agentSocket = getAgentSocket( await sshPool.getRemoteUser( hostName ) )
+    localPath = await sshPool.forwardSocket( hostName, agentSocket )
+    if localPath is None:
+        print( "connectAgent Error: Unable to forward agent socket for %s" % hostName )
+        return None
+    agent = AgentConnection( hostName, localPath )
+    for attempt in range( 20 ):
+        try:
+            await agent.connect()
+            reply = await agent.call( { 'cmd': 'ping' } )
+            if reply.get( 'ok' ):
+                agent._agentHost = reply.get( 'host' )
+                if agent._agentHost:
+                    sshPool.setHostDir( hostName, agent._agentHost )
+                if verbose:
+                    print( "connectAgent %s: pid %s, uptime %.1f sec" % ( hostName, reply.get( 'pid' ), reply.get( 'uptime', 0 ) ) )
+                return agent
+        except ( OSError, ConnectionError, ValueError ):
+            pass
+        agent.close()
+        if attempt == 0:
+            print( "connectAgent: Starting agent on %s" % hostName, flush=True )
+            remoteArgs = [ 'nohup', os.path.join( scriptDir, 'launch_agent.sh' ), agentSocket,
+                           '>', agentSocket + '.log', '2>&1', '<', '/dev/null', '&' ]
+            sshLaunch = await asyncio.create_subprocess_exec( *sshPool.getCommand( hostName, remoteArgs ),
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+            await sshLaunch.wait()
+        await asyncio.sleep( 0.5 )
+    print( "connectAgent Error: No agent on %s, using ssh launches." % hostName )
+    return None
+
+class OutputBuffer(object):
+    '''Keeps the last maxLines lines of a client's output, and counts the dropped lines.'''
+    def __init__( self, maxLines=1000 ):
+        self._lines      = collections.deque( maxlen=maxLines )
+        self._numDropped = 0
 
-    # Make sure PYPROC_ID isn't in the clientConfig so it doesn't get expanded
-    if 'PYPROC_ID' in clientConfig:
-        del clientConfig['PYPROC_ID']
+    def append( self, line ):
+        if len(self._lines) == self._lines.maxlen:
+            self._numDropped += 1
+        self._lines.append( line )
 
-    # Expand macros in clientConfig
-    for key in clientConfig:
-        clientConfig[key] = expandMacros( clientConfig[key], clientConfig )
+    def getLines( self ):
+        return list( self._lines )
 
-    return clientConfig
+    def getNumDropped( self ):
+        return self._numDropped
+
+async def readRemoteOutput( clientName, stream, outputBuffer, verbose=False ):
+    '''Read ssh output lines into outputBuffer as they arrive.
+    Keeps reading past overlong lines, so ssh is never blocked on a full pipe.'''
+    while True:
+        try:
+            line = await stream.readuntil( b'\n' )
+        except asyncio.IncompleteReadError as e:
+            # Last line w/o a newline, or EOF
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            # Line longer than the stream limit, read it in pieces
+            line = await stream.read( max( e.consumed, 1 ) )
+        if not line:
+            break
+        line = makePrintable( line ).rstrip( '\n' )
+        outputBuffer.append( line )
+        if verbose:
+            print( "%s: %s" % ( clientName, line ), flush=True )
 
-def runRemote( *args, **kws ):
-    config = args[0]
-    clientName = args[1]
-    testTop = config[ 'TEST_TOP' ]
-    verbose = kws.get( 'verbose', False )
+def terminateRemote( clientName, sshRemote ):
+    if sshRemote.returncode is None:
+        print( "client %s terminate remote" % ( clientName ), flush=True )
+        sshRemote.terminate()
 
+def getStartDelay( clientConfig, clientName ):
+    TEST_START_DELAY = clientConfig.get( 'TEST_START_DELAY', 0 )
+    if TEST_START_DELAY:
+        try:
+            return float(TEST_START_DELAY)
+        except ValueError:
+            print( "client %s config has invalid TEST_START_DELAY: %s" % ( clientName, TEST_START_DELAY ) )
+    return 0.0
+
+# TEST_LAUNCHER from stressTestDefault.env, whose steps the agent does itself
+DEFAULT_LAUNCHER = '$SCRIPTDIR/launch_client.sh $TEST_TOP $CLIENT_NAME'
+
+def canUseAgent( clientConfig, agent ):
+    '''True if the agent launches the client as its TEST_LAUNCHER would.
+    The agent replaces launch_client.sh, so clients w/ another TEST_LAUNCHER
+    need ssh.  ConfigResolver includes the host.env for the short name of
+    TEST_HOST, so clients whose agent uses another host directory w/ a
+    host.env need ssh as well.'''
+    if clientConfig.get( 'TEST_LAUNCHER' ) != expandMacros( DEFAULT_LAUNCHER, clientConfig ):
+        return False
+    hostDir = agent.getAgentHostName()
+    if hostDir == clientConfig.get( 'TEST_HOST', '' ).split( '.' )[0]:
+        return True
+    return not os.path.isfile( os.path.join( clientConfig['TEST_TOP'], hostDir, 'host.env' ) )
+
+async def runAgentClient( config, clientName, agent, timerWheel, testStartTime=None, maxOutputLines=1000, verbose=False ):
+    '''Launch clientName's processes through its host's agent, and wait for them to exit.
+    The agent sets up the env and stops the processes after TEST_DURATION,
+    so there's no ssh session or launch_client.sh per client.
+    Returns ( outputLines, numDropped ) like runRemote(), w/ the agent's replies.'''
+    if verbose:
+        print( "runAgentClient client %s:" % clientName )
+    clientConfig = getClientConfig( config, clientName )
+    if not clientConfig:
+        print( "runAgentClient client %s unable to read test config!" % clientName )
+        return None
+    testTop   = clientConfig[ 'TEST_TOP' ]
+    startTime = ( testStartTime if testStartTime is not None else time.time() ) + getStartDelay( clientConfig, clientName )
+    env = { name: value for ( name, value ) in clientConfig.items() if isinstance( value, str ) }
+    outputBuffer = OutputBuffer( maxOutputLines )
+    try:
+        reply = await agent.call( { 'cmd': 'launch', 'testTop': testTop, 'client': clientName, 'env': env, 'startTime': startTime } )
+        launchTime = time.time()
+        outputBuffer.append( "launch: %s" % json.dumps( reply ) )
+        if not reply.get( 'ok' ):
+            print( "runAgentClient Error: client %s: %s" % ( clientName, reply.get( 'error' ) ), flush=True )
+        while reply.get( 'numProcs' ):
+            await timerWheel.sleep( 1.0 )
+            if testStopping:
+                outputBuffer.append( "kill: %s" % json.dumps( await agent.call( { 'cmd': 'kill', 'testTop': testTop, 'client': clientName } ) ) )
+                break
+            status = await agent.getStatus( testTop, since=launchTime )
+            clientStatus = status.get( 'clients', {} ).get( clientName )
+            if clientStatus is None or clientStatus['numRunning'] == 0:
+                outputBuffer.append( "status: %s" % json.dumps( clientStatus ) )
+                break
+    except ( OSError, ConnectionError, ValueError ) as e:
+        print( "runAgentClient Error: client %s: %s" % ( clientName, e ), flush=True )
+        outputBuffer.append( "error: %s" % e )
+
+    print( "agent client %s done." % ( clientName ), flush=True )
+    return ( outputBuffer.getLines(), outputBuffer.getNumDropped() )
+
+async def runRemote( config, clientName, timerWheel, testStartTime=None, maxOutputLines=1000, verbose=False ):
+    '''Launch clientName's TEST_LAUNCHER via ssh after its TEST_START_DELAY,
+    and terminate it after TEST_DURATION if given.
+    W/ a testStartTime, the client is launched right away w/ TEST_START_TIME set
+    to testStartTime + TEST_START_DELAY, and its processes are held by a
+    startBarrier on the remote host until then.
+    Returns ( outputLines, numDropped ), the last maxOutputLines lines of ssh output
+    and the number of earlier lines dropped, or None if the client wasn't launched.'''
     if verbose:
         print( "runRemote client %s:" % clientName )
 
@@ -267,15 +759,11 @@ def runRemote( *args, **kws ):
         print( "runRemote client %s unable to read test config!" % clientName )
         return None
 
-    TEST_START_DELAY = clientConfig.get( 'TEST_START_DELAY', 0 )
-    if TEST_START_DELAY:
-        try:
-            TEST_START_DELAY  = float(TEST_START_DELAY)
-            time.sleep( TEST_START_DELAY )
-        except ValueError:
-            print( "client %s config has invalid TEST_START_DELAY: %s" % ( clientName, TEST_START_DELAY ) )
-    else:
-        TEST_START_DELAY  = 0.0
+    TEST_START_DELAY = getStartDelay( clientConfig, clientName )
+    if testStartTime is None:
+        await timerWheel.sleep( TEST_START_DELAY )
+    if testStopping:
+        return None
 
     TEST_LAUNCHER = clientConfig.get('TEST_LAUNCHER')
     TEST_LAUNCHER = expandMacros( TEST_LAUNCHER, clientConfig )
@@ -286,37 +774,54 @@ def runRemote( *args, **kws ):
     if not hostName:
         print( "runRemote Error: client %s TEST_HOST not specified!\n" % clientName )
         return
-    cmdList = [ 'ssh', '-t', '-t', hostName ]
-    cmdList += TEST_LAUNCHER.split()
-    sshRemote = subprocess.Popen( cmdList, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE )
-    #sshRemote = subprocess.Popen( cmdList, stdin=None, stdout=subprocess.PIPE )
+    launchArgs = TEST_LAUNCHER.split()
+    stopDelay = 0.0
+    if testStartTime is not None:
+        clientStartTime = testStartTime + TEST_START_DELAY
+        launchArgs = [ 'TEST_START_TIME=%.6f' % clientStartTime ] + launchArgs
+        stopDelay = max( clientStartTime - time.time(), 0.0 )
+    cmdList = sshPool.getCommand( hostName, launchArgs, tty=True )
+    # Our own output pipe, so we can close it even if children of ssh still hold it open
+    ( readFd, writeFd ) = os.pipe()
+    try:
+        sshRemote = await asyncio.create_subprocess_exec( *cmdList, stdin=subprocess.DEVNULL,
+                                                          stdout=writeFd, stderr=subprocess.STDOUT )
+    except OSError:
+        os.close( readFd )
+        raise
+    finally:
+        os.close( writeFd )
+    sshOutput = asyncio.StreamReader()
+    ( outputTransport, outputProtocol ) = await asyncio.get_running_loop().connect_read_pipe(
+                                            lambda: asyncio.StreamReaderProtocol( sshOutput ), os.fdopen( readFd, 'rb', 0 ) )
     procList.append( sshRemote )
 
+    stopTimer = None
     TEST_DURATION = clientConfig.get( 'TEST_DURATION' )
     if TEST_DURATION:
         try:
             TEST_DURATION  = float(TEST_DURATION)
-            print( "client %s sleeping for TEST_DURATION %f" % ( clientName, TEST_DURATION ), flush=True )
-            time.sleep( TEST_DURATION )
+            print( "client %s scheduling stop after TEST_DURATION %f" % ( clientName, TEST_DURATION ), flush=True )
+            stopTimer = timerWheel.callLater( stopDelay + TEST_DURATION, terminateRemote, clientName, sshRemote )
         except ValueError:
             print( "client %s config has invalid TEST_DURATION: %s" % ( clientName, TEST_DURATION ) )
 
-        print( "client %s terminate remote" % ( clientName ), flush=True )
-        #testRemote.stop()
-        sshRemote.terminate()
-
-    while True:
-        if verbose:
-            print( "client %s fetching output ...\r" % ( clientName ), flush=True )
-        try:
-            (out,err) = sshRemote.communicate( timeout=1 )
-            break
-        except subprocess.TimeoutExpired:
-            pass
+    outputBuffer = OutputBuffer( maxOutputLines )
+    readTask = asyncio.ensure_future( readRemoteOutput( clientName, sshOutput, outputBuffer, verbose=verbose ) )
+    while sshRemote.returncode is None and not readTask.done():
+        await asyncio.wait( [ readTask ], timeout=1.0 )
+    await sshRemote.wait()
+    if stopTimer is not None:
+        timerWheel.cancel( stopTimer )
+    try:
+        await asyncio.wait_for( readTask, timeout=1.0 )
+    except asyncio.TimeoutError:
+        # Children still hold the pipe open, readTask was cancelled by wait_for()
+        pass
+    outputTransport.close()
 
     print( "ssh client %s done." % ( clientName ), flush=True )
-    #print( "ssh output type is %s." % ( type(out) ), flush=True )
-    return makePrintable( out )
+    return ( outputBuffer.getLines(), outputBuffer.getNumDropped() )
 
 def generateGatewayPVLists( clientConfig, verbose=False ):
     gwPrefix = clientConfig['TEST_GW_PREFIX']
@@ -430,36 +935,148 @@ def generateClientPVLists( testTop, config, verbose=False ):
                     f.write( "%s\n" % pv )
     return
 
-def clientFetchResult( future ):
-    clientName = testFutures[future]
+def showClientResult( clientName, clientResult ):
+    print( "clientResult for %s:" % ( clientName ) )
+    if isinstance( clientResult, BaseException ):
+        print( "%s: Exception: %s" % ( clientName, clientResult ) )
+        return
+    if not clientResult:
+        print( clientResult )
+        return
+    ( outputLines, numDropped ) = clientResult
+    if numDropped:
+        print( "(%d earlier lines dropped)" % numDropped )
+    for line in outputLines:
+        print( "%s" % line )
+
+async def runClients( config, clientNames, maxOutputLines=1000, sshMux=True, startLead=5.0, useAgent=False, verbose=False ):
+    '''Run all clients from one event loop, w/ a TimerWheel for their start and stop delays.
+    The ssh masters for all hosts are opened first, so client start times
+    aren't skewed by ssh handshakes.
+    If startLead isn't None, all clients are launched at once and start together
+    at startLead seconds from now, plus their TEST_START_DELAY.  startLead
+    should cover ssh launch and env setup time on the slowest host.
+    If useAgent, clients are launched by each host's stressTestMonitor agent,
+    and w/ ssh launches only on hosts w/o an agent.'''
+    hostNames = []
+    for clientName in clientNames:
+        clientConfig = getClientConfig( config, clientName )
+        if clientConfig:
+            hostNames.append( clientConfig.get('TEST_HOST') )
+    if sshMux:
+        await sshPool.openMasters( hostNames, verbose=verbose )
+    agents = {}
+    if useAgent:
+        hostNames = sorted( set( [ hostName for hostName in hostNames if hostName ] ) )
+        connections = await asyncio.gather( *[ connectAgent( hostName, config['SCRIPTDIR'], verbose=verbose ) for hostName in hostNames ] )
+        for ( hostName, agent ) in zip( hostNames, connections ):
+            if agent is not None:
+                agent.startStatusStream( config['TEST_TOP'], metricsLog=os.path.join( config['TEST_TOP'], hostName + '.metrics.log' ) )
+                agents[hostName] = agent
+
+    testStartTime = None
+    if startLead is not None:
+        testStartTime = time.time() + startLead
+        print( "Test start time: %s" % datetime.datetime.fromtimestamp( testStartTime ).strftime( "%c" ), flush=True )
+
+    timerWheel = TimerWheel()
+    timerWheel.start()
+    tasks = []
+    for clientName in clientNames:
+        clientConfig = getClientConfig( config, clientName ) or {}
+        agent = agents.get( clientConfig.get('TEST_HOST') )
+        if agent is not None and not canUseAgent( clientConfig, agent ):
+            print( "client %s: Using ssh, as the agent can't replace its TEST_LAUNCHER or host.env" % clientName, flush=True )
+            agent = None
+        if agent is not None:
+            client = runAgentClient( config, clientName, agent, timerWheel, testStartTime=testStartTime,
+                                     maxOutputLines=maxOutputLines, verbose=verbose )
+        else:
+            client = runRemote( config, clientName, timerWheel, testStartTime=testStartTime,
+                                maxOutputLines=maxOutputLines, verbose=verbose )
+        tasks.append( asyncio.ensure_future( client ) )
+    print( "Launched %d clients ..." % len(tasks), flush=True )
     try:
-        clientResult = future.result()
-    except Exception as e:
-        print( "%s: Exception: %s" % ( clientName, e ) )
-    else:
-        print( "clientResult for %s:" % ( clientName ) )
-        if clientResult:
-            #print( "clientResult type is %s." % ( type(clientResult) ), flush=True )
-            #if isinstance( clientResult, str ) and clientResult.startswith( "b'" ):
-            #	clientResult = eval(clientResult)
-            #	print( "eval clientResult type is %s." % ( type(clientResult) ), flush=True )
-            #if isinstance( clientResult, bytes ):
-            #	clientResult = clientResult.decode()
-            #	print( "decoded clientResult type is %s." % ( type(clientResult) ), flush=True )
-            clientResult = makePrintable( clientResult )
-            #print( "filtered clientResult type is %s." % ( type(clientResult) ), flush=True )
-            if isinstance( clientResult, list ):
-                for line in clientResult:
-                    print( "%s" % line )
-            else:
-                #if isinstance( clientResult, str ):
-                #	clientResult = clientResult.splitlines()
-                #	print( "split clientResult type is %s." % ( type(clientResult) ), flush=True )
-                print( clientResult )
+        results = await asyncio.gather( *tasks, return_exceptions=True )
+    finally:
+        timerWheel.stop()
+        for agent in agents.values():
+            agent.close()
+    for ( clientName, clientResult ) in zip( clientNames, results ):
+        showClientResult( clientName, clientResult )
+    return results
+
+async def runClientsUntilKilled( config, clientNames, **kwargs ):
+    '''runClients() w/ loop signal handlers for SIGINT and SIGTERM.
+    The first signal runs killProcesses() in the loop's executor, so the loop
+    keeps running while the kills block, and agent clients and ssh output are
+    still handled until the clients exit.  A second signal cancels the clients.'''
+    loop = asyncio.get_running_loop()
+    runTask = asyncio.ensure_future( runClients( config, clientNames, **kwargs ) )
+    killFutures = []
+    def onSignal( signum ):
+        print( "\nrunClients: Received signal %d" % signum, flush=True )
+        if killFutures:
+            runTask.cancel()
         else:
-            print( clientResult )
-
-def runTest( testTop, config, verbose=False ):
+            killFutures.append( loop.run_in_executor( None, killProcesses ) )
+    for signum in ( signal.SIGINT, signal.SIGTERM ):
+        loop.add_signal_handler( signum, onSignal, signum )
+    try:
+        return await runTask
+    finally:
+        # Closing the loop resets these signals, so reinstall the handler for the rest of the test
+        for signum in ( signal.SIGINT, signal.SIGTERM ):
+            loop.remove_signal_handler( signum )
+            signal.signal( signum, stressTest_signal_handler )
+        if killFutures:
+            await asyncio.gather( *killFutures, return_exceptions=True )
+
+def generateTestReport( testTop, jobs=0, verbose=False ):
+    '''Render the headless HTML report for a completed test in a separate
+    process, so the launcher doesn't need numpy or matplotlib.'''
+    SCRIPTDIR = os.path.abspath( os.path.dirname( __file__ ) )
+    cmdList = [ sys.executable, os.path.join( SCRIPTDIR, 'stressTestReport.py' ), '-t', testTop, '-j', str(jobs) ]
+    if verbose:
+        cmdList.append( '-v' )
+    print( "generateTestReport: %s" % ' '.join( cmdList ), flush=True )
+    try:
+        subprocess.check_call( cmdList, stdin=subprocess.DEVNULL )
+    except ( OSError, subprocess.CalledProcessError ) as e:
+        print( "generateTestReport Error: %s" % e )
+
+# startBarrier files, TEST_TOP/HOST/clients/PROCNAME/PROCNAME.start w/ scheduled and actual start times
+START_FILE_GLOB = os.path.join( "*", "clients", "*", "*.start" )
+
+def reportStartSkew( testTop ):
+    '''Show each test process's start time relative to its scheduled start,
+    from the startBarrier files, and save the table to TEST_TOP/startSkew.log.
+    Skews between hosts include their clock offsets.'''
+    lines = [ "Start skew ms            Host             Process" ]
+    skews = []
+    for startFile in sorted( glob.glob( os.path.join( testTop, START_FILE_GLOB ) ) ):
+        procName = os.path.splitext( os.path.split( startFile )[1] )[0]
+        hostName = os.path.split( os.path.split( os.path.split( os.path.split( startFile )[0] )[0] )[0] )[1]
+        try:
+            with open( startFile, 'r' ) as f:
+                ( scheduled, released ) = [ float(t) for t in f.read().split()[0:2] ]
+        except ( OSError, ValueError ) as e:
+            print( "reportStartSkew Error: Unable to read %s: %s" % ( startFile, e ) )
+            continue
+        skew = ( released - scheduled ) * 1e3
+        skews.append( skew )
+        lines.append( "%13.3f    %-16s %s" % ( skew, hostName, procName ) )
+    if len(skews) == 0:
+        print( "reportStartSkew: No start files found." )
+        return
+    lines.append( "Start skew for %d processes: min %.3f ms, max %.3f ms, spread %.3f ms" %
+                    ( len(skews), min(skews), max(skews), max(skews) - min(skews) ) )
+    print( '\n'.join( lines ), flush=True )
+    with open( os.path.join( testTop, 'startSkew.log' ), 'w' ) as f:
+        f.write( '\n'.join( lines ) + '\n' )
+
+def runTest( testTop, config, verbose=False, report=True, reportJobs=0, maxOutputLines=1000, sshMux=True, startLead=5.0,
+             useAgent=False ):
     servers = config.get( 'servers' )
     clients = config.get( 'clients' )
     TEST_NAME = config[ 'TEST_NAME' ]
@@ -478,47 +1095,76 @@ def runTest( testTop, config, verbose=False ):
     # Create PV lists
     generateClientPVLists( testTop, config, verbose=verbose )
 
-    global testExecutor
-    global testFutures
-    testExecutor = concurrent.futures.ThreadPoolExecutor( max_workers=None )
-    testFutures  = {}
-    for c in servers:
-        clientName = c.get('CLIENT_NAME')
-        testFutures[ testExecutor.submit( runRemote, config, clientName, verbose=verbose ) ] = clientName
-    for c in clients:
-        clientName = c.get('CLIENT_NAME')
-        testFutures[ testExecutor.submit( runRemote, config, clientName, verbose=verbose ) ] = clientName
-
-    print( "Launched %d testFutures ..." % len(testFutures), flush=True )
-    for future in testFutures:
-        future.add_done_callback( clientFetchResult )
+    # Remove start files from earlier runs
+    for startFile in glob.glob( os.path.join( testTop, START_FILE_GLOB ) ):
+        os.remove( startFile )
+
+    # Servers first, so they're launched before clients w/ the same start delay
+    clientNames  = [ s.get('CLIENT_NAME') for s in servers ]
+    clientNames += [ c.get('CLIENT_NAME') for c in clients ]
+    global testStopping
+    global sshPool
+    testStopping = False
+    sshPool = SshPool()
+    try:
+        asyncio.run( runClientsUntilKilled( config, clientNames, maxOutputLines=maxOutputLines, sshMux=sshMux,
+                                            startLead=startLead, useAgent=useAgent and sshMux, verbose=verbose ) )
+    except asyncio.CancelledError:
+        print( "runTest: Clients cancelled", flush=True )
+    finally:
+        sshPool.closeAll()
+        sshPool = None
+
+    if startLead is not None:
+        reportStartSkew( testTop )
+
+    if report:
+        generateTestReport( testTop, jobs=reportJobs, verbose=verbose )
+    return
 
-    while True:
-        ( done, not_done ) = concurrent.futures.wait( testFutures, timeout=1.0 )
-        if len(not_done) == 0:
-            break
-        if verbose:
-            print( "Waiting on %d futures ...\r" % len(not_done) )
+killCmdRegExp = re.compile( r"^\s*ssh\s+\S+\s+(kill\s.*)$" )
 
-    print( "shutdown testExecutor...", flush=True )
-    testExecutor.shutdown( wait=True )
-    return
+def getKillCommands( killFile ):
+    '''Returns the remote kill commands in a pyProcMgr killFile,
+    or None if it has lines other than "ssh HOST kill ...".'''
+    killCmds = []
+    try:
+        with open( killFile, 'r' ) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0 or line.startswith( '#' ):
+            continue
+        match = killCmdRegExp.search( line )
+        if not match:
+            return None
+        killCmds.append( match.group(1).split() )
+    return killCmds
 
 def killProcesses( ):
     global procList
     global testDir
-    global testFutures
+    global testStopping
+
+    # Clients still waiting on their start delay won't be launched
+    testStopping = True
 
     if testDir:
         killGlob = os.path.join( testDir, "*", "clients", "*.killer" )
         print( 'killProcesses: Checking for killFiles: %s' % killGlob )
-        for killFile in glob.glob( os.path.join( testDir, "*", "*.killer" ) ):
-            hostName = os.path.split( os.path.split( os.path.split(killFile)[0] )[0] )[1]
+        for killFile in glob.glob( killGlob ):
+            hostDir  = os.path.split( os.path.split( os.path.split(killFile)[0] )[0] )[1]
+            hostName = sshPool.getHostForDir( hostDir ) if sshPool is not None else hostDir
             print( 'killProcesses: ssh %s %s' % ( hostName, killFile ), flush=True )
-            #subprocess.check_status( "ssh %s %s" % ( hostName, killFile ) )
-            # killFile already has "ssh $host pid"
-            subprocess.check_status( "%s" % ( killFile ) )
-            time.sleep(0.5)
+            # killFile already has "ssh $host kill -s 2 $pid", run the kill cmd on our ssh master for the host
+            killCmds = getKillCommands( killFile )
+            if sshPool is None or killCmds is None or not sshPool.checkMaster( hostName ):
+                subprocess.call( [ killFile ], stdin=subprocess.DEVNULL )
+                continue
+            for killCmd in killCmds:
+                subprocess.call( sshPool.getCommand( hostName, killCmd ), stdin=subprocess.DEVNULL )
 
     time.sleep(1.0)
     for proc in procList:
@@ -527,30 +1173,6 @@ def killProcesses( ):
             proc.kill()
             #proc.terminate()
 
-    time.sleep(1.0)
-    print( 'killProcesses: Checking %d testFutures ...' % ( len(testFutures) ), flush=True )
-    # First kill clients
-    for future in testFutures:
-        if not future.done():
-            clientName = testFutures[future]
-            if clientName.find('Server') < 0:
-                print( 'killProcesses: Cancel future for %s' % ( clientName ), flush=True )
-                time.sleep(0.5)
-                future.cancel()
-
-    time.sleep(1.0)
-    # kill remaining futures
-    for future in testFutures:
-        if not future.done():
-            clientName = testFutures[future]
-            print( 'killProcesses: Cancel future for %s' % ( clientName ), flush=True )
-            time.sleep(0.5)
-            future.cancel()
-
-    print( 'killProcesses: Shutdown testExecutor', flush=True )
-    time.sleep(0.5)
-    testExecutor.shutdown( wait=True )
-
 def stressTest_signal_handler( signum, frame ):
     print( "\nstressTest_signal_handler: Received signal %d" % signum, flush=True )
     killProcesses()
@@ -576,6 +1198,12 @@ def process_options():
     #parser.add_argument( 'arg', nargs='*', help='Arguments for command line. Enclose options in quotes.' )
     parser.add_argument( '-v', '--verbose',  action="store_true", help='show more verbose output.' )
     parser.add_argument( '-t', '--testDir', action="store", required=True, help='Path to test directory. Can contain * and other glob syntax.' )
+    parser.add_argument( '--noReport', action="store_true", help='Don\'t generate the HTML report in TEST_TOP/report when the test completes.' )
+    parser.add_argument( '--noSshMux', action="store_true", help='Use a separate ssh connection for each client instead of one ControlMaster per host.' )
+    parser.add_argument( '--agent', action="store_true", help='Launch clients via a persistent stressTestMonitor agent on each host, started if needed.' )
+    parser.add_argument( '--startLead', action="store", type=float, default=5.0, help='Seconds from launch to the synchronized start of all clients. Negative to start each client on launch.' )
+    parser.add_argument( '--maxOutputLines', action="store", type=int, default=1000, help='Number of ssh output lines kept for each client.' )
+    parser.add_argument( '--reportJobs', action="store", type=int, default=0, help='Number of worker processes for the report. 0 for one per cpu.' )
 
     options = parser.parse_args( )
 
@@ -600,25 +1228,28 @@ def main( options, argv=None):
     testConfig[ 'TEST_NAME'] = TEST_NAME
     testConfig[ 'TEST_TOP' ] = testDir
     getEnvFromFile( os.path.join( options.testDir, "test.env" ), testConfig, verbose=options.verbose )
+    clientNames = []
     for envFile in glob.glob( os.path.join( options.testDir, "*.env" ) ):
         baseName = os.path.split( envFile )[1]
         if baseName == "test.env":
             continue
+        clientNames.append( baseName.replace( ".env", "" ) )
 
-        # Client configuration
-        clientConfig = testConfig.copy()
-        clientName = baseName.replace( ".env", "" )
-        readClientConfig( clientConfig, clientName, verbose=options.verbose )
-
-        if baseName.find( "Server" ) >= 0:
-            servers.append( clientConfig.copy() )
+    # Client configuration
+    resolver = ConfigResolver( testConfig, verbose=options.verbose )
+    for clientConfig in resolver.getClientConfigs( clientNames ):
+        if clientConfig[ 'CLIENT_NAME' ].find( "Server" ) >= 0:
+            servers.append( clientConfig )
         else:
-            clients.append( clientConfig.copy() )
+            clients.append( clientConfig )
 
     testConfig[ 'servers' ] = servers
     testConfig[ 'clients' ] = clients
 
-    return runTest( options.testDir, testConfig, verbose=options.verbose )
+    return runTest( options.testDir, testConfig, verbose=options.verbose,
+                    report=not options.noReport, reportJobs=options.reportJobs, maxOutputLines=options.maxOutputLines,
+                    sshMux=not options.noSshMux, startLead=options.startLead if options.startLead >= 0 else None,
+                    useAgent=options.agent )
 
 if __name__ == '__main__':
     status = 0
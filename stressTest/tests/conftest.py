@@ -0,0 +1,5 @@
+import os
+import sys
+
+# stressTest modules import each other by module name, ex. from stressTestFile import *
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
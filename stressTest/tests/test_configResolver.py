@@ -0,0 +1,108 @@
+import os
+
+from testManager import *
+
+def writeEnv( dirPath, fileName, lines ):
+    os.makedirs( dirPath, exist_ok=True )
+    with open( os.path.join( dirPath, fileName ), 'w' ) as f:
+        f.write( '\n'.join( lines ) + '\n' )
+
+def makeTestTree( tmp_path ):
+    '''Returns the testConfig for a test w/ scriptDir, site, test and client env files.'''
+    scriptDir = str( tmp_path / 'scripts' )
+    testTop   = str( tmp_path / 'tests' / 'TEST1' )
+    writeEnv( scriptDir, 'stressTestDefault.env', [ 'LAYER=default', 'DEFAULT_ONLY=default', 'TEST_DIR=$TEST_TOP/$CLIENT_NAME' ] )
+    writeEnv( scriptDir, 'stressTestDefault.env.local', [ 'LAYER=local' ] )
+    writeEnv( scriptDir, 'pvGetDefault.env', [ 'LAYER=apptype', 'APPTYPE_ONLY=$LAYER', 'TEST_PV_LIST=default.list' ] )
+    writeEnv( os.path.dirname( testTop ), 'siteDefault.env', [ 'LAYER=parentSite', 'SITE=parent' ] )
+    writeEnv( testTop, 'siteDefault.env', [ 'LAYER=site' ] )
+    writeEnv( testTop, 'test.env', [ 'LAYER=test', 'TEST_DURATION=60' ] )
+    writeEnv( testTop, 'pvGet00.env', [ 'TEST_APPTYPE=pvGet', 'TEST_HOST=$CLIENT_HOST', 'CLIENT_HOST=hostA.example.com',
+                                        'TEST_PV_LIST=client.list', 'PV_PATH=$TEST_DIR/$TEST_PV_LIST' ] )
+    writeEnv( testTop, 'pvGet01.env', [ 'TEST_APPTYPE=pvGet', 'TEST_HOST=hostB' ] )
+    writeEnv( testTop, 'other00.env', [ 'LAYER=client', 'TEST_HOST=hostA', 'PYPROC_ID=1' ] )
+    testConfig = { 'SCRIPTDIR': scriptDir, 'TEST_TOP': testTop }
+    getEnvFromFile( os.path.join( testTop, 'test.env' ), testConfig )
+    return testConfig
+
+def readClientConfig( clientConfig, clientName ):
+    '''The readClientConfig layering replaced by ConfigResolver, w/o its host.env or cycle handling.'''
+    clientConfig[ 'CLIENT_NAME' ] = clientName
+    SCRIPTDIR  = clientConfig[ 'SCRIPTDIR' ]
+    testTop    = clientConfig[ 'TEST_TOP' ]
+    getEnvFromFile( os.path.join( SCRIPTDIR, 'stressTestDefault.env' ), clientConfig )
+    getEnvFromFile( os.path.join( SCRIPTDIR, 'stressTestDefault.env.local' ), clientConfig )
+    getEnvFromFile( os.path.join( testTop, '..', 'siteDefault.env' ), clientConfig )
+    getEnvFromFile( os.path.join( testTop, 'siteDefault.env' ), clientConfig )
+    getEnvFromFile( os.path.join( testTop, 'test.env' ), clientConfig )
+    if 'TEST_APPTYPE' not in clientConfig:
+        getEnvFromFile( os.path.join( testTop, clientName + '.env' ), clientConfig )
+    if 'TEST_APPTYPE' in clientConfig:
+        getEnvFromFile( os.path.join( SCRIPTDIR, clientConfig['TEST_APPTYPE'] + 'Default.env' ), clientConfig )
+        getEnvFromFile( os.path.join( testTop, clientName + '.env' ), clientConfig )
+    clientConfig.pop( 'PYPROC_ID', None )
+    for key in clientConfig:
+        clientConfig[key] = expandMacros( clientConfig[key], clientConfig )
+    return clientConfig
+
+def test_readClientConfigOrder( tmp_path ):
+    testConfig = makeTestTree( tmp_path )
+    resolver = ConfigResolver( testConfig )
+    for clientName in [ 'pvGet00', 'pvGet01', 'other00', 'noEnv00' ]:
+        assert resolver.getClientConfig( clientName ) == readClientConfig( testConfig.copy(), clientName )
+
+def test_layers( tmp_path ):
+    testConfig = makeTestTree( tmp_path )
+    resolver = ConfigResolver( testConfig )
+    ( pvGet00, other00 ) = resolver.getClientConfigs( [ 'pvGet00', 'other00' ] )
+    testTop = testConfig['TEST_TOP']
+    assert pvGet00['LAYER'] == 'apptype'
+    assert pvGet00['APPTYPE_ONLY'] == 'apptype'
+    assert pvGet00['TEST_PV_LIST'] == 'client.list'
+    assert pvGet00['PV_PATH'] == os.path.join( testTop, 'pvGet00' ) + '/client.list'
+    assert pvGet00['SITE'] == 'parent'
+    assert pvGet00['DEFAULT_ONLY'] == 'default'
+    assert other00['LAYER'] == 'client'
+    assert 'PYPROC_ID' not in other00
+    assert 'APPTYPE_ONLY' not in other00
+
+def test_hostEnv( tmp_path ):
+    testConfig = makeTestTree( tmp_path )
+    testTop = testConfig['TEST_TOP']
+    # Read between siteDefault.env and test.env, from TEST_TOP/<short TEST_HOST>
+    writeEnv( os.path.join( testTop, 'hostA' ), 'host.env', [ 'LAYER=host', 'SITE=hostA', 'HOST_ONLY=hostA', 'TEST_DURATION=5' ] )
+    writeEnv( os.path.join( testTop, 'hostB' ), 'host.env', [ 'HOST_ONLY=hostB' ] )
+    resolver = ConfigResolver( testConfig )
+    ( pvGet00, pvGet01, other00 ) = resolver.getClientConfigs( [ 'pvGet00', 'pvGet01', 'other00' ] )
+    assert pvGet00['TEST_HOST'] == 'hostA.example.com'
+    assert pvGet00['HOST_ONLY'] == 'hostA'
+    assert pvGet00['SITE'] == 'hostA'
+    assert pvGet00['TEST_DURATION'] == '60'
+    assert pvGet00['LAYER'] == 'apptype'
+    assert pvGet01['HOST_ONLY'] == 'hostB'
+    assert pvGet01['SITE'] == 'parent'
+    assert other00['HOST_ONLY'] == 'hostA'
+    assert other00['LAYER'] == 'client'
+    # Clients w/o a host.env match the layering w/o host.env
+    assert resolver.getClientConfig( 'noEnv00' ) == readClientConfig( testConfig.copy(), 'noEnv00' )
+
+def test_macroCycle( tmp_path, capsys ):
+    testConfig = makeTestTree( tmp_path )
+    testTop = testConfig['TEST_TOP']
+    writeEnv( testTop, 'cycle00.env', [ 'TEST_HOST=$CYCLE_A', 'CYCLE_A=$CYCLE_B', 'CYCLE_B=$CYCLE_A',
+                                        'REF=x/$CYCLE_A', 'OK=$TEST_DURATION' ] )
+    resolver = ConfigResolver( testConfig )
+    config = resolver.getClientConfig( 'cycle00' )
+    assert config['CYCLE_A'] == '$CYCLE_B'
+    assert config['CYCLE_B'] == '$CYCLE_A'
+    assert config['TEST_HOST'] == '$CYCLE_A'
+    assert config['REF'] == 'x/$CYCLE_A'
+    assert config['OK'] == '60'
+    assert capsys.readouterr().out.count( 'Macro cycle' ) == 1
+
+def test_selfReference( tmp_path, capsys ):
+    testConfig = makeTestTree( tmp_path )
+    writeEnv( testConfig['TEST_TOP'], 'self00.env', [ 'PATH_LIST=$PATH_LIST:/extra' ] )
+    config = ConfigResolver( testConfig ).getClientConfig( 'self00' )
+    assert config['PATH_LIST'] == '$PATH_LIST:/extra'
+    assert capsys.readouterr().out.count( 'Macro cycle' ) == 1
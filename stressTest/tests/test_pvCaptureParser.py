@@ -0,0 +1,94 @@
+import pytest
+
+from stressTestFile import *
+
+CAPTURE_TEXT = '''[
+    [ [ 1559217327, 738206558 ], 8349 ],
+    [ [ 1559217327, 744054279 ], 8350 ],
+    [ [ 1559217328, 12345 ], 8351.5 ],
+    [ [ 1559217329, 0 ], -1 ]
+]
+'''
+CAPTURE_TS_VALUES = [   ( 1559217327, 738206558, 8349 ),
+                        ( 1559217327, 744054279, 8350 ),
+                        ( 1559217328, 12345, 8351.5 ),
+                        ( 1559217329, 0, -1 ) ]
+
+def parseChunks( text, chunkSize ):
+    '''Returns ( tsValues, complete, parser ) from feeding text in chunkSize pieces.'''
+    parser = pvCaptureParser( 'test.pvCapture' )
+    tsValues = []
+    for idx in range( 0, len(text), chunkSize ):
+        tsValues += parser.feed( text[ idx : idx + chunkSize ] )
+    complete = parser.close()
+    return ( tsValues, complete, parser )
+
+def writeCaptureFile( tmp_path, text ):
+    filePath = tmp_path / 'PV:1.pvCapture'
+    filePath.write_text( text )
+    return str( filePath )
+
+@pytest.mark.parametrize( 'chunkSize', list( range( 1, 40 ) ) + [ len(CAPTURE_TEXT) ] )
+def test_chunkSizes( chunkSize ):
+    ( tsValues, complete, parser ) = parseChunks( CAPTURE_TEXT, chunkSize )
+    assert tsValues == CAPTURE_TS_VALUES
+    assert complete
+    assert parser.getNumRecords() == len(CAPTURE_TS_VALUES)
+    assert parser.getNumCorrupt() == 0
+    assert parser.isDone()
+
+@pytest.mark.parametrize( 'chunkSize', [ 1, 7, 1024 ] )
+def test_truncatedRecord( chunkSize ):
+    # pvCapture killed while writing the last record
+    text = CAPTURE_TEXT[ 0 : CAPTURE_TEXT.index( '8351.5' ) ]
+    ( tsValues, complete, parser ) = parseChunks( text, chunkSize )
+    assert tsValues == CAPTURE_TS_VALUES[0:2]
+    assert not complete
+    assert parser.getNumCorrupt() == 0
+
+@pytest.mark.parametrize( 'chunkSize', [ 1, 7, 1024 ] )
+def test_truncatedAfterComma( chunkSize ):
+    text = CAPTURE_TEXT[ 0 : CAPTURE_TEXT.index( '8350' ) + len( '8350 ],' ) ]
+    ( tsValues, complete, parser ) = parseChunks( text, chunkSize )
+    assert tsValues == CAPTURE_TS_VALUES[0:2]
+    assert not complete
+    assert parser.getNumCorrupt() == 0
+
+@pytest.mark.parametrize( 'chunkSize', [ 1, 7, 1024 ] )
+def test_corruptRecord( chunkSize ):
+    text = CAPTURE_TEXT.replace( '[ [ 1559217327, 744054279 ], 8350 ]', '[ [ 1559217327, 744@#!' )
+    ( tsValues, complete, parser ) = parseChunks( text, chunkSize )
+    assert tsValues == [ CAPTURE_TS_VALUES[0] ] + CAPTURE_TS_VALUES[2:]
+    assert complete
+    assert parser.getNumCorrupt() == 1
+
+def test_corruptRecordParseErrors( tmp_path, capsys ):
+    text = CAPTURE_TEXT.replace( '[ [ 1559217327, 744054279 ], 8350 ]', '[ [ 1559217327, 744@#!' )
+    testFile = stressTestFilePVCapture( writeCaptureFile( tmp_path, text ) )
+    assert len(testFile.getTsValues()) == len(CAPTURE_TS_VALUES) - 1
+    assert testFile.getNumParseErrors() == 1
+    assert 'Corrupt file' in capsys.readouterr().out
+
+def test_validFileParseErrors( tmp_path ):
+    testFile = stressTestFilePVCapture( writeCaptureFile( tmp_path, CAPTURE_TEXT ) )
+    assert len(testFile.getTsValues()) == len(CAPTURE_TS_VALUES)
+    assert testFile.getNumParseErrors() == 0
+
+@pytest.mark.parametrize( 'text', [ '', '   \n' ] )
+def test_emptyFile( text ):
+    ( tsValues, complete, parser ) = parseChunks( text, 1 )
+    assert tsValues == []
+    assert complete
+    assert parser.getNumRecords() == 0
+
+@pytest.mark.parametrize( 'text', [ '[', '[\n', '[ ]', '[]\n' ] )
+def test_bracketOnlyFile( text ):
+    ( tsValues, complete, parser ) = parseChunks( text, 1 )
+    assert tsValues == []
+    # An unclosed list was cut short, an empty list is complete
+    assert complete == ( ']' in text )
+    assert parser.getNumCorrupt() == 0
+
+def test_invalidStart():
+    with pytest.raises( InvalidStressTestCaptureFile ):
+        parseChunks( '{ "not": "a capture" }', 1024 )
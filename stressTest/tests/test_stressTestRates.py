@@ -0,0 +1,46 @@
+import numpy as np
+
+from stressTestRates import *
+
+def makeColumns( samples ):
+    '''Returns sorted ( sec, values, timeouts ) columns from ( sec, value ) tuples, None for a timeout.'''
+    sec      = np.array( [ s for ( s, v ) in samples ], dtype=np.int64 )
+    values   = np.array( [ np.nan if v is None else v for ( s, v ) in samples ], dtype=np.float64 )
+    timeouts = np.array( [ v is None for ( s, v ) in samples ], dtype=bool )
+    return ( sec, values, timeouts )
+
+def test_computeRates():
+    ( sec, values, timeouts ) = makeColumns( [
+        ( 100, 1 ), ( 100, 2 ), ( 100, 5 ),     # Gap of 2 counts
+        ( 101, None ), ( 101, 8 ),              # Gap of 2 counts across a timeout
+                                                # No samples in 102
+        ( 103, 8 ), ( 103, 0 ),                 # Repeated value, then a counter reset
+        ( 104, 1 ), ( 104, 4 ) ] )              # Gap of 2 counts after the reset
+    ( startSec, tsRates, tsMissRates, timeoutRates ) = computeRates( sec, values, timeouts )
+    assert startSec == 100
+    assert tsRates.tolist()      == [ 3, 2, 0, 2, 2 ]
+    assert tsMissRates.tolist()  == [ 2, 2, 0, 0, 2 ]
+    assert timeoutRates.tolist() == [ 0, 1, 0, 0, 0 ]
+    assert tsMissRates.dtype == np.int64
+
+def test_computeRatesGapAcrossSeconds():
+    # Misses are binned at the second of the sample after the gap
+    ( sec, values, timeouts ) = makeColumns( [ ( 10, 1 ), ( 12, 11 ) ] )
+    ( startSec, tsRates, tsMissRates, timeoutRates ) = computeRates( sec, values, timeouts )
+    assert startSec == 10
+    assert tsRates.tolist()     == [ 1, 0, 1 ]
+    assert tsMissRates.tolist() == [ 0, 0, 9 ]
+
+def test_computeRatesTimeoutsOnly():
+    ( sec, values, timeouts ) = makeColumns( [ ( 5, None ), ( 5, None ), ( 6, None ) ] )
+    ( startSec, tsRates, tsMissRates, timeoutRates ) = computeRates( sec, values, timeouts )
+    assert startSec == 5
+    assert tsRates.tolist()      == [ 2, 1 ]
+    assert tsMissRates.tolist()  == [ 0, 0 ]
+    assert timeoutRates.tolist() == [ 2, 1 ]
+
+def test_computeRatesEmpty():
+    ( sec, values, timeouts ) = makeColumns( [] )
+    ( startSec, tsRates, tsMissRates, timeoutRates ) = computeRates( sec, values, timeouts )
+    assert startSec is None
+    assert len(tsRates) == 0 and len(tsMissRates) == 0 and len(timeoutRates) == 0